@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Usuario, Sala, Reserva
+from .models import Usuario, Sala, Reserva, SerieReserva
 
 @admin.register(Usuario)
 class UsuarioAdmin(BaseUserAdmin):
@@ -45,6 +45,15 @@ class SalaAdmin(admin.ModelAdmin):
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
     list_display = ['id', 'usuario', 'sala', 'fecha', 'hora_inicio', 'hora_fin', 'estado']
+    list_select_related = ['usuario', 'sala']
     search_fields = ['usuario__username', 'sala__nombre']
     list_filter = ['estado', 'fecha']
-    ordering = ['-fecha', '-hora_inicio']
\ No newline at end of file
+    ordering = ['-fecha', '-hora_inicio']
+
+@admin.register(SerieReserva)
+class SerieReservaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'usuario', 'sala', 'frecuencia', 'fecha_inicio', 'fecha_fin', 'hora_inicio', 'hora_fin', 'estado']
+    list_select_related = ['usuario', 'sala']
+    search_fields = ['usuario__username', 'sala__nombre']
+    list_filter = ['estado', 'frecuencia']
+    ordering = ['-fecha_inicio']
@@ -0,0 +1,299 @@
+"""
+Analítica de uso de salas sobre resúmenes diarios materializados.
+
+ResumenDiario (por sala y día) y ResumenCarrera (por carrera y día) se
+mantienen con deltas en cada escritura de Reserva: se resta el aporte de la
+versión anterior de la fila y se suma el de la nueva, con UPDATE ... SET
+campo = campo + n (con ANALITICA_DIFERIDA, desde el trabajador de
+reservas.tareas en lugar de la petición). Cada delta lleva la carrera que
+tenía el usuario al escribir, y un cambio de carrera del usuario traspasa el
+aporte de todas sus reservas (``cambiar_carrera``). Los reportes de
+/api/analytics/ leen solo estos resúmenes (y los mapas de DisponibilidadSala
+para las horas punta), así que un año de una sala son 365 filas sin importar
+cuántas reservas tenga.
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Usuario, Sala, Reserva, DisponibilidadSala, ResumenDiario, ResumenCarrera, Tarea
+from . import disponibilidad, tareas
+
+MINUTOS_DIA = (disponibilidad.HORA_CIERRE - disponibilidad.HORA_APERTURA) * 60
+BLOQUES_HORA = 60 // disponibilidad.MINUTOS_BLOQUE
+CAMPOS_RESUMEN = [
+    'reservas', 'pendientes', 'confirmadas', 'canceladas', 'minutos_reservados', 'minutos_confirmados',
+]
+CAMPOS_CARRERA = ['reservas', 'canceladas', 'minutos_reservados']
+CAMPOS_VALORES = ['sala_id', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'usuario_id']
+SIN_CARRERA = 'Sin carrera'
+
+
+def _minutos(hora_inicio, hora_fin):
+    return int((datetime.combine(date.min, hora_fin) - datetime.combine(date.min, hora_inicio)).total_seconds() // 60)
+
+
+def valores(reserva):
+    """Lo que aporta una reserva a los resúmenes"""
+    return {
+        'sala_id': reserva.sala_id,
+        'fecha': reserva.fecha,
+        'hora_inicio': reserva.hora_inicio,
+        'hora_fin': reserva.hora_fin,
+        'estado': reserva.estado,
+        'usuario_id': reserva.usuario_id,
+    }
+
+
+class Deltas:
+    """Cambios acumulados por resumen; ``aplicar()`` hace un UPDATE por fila tocada"""
+
+    def __init__(self):
+        self.salas = defaultdict(Counter)
+        self.carreras = defaultdict(Counter)
+
+    def sumar(self, datos, carrera, signo=1):
+        minutos = 0 if datos['estado'] == 'cancelada' else _minutos(datos['hora_inicio'], datos['hora_fin'])
+        sala = self.salas[(datos['sala_id'], datos['fecha'])]
+        sala['reservas'] += signo
+        sala[f"{datos['estado']}s"] += signo
+        sala['minutos_reservados'] += signo * minutos
+        if datos['estado'] == 'confirmada':
+            sala['minutos_confirmados'] += signo * minutos
+
+        por_carrera = self.carreras[(datos['fecha'], carrera or SIN_CARRERA)]
+        por_carrera['reservas'] += signo
+        por_carrera['canceladas'] += signo * (datos['estado'] == 'cancelada')
+        por_carrera['minutos_reservados'] += signo * minutos
+
+    def aplicar(self):
+        for (sala_id, fecha), cambios in self.salas.items():
+            _aplicar(ResumenDiario, {'sala_id': sala_id, 'fecha': fecha}, cambios)
+        for (fecha, carrera), cambios in self.carreras.items():
+            _aplicar(ResumenCarrera, {'fecha': fecha, 'carrera': carrera}, cambios)
+
+    def crear(self, resumen_diario=ResumenDiario, resumen_carrera=ResumenCarrera):
+        """Inserta los totales como filas nuevas (los modelos pueden ser los históricos de una migración)"""
+        resumen_diario.objects.bulk_create(
+            [
+                resumen_diario(sala_id=sala_id, fecha=fecha, **{c: cambios[c] for c in CAMPOS_RESUMEN})
+                for (sala_id, fecha), cambios in self.salas.items()
+            ],
+            batch_size=5000,
+        )
+        resumen_carrera.objects.bulk_create(
+            [
+                resumen_carrera(fecha=fecha, carrera=carrera, **{c: cambios[c] for c in CAMPOS_CARRERA})
+                for (fecha, carrera), cambios in self.carreras.items()
+            ],
+            batch_size=5000,
+        )
+
+
+def _aplicar(modelo, clave, cambios):
+    cambios = {campo: valor for campo, valor in cambios.items() if valor}
+    if not cambios:
+        return
+    incrementos = {campo: F(campo) + valor for campo, valor in cambios.items()}
+    if modelo.objects.filter(**clave).update(**incrementos):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**clave, **cambios)
+    except IntegrityError:
+        # Otra transacción creó la fila entre el UPDATE y el INSERT
+        modelo.objects.filter(**clave).update(**incrementos)
+
+
+def _carreras(usuario_ids):
+    return dict(Usuario.objects.filter(pk__in=usuario_ids).values_list('id', 'carrera'))
+
+
+def _con_carrera(cambios):
+    """
+    Fija en cada versión la carrera actual de su usuario. Los deltas
+    encolados la conservan, así que un cambio de carrera posterior (que
+    traspasa las reservas ya guardadas) no los cuenta dos veces.
+    """
+    faltan = {datos['usuario_id'] for par in cambios for datos in par if datos and 'carrera' not in datos}
+    carreras = _carreras(faltan) if faltan else {}
+
+    def fijar(datos):
+        if datos is None or 'carrera' in datos:
+            return datos
+        return {**datos, 'carrera': carreras.get(datos['usuario_id'], '')}
+
+    return [(fijar(anterior), fijar(nueva)) for anterior, nueva in cambios]
+
+
+def registrar_cambio(anterior, nueva):
+    """Actualiza los resúmenes al pasar una reserva de ``anterior`` a ``nueva`` (dicts de ``valores``; None si no existe)"""
+    registrar_cambios([(anterior, nueva)])
+
+
+def registrar_lote(reservas):
+    """Suma al resumen reservas nuevas insertadas sin signals (bulk_create)"""
+    registrar_cambios([(None, valores(reserva)) for reserva in reservas])
+
+
+def registrar_cambios(cambios):
+    """
+    Con ANALITICA_DIFERIDA los deltas se encolan (tarea ``analitica``) y el
+    trabajador aplica los de muchas escrituras juntas: las peticiones no
+    esperan por las filas de resumen más disputadas (un día, una carrera).
+    """
+    cambios = [(anterior, nueva) for anterior, nueva in cambios if anterior != nueva]
+    if not cambios:
+        return
+    if getattr(settings, 'ANALITICA_DIFERIDA', False):
+        tareas.encolar('analitica', cambios=_con_carrera(cambios))
+        return
+    aplicar_cambios(cambios)
+
+
+def aplicar_cambios(cambios):
+    """Aplica ``[(anterior, nueva), ...]`` con un UPDATE por fila de resumen tocada"""
+    deltas = Deltas()
+    for anterior, nueva in _con_carrera(cambios):
+        if anterior:
+            deltas.sumar(anterior, anterior['carrera'], signo=-1)
+        if nueva:
+            deltas.sumar(nueva, nueva['carrera'])
+    deltas.aplicar()
+
+
+def cambiar_carrera(usuario_id, anterior, nueva):
+    """
+    Traspasa el aporte de las reservas del usuario de la carrera ``anterior``
+    a ``nueva``. Los resúmenes por sala no cambian (sus deltas se anulan).
+    """
+    reservas = Reserva.objects.filter(usuario_id=usuario_id).order_by().values(*CAMPOS_VALORES)
+    registrar_cambios([
+        ({**datos, 'carrera': anterior}, {**datos, 'carrera': nueva})
+        for datos in reservas.iterator(chunk_size=5000)
+    ])
+
+
+def sumar_reservas(filas):
+    """Deltas de todas las reservas de ``filas``: tuplas de CAMPOS_VALORES más la carrera del usuario"""
+    deltas = Deltas()
+    for *datos, carrera in filas:
+        deltas.sumar(dict(zip(CAMPOS_VALORES, datos)), carrera)
+    return deltas
+
+
+def reconstruir():
+    """Recalcula ambos resúmenes desde la tabla de reservas. Devuelve (filas de salas, filas de carreras)"""
+    inicio = timezone.now()
+    deltas = sumar_reservas(
+        Reserva.objects.order_by().values_list(*CAMPOS_VALORES, 'usuario__carrera').iterator(chunk_size=5000)
+    )
+
+    with transaction.atomic():
+        # Los deltas encolados antes de leer las reservas ya están contados
+        Tarea.objects.filter(nombre='analitica', estado=Tarea.PENDIENTE, fecha_creacion__lte=inicio).delete()
+        ResumenDiario.objects.all().delete()
+        ResumenCarrera.objects.all().delete()
+        deltas.crear()
+    return len(deltas.salas), len(deltas.carreras)
+
+
+# ============================
+# Reportes
+# ============================
+def _tasa(numerador, denominador):
+    return round(numerador / denominador, 4) if denominador else 0.0
+
+
+def _totales(queryset, hoy):
+    pasado = Q(fecha__lt=hoy)
+    return queryset.annotate(
+        total_reservas=Sum('reservas'),
+        total_canceladas=Sum('canceladas'),
+        total_minutos=Sum('minutos_reservados'),
+        total_minutos_confirmados=Sum('minutos_confirmados'),
+        reservas_pasadas=Sum('reservas', filter=pasado),
+        canceladas_pasadas=Sum('canceladas', filter=pasado),
+        pendientes_pasadas=Sum('pendientes', filter=pasado),
+    )
+
+
+def _metricas(fila, capacidad_minutos):
+    # Una reserva que llegó a su fecha sin confirmarse cuenta como no-show
+    activas_pasadas = (fila['reservas_pasadas'] or 0) - (fila['canceladas_pasadas'] or 0)
+    return {
+        'reservas': fila['total_reservas'] or 0,
+        'minutos_reservados': fila['total_minutos'] or 0,
+        'tasa_ocupacion': _tasa(fila['total_minutos'] or 0, capacidad_minutos),
+        'tasa_ocupacion_confirmada': _tasa(fila['total_minutos_confirmados'] or 0, capacidad_minutos),
+        'tasa_cancelacion': _tasa(fila['total_canceladas'] or 0, fila['total_reservas'] or 0),
+        'tasa_no_show': _tasa(fila['pendientes_pasadas'] or 0, activas_pasadas),
+    }
+
+
+def por_sala(desde, hasta, sala=None):
+    dias = (hasta - desde).days + 1
+    queryset = ResumenDiario.objects.filter(fecha__range=(desde, hasta))
+    if sala:
+        queryset = queryset.filter(sala_id=sala)
+    filas = _totales(queryset.values('sala_id', 'sala__nombre'), timezone.localdate()).order_by('sala__nombre')
+    return [
+        {'sala': fila['sala_id'], 'sala_nombre': fila['sala__nombre'], **_metricas(fila, dias * MINUTOS_DIA)}
+        for fila in filas
+    ]
+
+
+def diario(desde, hasta, sala=None):
+    """Una fila por día con reservas (utilización de todas las salas, o de ``sala``)"""
+    queryset = ResumenDiario.objects.filter(fecha__range=(desde, hasta))
+    if sala:
+        queryset = queryset.filter(sala_id=sala)
+    salas = 1 if sala else Sala.objects.count()
+    filas = _totales(queryset.values('fecha'), timezone.localdate()).order_by('fecha')
+    return [{'fecha': fila['fecha'], **_metricas(fila, salas * MINUTOS_DIA)} for fila in filas]
+
+
+def horas_punta(desde, hasta, sala=None):
+    """Minutos ocupados por hora del día, a partir de los mapas de ocupación"""
+    queryset = DisponibilidadSala.objects.filter(fecha__range=(desde, hasta))
+    if sala:
+        queryset = queryset.filter(sala_id=sala)
+    bloques = [0] * disponibilidad.N_BLOQUES
+    for ocupacion in queryset.values_list('ocupacion', flat=True).iterator(chunk_size=5000):
+        while ocupacion:
+            bit = ocupacion & -ocupacion
+            bloques[bit.bit_length() - 1] += 1
+            ocupacion ^= bit
+
+    capacidad = ((hasta - desde).days + 1) * (1 if sala else Sala.objects.count())
+    resultado = []
+    for hora in range(disponibilidad.HORA_APERTURA, disponibilidad.HORA_CIERRE):
+        inicio = (hora - disponibilidad.HORA_APERTURA) * BLOQUES_HORA
+        minutos = sum(bloques[inicio:inicio + BLOQUES_HORA]) * disponibilidad.MINUTOS_BLOQUE
+        resultado.append({
+            'hora': f'{hora:02d}:00',
+            'minutos_ocupados': minutos,
+            'tasa_ocupacion': _tasa(minutos, capacidad * 60),
+        })
+    return resultado
+
+
+def por_carrera(desde, hasta):
+    filas = ResumenCarrera.objects.filter(fecha__range=(desde, hasta)).values('carrera').annotate(
+        total_reservas=Sum('reservas'),
+        total_canceladas=Sum('canceladas'),
+        total_minutos=Sum('minutos_reservados'),
+    ).order_by('-total_minutos', 'carrera')
+    return [
+        {
+            'carrera': fila['carrera'],
+            'reservas': fila['total_reservas'],
+            'minutos_reservados': fila['total_minutos'],
+            'tasa_cancelacion': _tasa(fila['total_canceladas'], fila['total_reservas']),
+        }
+        for fila in filas
+    ]
@@ -0,0 +1,128 @@
+"""
+Versiones async de las lecturas más frecuentes de la API, sobre el ORM async
+de Django. Con ``settings.API_ASYNC`` (activado en reservas_proyecto.asgi)
+reemplazan en las mismas rutas a las acciones de DRF: bajo ASGI, una
+petición que espera a la base de datos o a un cliente lento no ocupa un hilo
+del worker.
+
+Responden lo mismo que sus equivalentes de DRF (datos, ETag, caché del
+catálogo y réplicas), siempre en JSON. Los querysets y serializers son los
+de los ViewSets, instanciados sin pasar por su dispatch.
+"""
+from functools import wraps
+
+from django.utils import timezone
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+
+from reservas_proyecto.replicas import aalias_lectura, usar
+from .authentication import CachedJWTAuthentication
+from .cache_salas import respuesta_cacheada_async
+from .condicional import respuesta_condicional
+from .models import Reserva, SerieReserva
+from .renderers import respuesta_json
+from .serializers import UsuarioSerializer
+from .views import SalaViewSet, ReservaViewSet, areservas_paginadas
+
+
+def _error(exc, request=None):
+    # Mismo cuerpo y cabeceras que el exception_handler de DRF
+    datos = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    cabeceras = {}
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        cabeceras['WWW-Authenticate'] = CachedJWTAuthentication().authenticate_header(request)
+    return respuesta_json(datos, status=exc.status_code, headers=cabeceras)
+
+
+def api_async(vista):
+    """
+    Decorador para las vistas de este módulo: solo GET, usuario autenticado
+    por JWT (IsAuthenticated) y ``request`` como Request de DRF
+    """
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return _error(exceptions.MethodNotAllowed(request.method))
+        try:
+            resultado = await CachedJWTAuthentication().aauthenticate(request)
+            if resultado is None:
+                raise exceptions.NotAuthenticated()
+            request = Request(request)
+            request.user = resultado[0]
+            return await vista(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return _error(exc, request)
+    return envoltura
+
+
+def _vista(clase, request, accion):
+    """Instancia del ViewSet para reutilizar sus querysets, serializers y validadores"""
+    return clase(request=request, action=accion, format_kwarg=None, args=(), kwargs={})
+
+
+@api_async
+async def check_auth(request):
+    """CheckAuthView"""
+    usuario = request.user
+    return respuesta_json({
+        'is_authenticated': True,
+        'user': {
+            'id': usuario.id,
+            'email': usuario.email,
+            'nombre_completo': usuario.get_full_name(),
+            'rol': usuario.rol,
+            'es_admin': usuario.es_admin,
+        }
+    })
+
+
+@api_async
+async def usuario_me(request):
+    """UsuarioViewSet.me"""
+    usuario = request.user
+    # Sin la anotación, UsuarioSerializer contaría con una consulta síncrona
+    usuario.num_reservas = await usuario.reservas.acount()
+    return respuesta_json(UsuarioSerializer(usuario, context={'request': request}).data)
+
+
+@api_async
+async def salas_disponibles(request):
+    """SalaViewSet.disponibles"""
+    vista = _vista(SalaViewSet, request, 'disponibles')
+
+    async def generar():
+        salas = [sala async for sala in vista.get_queryset().filter(estado='disponible')]
+        return vista.get_serializer(salas, many=True).data
+
+    with usar(await aalias_lectura(request)):
+        return await respuesta_cacheada_async(request, generar)
+
+
+@api_async
+async def reservas_hoy(request):
+    """ReservaViewSet.hoy"""
+    vista = _vista(ReservaViewSet, request, 'hoy')
+    hoy = timezone.now().date()
+
+    async def generar():
+        series = [serie async for serie in vista.series_hoy(hoy)]
+        return respuesta_json(await areservas_paginadas(
+            request, vista.reservas_hoy(hoy), view=vista, series=series, desde=hoy, hasta=hoy,
+        ))
+
+    with usar(await aalias_lectura(request)):
+        return await respuesta_condicional(request, vista, generar)
+
+
+@api_async
+async def mis_reservas(request):
+    """ReservaViewSet.mis_reservas"""
+    vista = _vista(ReservaViewSet, request, 'mis_reservas')
+
+    async def generar():
+        reservas = Reserva.objects.filter(usuario=request.user).para_listado()
+        series = [serie async for serie in SerieReserva.objects.filter(usuario=request.user).para_listado()]
+        return respuesta_json(await areservas_paginadas(request, reservas, view=vista, series=series))
+
+    with usar(await aalias_lectura(request)):
+        return await respuesta_condicional(request, vista, generar)
@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+Usuario = get_user_model()
+
+# Columnas que usan la API y los serializers a partir de request.user. El resto
+# (p. ej. password) queda diferido y se cargaría de la BD solo si se accede.
+CAMPOS_CACHEADOS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'rol',
+    'is_active', 'is_staff', 'is_superuser',
+    'telefono', 'carrera', 'fecha_registro', 'date_joined',
+)
+
+
+def usuario_a_dict(usuario):
+    return {campo: getattr(usuario, campo) for campo in CAMPOS_CACHEADOS}
+
+
+def usuario_desde_dict(datos):
+    """Instancia nueva por petición, como si viniera de la BD con campos diferidos"""
+    # from_db espera los valores en el orden de los campos concretos del modelo
+    campos = [f.attname for f in Usuario._meta.concrete_fields if f.attname in datos]
+    return Usuario.from_db(DEFAULT_DB_ALIAS, campos, [datos[campo] for campo in campos])
+
+
+class CacheUsuariosLocal:
+    """LRU en memoria del proceso con TTL corto"""
+
+    def __init__(self, ttl, maximo):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, user_id):
+        with self._lock:
+            entrada = self._datos.get(user_id)
+            if entrada is None:
+                return None
+            expira, datos = entrada
+            if expira < time.monotonic():
+                del self._datos[user_id]
+                return None
+            self._datos.move_to_end(user_id)
+            return datos
+
+    def guardar(self, user_id, datos):
+        with self._lock:
+            self._datos[user_id] = (time.monotonic() + self.ttl, datos)
+            self._datos.move_to_end(user_id)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._datos.pop(user_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+class CacheUsuariosDjango:
+    """Usa un caché de Django (compartido entre procesos si el backend lo es)"""
+
+    def __init__(self, ttl, maximo, alias='default'):
+        self.ttl = ttl
+        self.cache = caches[alias]
+
+    def _clave(self, user_id):
+        return f'reservas:jwt_usuario:{user_id}'
+
+    def obtener(self, user_id):
+        return self.cache.get(self._clave(user_id))
+
+    def guardar(self, user_id, datos):
+        self.cache.set(self._clave(user_id), datos, self.ttl)
+
+    def invalidar(self, user_id):
+        self.cache.delete(self._clave(user_id))
+
+    def limpiar(self):
+        pass
+
+
+def _crear_cache():
+    config = getattr(settings, 'JWT_CACHE_USUARIOS', {})
+    backend = import_string(config.get('BACKEND', 'reservas.authentication.CacheUsuariosLocal'))
+    opciones = config.get('OPCIONES', {})
+    return backend(ttl=config.get('TTL', 30), maximo=config.get('MAXIMO', 10000), **opciones)
+
+
+cache_usuarios = _crear_cache()
+
+
+def invalidar_usuario(user_id):
+    cache_usuarios.invalidar(str(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que evita la consulta del usuario por cada petición:
+    los datos del usuario se guardan por ``user_id`` en ``cache_usuarios`` y
+    se invalidan al guardar/eliminar el Usuario o al invalidar uno de sus tokens.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        datos = cache_usuarios.obtener(str(user_id))
+        if datos is None:
+            usuario = super().get_user(validated_token)
+            cache_usuarios.guardar(str(user_id), usuario_a_dict(usuario))
+            return usuario
+
+        if not datos['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return usuario_desde_dict(datos)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() para vistas async de Django (``request`` es un
+        HttpRequest): si el usuario no está en caché se lee con el ORM async
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        datos = cache_usuarios.obtener(str(user_id))
+        if datos is None:
+            try:
+                usuario = await Usuario.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except Usuario.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            if api_settings.CHECK_USER_IS_ACTIVE and not usuario.is_active:
+                raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+            if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(usuario.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+            cache_usuarios.guardar(str(user_id), usuario_a_dict(usuario))
+            return usuario
+
+        if not datos['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return usuario_desde_dict(datos)
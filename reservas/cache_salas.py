@@ -0,0 +1,153 @@
+"""
+Caché de respuestas del catálogo de salas (/api/salas/, /api/salas/<id>/ y
+/api/salas/disponibles/).
+
+Cada respuesta se guarda bajo una clave que incluye un número de versión
+global; cualquier cambio que afecte al catálogo solo incrementa la versión,
+así que las entradas anteriores dejan de usarse (y expiran solas) sin tener
+que enumerarlas. El ETag se deriva de la versión y de la clave, por lo que
+un If-None-Match vigente se responde con 304 sin leer la entrada ni la BD.
+
+La versión vive en CACHES, así que con varios procesos el caché debe ser
+compartido (CACHE_REDIS_URL). Con LocMemCache cada proceso tiene su propia
+versión: la versión y las entradas duran solo ``TTL_LOCAL`` segundos, lo que
+acota cuánto tiempo los demás procesos sirven el catálogo anterior.
+
+Con réplicas (reservas_proyecto.replicas), durante la ventana que sigue a
+un cambio las respuestas se generan desde la primaria: una réplica atrasada
+dejaría datos viejos cacheados (y un ETag válido) bajo la versión nueva.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from rest_framework import status
+from rest_framework.response import Response
+
+from reservas_proyecto import replicas
+
+from .renderers import respuesta_json
+
+VERSION_KEY = 'reservas:salas:version'
+CAMBIO_RECIENTE_KEY = 'reservas:salas:cambio_reciente'
+
+
+def _config():
+    return {'TTL': 3600, 'TTL_LOCAL': 5, 'MAX_AGE': 0, **getattr(settings, 'SALAS_CACHE', {})}
+
+
+def _por_proceso():
+    return isinstance(caches['default'], LocMemCache)
+
+
+def _ttl(config):
+    """Vida de las entradas: corta si el caché no se comparte entre procesos"""
+    return min(config['TTL'], config['TTL_LOCAL']) if _por_proceso() else config['TTL']
+
+
+def _ttl_version():
+    return _config()['TTL_LOCAL'] if _por_proceso() else None
+
+
+def version():
+    # La versión inicial es un instante en ms: tras vaciar el caché (o al
+    # expirar la versión local) no se repiten ETags emitidos antes
+    cache.add(VERSION_KEY, int(time.time() * 1000), _ttl_version())
+    return cache.get(VERSION_KEY)
+
+
+async def aversion():
+    await cache.aadd(VERSION_KEY, int(time.time() * 1000), _ttl_version())
+    return await cache.aget(VERSION_KEY)
+
+
+def _incrementar():
+    if replicas.habilitadas():
+        cache.set(CAMBIO_RECIENTE_KEY, True, replicas.ventana())
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), _ttl_version())
+
+
+def invalidar_salas(**kwargs):
+    """Handler de signals: nueva versión cuando la transacción en curso confirme"""
+    transaction.on_commit(_incrementar)
+
+
+def invalidar_por_reserva(sender, instance, created=True, **kwargs):
+    # El catálogo muestra total_reservas: solo crear o borrar lo cambia
+    if created:
+        invalidar_salas()
+
+
+def clave(request, version_actual):
+    parametros = urlencode(sorted(request.query_params.lists()), doseq=True)
+    return f'reservas:salas:{version_actual}:{request.path}?{parametros}'
+
+
+def etag(clave_respuesta):
+    return '"salas-%s"' % hashlib.md5(clave_respuesta.encode()).hexdigest()
+
+
+def respuesta_cacheada(metodo):
+    """
+    Decorador para acciones de lectura de SalaViewSet: responde 304 si el
+    If-None-Match coincide, o los datos cacheados de la versión vigente.
+    Solo se guardan las respuestas 200.
+    """
+    @wraps(metodo)
+    def envoltura(self, request, *args, **kwargs):
+        config = _config()
+        clave_respuesta = clave(request, version())
+        cabeceras = {'ETag': etag(clave_respuesta)}
+
+        if cabeceras['ETag'] in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+        else:
+            datos = cache.get(clave_respuesta)
+            if datos is None:
+                alias = replicas.alias_actual()
+                if alias is not None and cache.get(CAMBIO_RECIENTE_KEY):
+                    alias = None
+                with replicas.usar(alias):
+                    response = metodo(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                datos = response.data
+                cache.set(clave_respuesta, datos, _ttl(config))
+            response = Response(datos, headers=cabeceras)
+        patch_cache_control(response, private=True, max_age=config['MAX_AGE'], must_revalidate=True)
+        return response
+    return envoltura
+
+
+async def respuesta_cacheada_async(request, generar):
+    """
+    respuesta_cacheada para vistas async: ``generar()`` es una corrutina
+    que devuelve los datos de la respuesta
+    """
+    config = _config()
+    clave_respuesta = clave(request, await aversion())
+    cabeceras = {'ETag': etag(clave_respuesta)}
+
+    if cabeceras['ETag'] in request.headers.get('If-None-Match', ''):
+        response = respuesta_json(None, status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+    else:
+        datos = await cache.aget(clave_respuesta)
+        if datos is None:
+            alias = replicas.alias_actual()
+            if alias is not None and await cache.aget(CAMBIO_RECIENTE_KEY):
+                alias = None
+            with replicas.usar(alias):
+                datos = await generar()
+            await cache.aset(clave_respuesta, datos, _ttl(config))
+        response = respuesta_json(datos, headers=cabeceras)
+    patch_cache_control(response, private=True, max_age=config['MAX_AGE'], must_revalidate=True)
+    return response
@@ -0,0 +1,111 @@
+"""
+Feed de cambios incremental (/api/cambios/).
+
+Cada tabla (reservas, salas y eliminaciones) se recorre por su marca de
+tiempo de modificación + id, con un cursor compuesto opaco. Solo se devuelven
+filas con al menos ``CAMBIOS_MARGEN_SEGUNDOS`` de antigüedad, para no saltar
+transacciones que aún no han hecho commit con una marca anterior.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Sala, Reserva, Eliminacion
+
+# Tabla -> (modelo, campo de marca de tiempo)
+FUENTES = {
+    'reservas': (Reserva, 'fecha_modificacion'),
+    'salas': (Sala, 'fecha_modificacion'),
+    'eliminados': (Eliminacion, 'fecha'),
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _a_micro(fecha):
+    return (fecha - EPOCH) // timedelta(microseconds=1)
+
+
+def _desde_micro(micro):
+    return EPOCH + timedelta(microseconds=micro)
+
+
+def codificar_cursor(posiciones):
+    datos = json.dumps(posiciones, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode((cursor + relleno).encode()).decode())
+        return {
+            fuente: [int(datos[fuente][0]), int(datos[fuente][1])]
+            for fuente in FUENTES
+        }
+    except (TypeError, ValueError, KeyError, IndexError):
+        raise CursorInvalido('Cursor inválido')
+
+
+def _filtrar_usuario(fuente, queryset, usuario):
+    if usuario.es_admin:
+        return queryset
+    if fuente == 'reservas':
+        return queryset.filter(usuario=usuario)
+    if fuente == 'eliminados':
+        return queryset.filter(Q(modelo='sala') | Q(propietario=usuario.pk))
+    return queryset
+
+
+def cursor_actual(usuario):
+    """Posición actual de cada tabla (para clientes que recién comienzan)"""
+    corte = timezone.now() - timedelta(seconds=settings.CAMBIOS_MARGEN_SEGUNDOS)
+    posiciones = {}
+    for fuente, (modelo, campo) in FUENTES.items():
+        queryset = _filtrar_usuario(fuente, modelo.objects.filter(**{f'{campo}__lte': corte}), usuario)
+        ultimo = queryset.order_by(f'-{campo}', '-id').values_list(campo, 'id').first()
+        posiciones[fuente] = [_a_micro(ultimo[0]), ultimo[1]] if ultimo else [0, 0]
+    return codificar_cursor(posiciones)
+
+
+def obtener_cambios(usuario, cursor):
+    """
+    Filas modificadas después del cursor, por tabla y en orden (marca, id).
+    Devuelve ``(querysets, siguiente_cursor, hay_mas)``; el cursor solo avanza
+    hasta la última fila devuelta, así que sin cambios queda igual (y el
+    ETag también).
+    """
+    posiciones = decodificar_cursor(cursor)
+    corte = timezone.now() - timedelta(seconds=settings.CAMBIOS_MARGEN_SEGUNDOS)
+    limite = settings.CAMBIOS_LIMITE
+
+    filas = {}
+    siguiente = {}
+    hay_mas = False
+    for fuente, (modelo, campo) in FUENTES.items():
+        marca, ultimo_id = posiciones[fuente]
+        desde = _desde_micro(marca)
+        queryset = modelo.objects.filter(
+            Q(**{f'{campo}__gt': desde}) | Q(**{campo: desde, 'id__gt': ultimo_id}),
+            **{f'{campo}__lte': corte},
+        )
+        queryset = _filtrar_usuario(fuente, queryset, usuario)
+        claves = list(queryset.order_by(campo, 'id').values_list(campo, 'id')[:limite])
+        hay_mas = hay_mas or len(claves) == limite
+        filas[fuente] = [pk for _, pk in claves]
+        siguiente[fuente] = [_a_micro(claves[-1][0]), claves[-1][1]] if claves else [marca, ultimo_id]
+
+    return filas, codificar_cursor(siguiente), hay_mas
+
+
+def etag(cursor, siguiente, hay_mas):
+    return '"' + hashlib.md5(f'{cursor}|{siguiente}|{hay_mas}'.encode()).hexdigest() + '"'
@@ -0,0 +1,156 @@
+"""
+GET condicional (ETag / Last-Modified) para las lecturas de ReservaViewSet.
+
+Los validadores salen de cada queryset del que depende la respuesta, más el
+usuario, la acción y los parámetros:
+
+- la ventana de la página (un queryset recortado, ver
+  ReservaConSeriesPagination.ventana): los pares (id, fecha_modificacion)
+  de sus filas, a lo sumo page_size + 1 y leídos del índice del listado;
+- los demás (series, una reserva): MAX(fecha_modificacion) y COUNT.
+
+Toda modificación actualiza fecha_modificacion (auto_now), y los ids (o el
+COUNT) delatan las altas y bajas. Un 304 se responde sin leer la página
+completa ni serializar nada, y sin agregar sobre toda la tabla. El ETag
+incluye además la fecha del día, de la que dependen /hoy/ y las ocurrencias
+de las series.
+
+Los listados se validan solo con el ETag, sin Last-Modified: una fila puede
+salir de un listado filtrado sin lápida ni fecha más reciente en la ventana
+(una pendiente que se confirma, la serie que se elimina, el cambio de día),
+así que If-Modified-Since respondería 304 con datos viejos. Last-Modified
+queda para el detalle de una reserva.
+
+El ETag no cubre cambios en datos de otras tablas que se muestran en el
+listado (nombre del usuario o de la sala).
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .renderers import respuesta_json
+
+
+AGREGADOS = {'ultima': Max('fecha_modificacion'), 'total': Count('pk')}
+
+
+def _resumen(claves):
+    """Agregado de una ventana a partir de sus pares (id, fecha_modificacion)"""
+    return {
+        'ultima': max((fecha for _, fecha in claves), default=None),
+        'total': hashlib.md5(repr(claves).encode()).hexdigest(),
+    }
+
+
+def _etag(fuentes, filas, partes):
+    ultima = None
+    totales = []
+    for fila in filas:
+        totales.append(fila['total'])
+        if fila['ultima'] is not None and (ultima is None or fila['ultima'] > ultima):
+            ultima = fila['ultima']
+    base = '|'.join(str(parte) for parte in [
+        ultima.isoformat() if ultima else '', *totales, *partes, timezone.localdate(),
+    ])
+    etag = '"r-%s"' % hashlib.md5(base.encode()).hexdigest()
+    if any(queryset.query.is_sliced for queryset in fuentes):
+        # Listado: sin Last-Modified
+        return etag, None
+    return etag, ultima
+
+
+def validadores(fuentes, *partes):
+    """(etag, última modificación o None si la respuesta es un listado) de los querysets ``fuentes``"""
+    return _etag(fuentes, [
+        _resumen(list(queryset.values_list('pk', 'fecha_modificacion')))
+        if queryset.query.is_sliced else queryset.order_by().aggregate(**AGREGADOS)
+        for queryset in fuentes
+    ], partes)
+
+
+async def avalidadores(fuentes, *partes):
+    filas = []
+    for queryset in fuentes:
+        if queryset.query.is_sliced:
+            filas.append(_resumen([clave async for clave in queryset.values_list('pk', 'fecha_modificacion')]))
+        else:
+            filas.append(await queryset.order_by().aaggregate(**AGREGADOS))
+    return _etag(fuentes, filas, partes)
+
+
+def _coincide(if_none_match, etag):
+    etiquetas = [e.strip() for e in if_none_match.split(',')]
+    return '*' in etiquetas or etag in etiquetas or f'W/{etag}' in etiquetas
+
+
+def _cabeceras(etag, ultima):
+    cabeceras = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if ultima is not None:
+        cabeceras['Last-Modified'] = http_date(ultima.timestamp())
+    return cabeceras
+
+
+def _no_modificado(request, etag, ultima):
+    if_none_match = request.headers.get('If-None-Match')
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if if_none_match is not None:
+        # Con ambos, If-None-Match tiene prioridad (RFC 9110 §13.2.2)
+        return _coincide(if_none_match, etag)
+    # ``ultima`` es None en los listados y si la reserva ya no existe
+    return if_modified_since is not None and ultima is not None and int(ultima.timestamp()) <= if_modified_since
+
+
+def _partes(request, accion):
+    return request.user.pk, request.user.es_admin, accion, request.get_full_path()
+
+
+def get_condicional(metodo):
+    """
+    Decorador para acciones de lectura de ReservaViewSet: la vista define
+    ``fuentes_condicionales()`` (querysets de la acción en curso, o None
+    para no aplicar validadores).
+    """
+    @wraps(metodo)
+    def envoltura(self, request, *args, **kwargs):
+        fuentes = self.fuentes_condicionales()
+        if fuentes is None:
+            return metodo(self, request, *args, **kwargs)
+
+        etag, ultima = validadores(fuentes, *_partes(request, self.action))
+        cabeceras = _cabeceras(etag, ultima)
+        if _no_modificado(request, etag, ultima):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+
+        response = metodo(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            for nombre, valor in cabeceras.items():
+                response[nombre] = valor
+        return response
+    return envoltura
+
+
+async def respuesta_condicional(request, vista, generar):
+    """
+    get_condicional para vistas async: ``vista`` es la instancia de
+    ReservaViewSet de la acción y ``generar()`` una corrutina que devuelve
+    la respuesta.
+    """
+    fuentes = vista.fuentes_condicionales()
+    if fuentes is None:
+        return await generar()
+
+    etag, ultima = await avalidadores(fuentes, *_partes(request, vista.action))
+    cabeceras = _cabeceras(etag, ultima)
+    if _no_modificado(request, etag, ultima):
+        return respuesta_json(None, status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+
+    response = await generar()
+    if response.status_code == status.HTTP_200_OK:
+        for nombre, valor in cabeceras.items():
+            response[nombre] = valor
+    return response
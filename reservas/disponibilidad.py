@@ -0,0 +1,62 @@
+"""
+Mapas de bits de ocupación por sala y día.
+
+El horario de atención (08:00 a 22:00) se divide en bloques de 15 minutos;
+cada bloque es un bit de un entero, de modo que el día completo de una sala
+cabe en 56 bits y se actualiza con operaciones AND/OR en la base de datos.
+"""
+from datetime import time
+
+HORA_APERTURA = 8
+HORA_CIERRE = 22
+MINUTOS_BLOQUE = 15
+DURACION_MAXIMA_HORAS = 4
+
+N_BLOQUES = (HORA_CIERRE - HORA_APERTURA) * 60 // MINUTOS_BLOQUE
+MAPA_COMPLETO = (1 << N_BLOQUES) - 1
+
+
+def _bloque(hora, redondear_arriba=False):
+    minutos = (hora.hour - HORA_APERTURA) * 60 + hora.minute
+    bloque, resto = divmod(minutos, MINUTOS_BLOQUE)
+    if redondear_arriba and (resto or hora.second):
+        bloque += 1
+    return max(0, min(N_BLOQUES, bloque))
+
+
+def mascara(hora_inicio, hora_fin):
+    """Bits de los bloques que toca el intervalo [hora_inicio, hora_fin)"""
+    desde = _bloque(hora_inicio)
+    hasta = _bloque(hora_fin, redondear_arriba=True)
+    if hasta <= desde:
+        return 0
+    return ((1 << (hasta - desde)) - 1) << desde
+
+
+def hora_bloque(bloque):
+    minutos = HORA_APERTURA * 60 + bloque * MINUTOS_BLOQUE
+    return time(minutos // 60, minutos % 60)
+
+
+def rangos(mapa, ocupados=True):
+    """
+    Convierte un mapa en una lista de rangos contiguos ``[inicio, fin]``
+    con formato ``HH:MM``. Con ``ocupados=False`` devuelve los rangos libres.
+    """
+    if not ocupados:
+        mapa = ~mapa & MAPA_COMPLETO
+    resultado = []
+    bloque = 0
+    while mapa:
+        # Saltar hasta el siguiente bit encendido y medir la racha
+        salto = (mapa & -mapa).bit_length() - 1
+        mapa >>= salto
+        bloque += salto
+        racha = (~mapa & (mapa + 1)).bit_length() - 1
+        resultado.append([
+            hora_bloque(bloque).strftime('%H:%M'),
+            hora_bloque(bloque + racha).strftime('%H:%M'),
+        ])
+        mapa >>= racha
+        bloque += racha
+    return resultado
@@ -0,0 +1,95 @@
+from datetime import datetime, date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .models import Sala, Reserva
+
+Usuario = get_user_model()
+
+CACHE_KEY = 'reservas:estadisticas'
+
+# Horario de atención usado para calcular la ocupación (08:00 a 22:00)
+HORAS_POR_SALA = 14
+
+
+def _horas(hora_inicio, hora_fin):
+    inicio = datetime.combine(date.min, hora_inicio)
+    fin = datetime.combine(date.min, hora_fin)
+    return (fin - inicio).total_seconds() / 3600
+
+
+def calcular_estadisticas():
+    """
+    Calcula los contadores del dashboard de administración con agregaciones
+    agrupadas en SQL, sin traer filas individuales a Python.
+    """
+    hoy = timezone.localdate()
+
+    salas = Sala.objects.aggregate(
+        total=Count('id'),
+        disponibles=Count('id', filter=Q(estado='disponible')),
+        mantenimiento=Count('id', filter=Q(estado='mantenimiento')),
+    )
+
+    por_estado = {estado: 0 for estado, _ in Reserva.ESTADOS_RESERVA}
+    for fila in Reserva.objects.order_by().values('estado').annotate(total=Count('id')):
+        por_estado[fila['estado']] = fila['total']
+
+    por_fecha = {
+        fila['fecha'].isoformat(): fila['total']
+        for fila in Reserva.objects.order_by()
+        .filter(fecha__range=(hoy - timedelta(days=7), hoy + timedelta(days=7)))
+        .values('fecha').annotate(total=Count('id'))
+    }
+
+    por_sala = {
+        fila['sala__nombre']: fila['total']
+        for fila in Reserva.objects.order_by().values('sala__nombre').annotate(total=Count('id'))
+    }
+
+    # Las combinaciones distintas de horario del día son pocas: se agrupan en
+    # SQL y solo se suman en Python.
+    confirmadas_hoy = 0
+    horas_reservadas = 0.0
+    for fila in (
+        Reserva.objects.order_by()
+        .filter(fecha=hoy, estado='confirmada')
+        .values('hora_inicio', 'hora_fin').annotate(total=Count('id'))
+    ):
+        confirmadas_hoy += fila['total']
+        horas_reservadas += _horas(fila['hora_inicio'], fila['hora_fin']) * fila['total']
+
+    horas_disponibles = salas['disponibles'] * HORAS_POR_SALA
+    ocupacion = round(horas_reservadas / horas_disponibles * 100) if horas_disponibles else 0
+
+    return {
+        'total_reservas': sum(por_estado.values()),
+        'total_usuarios': Usuario.objects.count(),
+        'total_salas': salas['total'],
+        'salas_disponibles': salas['disponibles'],
+        'salas_mantenimiento': salas['mantenimiento'],
+        'reservas_por_estado': por_estado,
+        'reservas_por_fecha': por_fecha,
+        'reservas_por_sala': por_sala,
+        'reservas_hoy_confirmadas': confirmadas_hoy,
+        'horas_reservadas_hoy': horas_reservadas,
+        'ocupacion_hoy': ocupacion,
+        'fecha': hoy.isoformat(),
+    }
+
+
+def obtener_estadisticas():
+    """Estadísticas desde el caché; se recalculan al expirar o al invalidarse"""
+    datos = cache.get(CACHE_KEY)
+    if datos is None:
+        datos = calcular_estadisticas()
+        cache.set(CACHE_KEY, datos, settings.ESTADISTICAS_CACHE_TTL)
+    return datos
+
+
+def invalidar_estadisticas(**kwargs):
+    cache.delete(CACHE_KEY)
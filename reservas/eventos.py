@@ -0,0 +1,242 @@
+"""
+Difusión de eventos de reservas y salas a los clientes conectados por SSE
+(/api/eventos/).
+
+Las suscripciones son colas asyncio en el event loop del servidor ASGI, así
+que una conexión inactiva no ocupa un hilo. Los eventos se publican desde
+código síncrono (signals, tras el commit) y el backend los lleva a todos los
+procesos: ``BackendMemoria`` reparte solo dentro del proceso (tests, un solo
+worker), ``BackendSocketLocal`` entre workers de la misma máquina mediante
+sockets Unix de datagramas y ``BackendRedis`` vía pub/sub de Redis (o un
+servidor compatible). Se configura con ``settings.EVENTOS``.
+"""
+import asyncio
+import glob
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente, atada al event loop que la creó"""
+
+    def __init__(self, loop, filtro, maximo):
+        self.loop = loop
+        self.filtro = filtro
+        self.cola = asyncio.Queue(maximo)
+        self.desbordada = False
+
+    def entregar(self, evento):
+        # Se ejecuta en el hilo del event loop (call_soon_threadsafe)
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se corta y al reconectar se pone al día con /api/cambios/
+            self.desbordada = True
+
+    async def siguiente(self, timeout):
+        """Próximo evento, o None si pasan ``timeout`` segundos sin eventos"""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Difusor:
+    """Reparte los eventos que llegan del backend entre las suscripciones locales"""
+
+    def __init__(self, backend, maximo_cola=100):
+        self.backend = backend
+        self.maximo_cola = maximo_cola
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        backend.conectar(self.repartir)
+
+    def publicar(self, tipo, datos):
+        self.backend.publicar({'id': f'{os.getpid()}-{next(self._ids)}', 'tipo': tipo, 'datos': datos})
+
+    def repartir(self, evento):
+        """Llamado por el backend, desde cualquier hilo"""
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            if suscripcion.filtro is None or suscripcion.filtro(evento):
+                try:
+                    suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+                except RuntimeError:
+                    # Event loop cerrado: la suscripción quedó huérfana
+                    self.cancelar(suscripcion)
+
+    def suscribir(self, filtro=None):
+        suscripcion = Suscripcion(asyncio.get_running_loop(), filtro, self.maximo_cola)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        self.backend.escuchar()
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    @property
+    def conectados(self):
+        return len(self._suscripciones)
+
+
+def codificar(evento):
+    return json.dumps(evento, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+class BackendMemoria:
+    """Solo dentro del proceso"""
+
+    def conectar(self, repartir):
+        self.repartir = repartir
+
+    def publicar(self, evento):
+        # Misma forma que al cruzar procesos (fechas como texto, etc.)
+        self.repartir(json.loads(codificar(evento)))
+
+    def escuchar(self):
+        pass
+
+
+class BackendHilo:
+    """Base de los backends entre procesos: un hilo lector por proceso, que se
+    inicia con la primera suscripción (los workers sin clientes SSE solo publican)"""
+
+    def conectar(self, repartir):
+        self.repartir = repartir
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def escuchar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._leer, name='reservas-eventos', daemon=True)
+                self._hilo.start()
+
+    def _leer(self):
+        raise NotImplementedError
+
+
+class BackendSocketLocal(BackendHilo):
+    """
+    Workers de una misma máquina: cada proceso que escucha crea un socket
+    Unix de datagramas en ``directorio`` y los publicadores envían cada
+    evento a todos los sockets del directorio.
+    """
+
+    def __init__(self, directorio='/tmp/reservas-eventos'):
+        self.directorio = directorio
+        self._envio = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def publicar(self, evento):
+        datos = codificar(evento)
+        for ruta in glob.glob(os.path.join(self.directorio, '*.sock')):
+            try:
+                self._envio.sendto(datos, ruta)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Socket de un proceso que ya terminó
+                try:
+                    os.unlink(ruta)
+                except FileNotFoundError:
+                    pass
+            except OSError:
+                logger.warning('No se pudo entregar un evento a %s', ruta, exc_info=True)
+
+    def _leer(self):
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f'{os.getpid()}.sock')
+        if os.path.exists(ruta):
+            os.unlink(ruta)
+        recepcion = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        recepcion.bind(ruta)
+        while True:
+            datos = recepcion.recv(65536)
+            try:
+                self.repartir(json.loads(datos))
+            except Exception:
+                logger.exception('Evento inválido recibido en %s', ruta)
+
+
+class BackendRedis(BackendHilo):
+    """Pub/sub de Redis o de un servidor compatible (requiere el paquete ``redis``)"""
+
+    def __init__(self, url='redis://localhost:6379/0', canal='reservas:eventos'):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('BackendRedis requiere el paquete "redis"')
+        self.cliente = redis.Redis.from_url(url)
+        self.canal = canal
+
+    def publicar(self, evento):
+        try:
+            self.cliente.publish(self.canal, codificar(evento))
+        except Exception:
+            # Los eventos son una optimización: la escritura ya se confirmó
+            logger.warning('No se pudo publicar un evento en Redis', exc_info=True)
+
+    def _leer(self):
+        pubsub = self.cliente.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.canal)
+        for mensaje in pubsub.listen():
+            try:
+                self.repartir(json.loads(mensaje['data']))
+            except Exception:
+                logger.exception('Evento inválido recibido de Redis')
+
+
+def _crear_difusor():
+    config = getattr(settings, 'EVENTOS', {})
+    backend = import_string(config.get('BACKEND', 'reservas.eventos.BackendMemoria'))
+    return Difusor(backend(**config.get('OPCIONES', {})), maximo_cola=config.get('MAXIMO_COLA', 100))
+
+
+difusor = _crear_difusor()
+
+
+# ============================
+# Eventos del dominio
+# ============================
+def datos_reserva(reserva):
+    return {
+        'id': reserva.pk,
+        'usuario': reserva.usuario_id,
+        'sala': reserva.sala_id,
+        'fecha': reserva.fecha,
+        'hora_inicio': reserva.hora_inicio,
+        'hora_fin': reserva.hora_fin,
+        'estado': reserva.estado,
+    }
+
+
+def datos_sala(sala):
+    return {'id': sala.pk, 'nombre': sala.nombre, 'estado': sala.estado}
+
+
+def tipo_evento_reserva(estado_anterior, estado, creada):
+    if creada:
+        return 'reserva.creada'
+    if estado != estado_anterior and estado in ('confirmada', 'cancelada'):
+        return f'reserva.{estado}'
+    return 'reserva.actualizada'
+
+
+def visible_para(usuario):
+    """Filtro de suscripción: los usuarios regulares solo ven sus reservas"""
+    if usuario.es_admin:
+        return None
+    return lambda evento: not evento['tipo'].startswith('reserva.') or evento['datos']['usuario'] == usuario.pk
@@ -0,0 +1,130 @@
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .authentication import CachedJWTAuthentication
+from .models import Usuario
+from . import eventos
+
+SAL_TICKET = 'reservas.eventos.ticket'
+
+
+def _config():
+    return {'TICKET_TTL': 30, **getattr(settings, 'EVENTOS', {})}
+
+
+def sse_disponible(request):
+    """
+    Solo un servidor ASGI entrega el stream a medida que se genera. Bajo WSGI
+    (y runserver) Django junta el iterador async completo antes de enviar
+    nada: cada conexión ocuparía un hilo durante DURACION_MAXIMA y los
+    eventos llegarían todos juntos al final.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def sin_sse():
+    return JsonResponse({
+        'detail': 'Los eventos en vivo requieren un servidor ASGI',
+        'sondeo': '/api/cambios/',
+    }, status=501)
+
+
+def autenticar(request):
+    """Usuario del token de ``Authorization``, o None si no hay un token válido"""
+    try:
+        resultado = CachedJWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return resultado[0] if resultado is not None else None
+
+
+def usuario_de_ticket(ticket):
+    """
+    Usuario de un ticket de ``ticket_view``, o None si es inválido, expiró o
+    ya se usó. Los tickets solo sirven para abrir una conexión a este stream.
+    """
+    ttl = _config()['TICKET_TTL']
+    try:
+        user_id = signing.loads(ticket, salt=SAL_TICKET, max_age=ttl)
+    except signing.BadSignature:
+        return None
+    if not cache.add(f'reservas:ticket_eventos:{ticket}', True, ttl):
+        return None
+    return Usuario.objects.filter(pk=user_id, is_active=True).first()
+
+
+@csrf_exempt
+def ticket_view(request):
+    """
+    Emite un ticket de un solo uso y pocos segundos de vigencia para abrir
+    /api/eventos/. EventSource no permite enviar la cabecera Authorization,
+    y el token de acceso en la URL quedaría en los logs de accesos y proxies.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': 'Método no permitido'}, status=405)
+    if not sse_disponible(request):
+        return sin_sse()
+    usuario = autenticar(request)
+    if usuario is None:
+        return JsonResponse({'detail': 'Token inválido o ausente'}, status=401)
+    return JsonResponse({
+        'ticket': signing.dumps(usuario.pk, salt=SAL_TICKET),
+        'expira_en': _config()['TICKET_TTL'],
+    })
+
+
+async def flujo_eventos(usuario):
+    config = _config()
+    latido = config.get('LATIDO', 15)
+    fin = time.monotonic() + config.get('DURACION_MAXIMA', 300)
+
+    suscripcion = eventos.difusor.suscribir(eventos.visible_para(usuario))
+    try:
+        yield f"retry: {config.get('REINTENTO_MS', 3000)}\n\n"
+        # Cortar periódicamente acota las conexiones que el servidor no detecta
+        # como cerradas; EventSource reconecta solo.
+        while not suscripcion.desbordada and time.monotonic() < fin:
+            evento = await suscripcion.siguiente(latido)
+            if evento is None:
+                yield ': ping\n\n'
+                continue
+            datos = json.dumps(evento['datos'], separators=(',', ':'))
+            yield f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {datos}\n\n"
+    finally:
+        eventos.difusor.cancelar(suscripcion)
+
+
+async def eventos_view(request):
+    """
+    Stream SSE de eventos de reservas (creada, confirmada, cancelada,
+    actualizada, eliminada) y de cambios de estado de salas. Cada conexión
+    es solo una cola en el event loop; los eventos perdidos durante una
+    reconexión se recuperan con /api/cambios/. Se autentica con la cabecera
+    Authorization o con ``?ticket=`` (``ticket_view``). Fuera de ASGI responde
+    501 y los clientes consultan /api/cambios/ periódicamente.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': 'Método no permitido'}, status=405)
+    if not sse_disponible(request):
+        return sin_sse()
+    ticket = request.GET.get('ticket')
+    if ticket:
+        usuario = await sync_to_async(usuario_de_ticket)(ticket)
+    else:
+        usuario = await sync_to_async(autenticar)(request)
+    if usuario is None:
+        return JsonResponse({'detail': 'Token inválido o ausente'}, status=401)
+
+    response = StreamingHttpResponse(flujo_eventos(usuario), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
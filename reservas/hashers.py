@@ -0,0 +1,43 @@
+"""
+Hashers de contraseñas con parámetros tomados de ``settings.HASH_PASSWORD``.
+
+Conservan el nombre de algoritmo de Django, así que verifican los hashes ya
+guardados. Si el hash de un usuario tiene otro algoritmo u otros parámetros
+que el hasher preferido (el primero de PASSWORD_HASHERS), Django lo rehace
+con el preferido en su siguiente login correcto (``check_password``).
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher,
+)
+
+
+def _parametros(algoritmo):
+    return getattr(settings, 'HASH_PASSWORD', {}).get(algoritmo.upper(), {})
+
+
+class PBKDF2Ajustable(PBKDF2PasswordHasher):
+
+    def __init__(self):
+        self.iterations = _parametros('pbkdf2').get('ITERACIONES', self.iterations)
+
+
+class ScryptAjustable(ScryptPasswordHasher):
+
+    def __init__(self):
+        parametros = _parametros('scrypt')
+        self.work_factor = parametros.get('N', self.work_factor)
+        self.block_size = parametros.get('R', self.block_size)
+        self.parallelism = parametros.get('P', self.parallelism)
+        # OpenSSL rechaza por defecto más de 32 MiB (N=2**15 con r=8 ya los usa)
+        self.maxmem = 2 * 128 * self.work_factor * self.block_size * self.parallelism
+
+
+class Argon2Ajustable(Argon2PasswordHasher):
+    """Argon2id; requiere argon2-cffi"""
+
+    def __init__(self):
+        parametros = _parametros('argon2')
+        self.time_cost = parametros.get('TIEMPO', self.time_cost)
+        self.memory_cost = parametros.get('MEMORIA_KIB', self.memory_cost)
+        self.parallelism = parametros.get('PARALELISMO', self.parallelism)
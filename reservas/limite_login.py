@@ -0,0 +1,96 @@
+"""
+Límite de intentos de login por IP y por email (``settings.LIMITE_LOGIN``).
+
+Se comprueba antes de ``authenticate()``: un intento rechazado no llega a
+calcular ningún hash. Cada regla es una ventana deslizante de ``(intentos,
+segundos)`` guardada en memoria del proceso, sin ir a CACHES: con N workers
+el límite efectivo es hasta N veces el configurado.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+
+def _config():
+    return {
+        'HABILITADO': True,
+        'POR_IP': (100, 60),
+        'POR_EMAIL': (10, 300),
+        'MAXIMO_CLAVES': 100000,
+        **getattr(settings, 'LIMITE_LOGIN', {}),
+    }
+
+
+class VentanasDeslizantes:
+    """
+    Instantes de los últimos intentos por clave (como máximo ``intentos``:
+    el más antiguo indica cuándo se libera la ventana), en un LRU de
+    ``maximo_claves`` claves
+    """
+
+    def __init__(self):
+        self._intentos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def intentar(self, reglas, maximo_claves):
+        """
+        Registra un intento en cada clave de ``reglas`` ({clave: (intentos,
+        segundos)}) si ninguna está agotada. Devuelve 0 si se permitió o los
+        segundos hasta que se permita.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            espera = 0
+            for clave, (intentos, ventana) in reglas.items():
+                registro = self._intentos.get(clave)
+                if registro is not None and len(registro) >= intentos:
+                    espera = max(espera, registro[0] + ventana - ahora)
+            if espera > 0:
+                return espera
+            for clave, (intentos, _) in reglas.items():
+                registro = self._intentos.get(clave)
+                if registro is None or registro.maxlen != intentos:
+                    registro = self._intentos[clave] = deque(registro or (), maxlen=intentos)
+                registro.append(ahora)
+                self._intentos.move_to_end(clave)
+            while len(self._intentos) > maximo_claves:
+                self._intentos.popitem(last=False)
+            return 0
+
+    def limpiar(self):
+        with self._lock:
+            self._intentos.clear()
+
+
+ventanas = VentanasDeslizantes()
+
+
+def ip_cliente(request):
+    """IP del cliente según NUM_PROXIES de DRF (X-Forwarded-For tras un proxy)"""
+    return BaseThrottle().get_ident(request)
+
+
+def espera_login(ip, email):
+    """Segundos que debe esperar este intento de login (0: se permite y se registra)"""
+    config = _config()
+    if not config['HABILITADO']:
+        return 0
+    reglas = {f'ip:{ip}': config['POR_IP']}
+    if email:
+        reglas[f'email:{email.strip().lower()}'] = config['POR_EMAIL']
+    return ventanas.intentar(reglas, config['MAXIMO_CLAVES'])
+
+
+class LimiteLoginThrottle(BaseThrottle):
+    """Throttle de DRF para las vistas de login: 429 con Retry-After"""
+
+    def allow_request(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        self.espera = espera_login(ip_cliente(request), email if isinstance(email, str) else None)
+        return self.espera == 0
+
+    def wait(self):
+        return self.espera
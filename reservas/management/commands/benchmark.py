@@ -0,0 +1,378 @@
+import statistics
+import time
+from datetime import date, time as dtime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reservas.limite_login import ventanas
+from reservas.models import Usuario, Sala, Reserva
+from reservas.renderers import JSONRapidoRenderer
+from reservas.serializers import ReservaListSerializer, ReservaListadoRapido
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+class JWTAuthMiddlewareLegado:
+    """Comportamiento anterior: marcaba la sesión en cada petición con Bearer"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.headers.get('Authorization', '').startswith('Bearer '):
+            request.session['has_jwt_token'] = True
+        return self.get_response(request)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks de rendimiento. Todo se ejecuta dentro de una transacción "
+        "que se revierte al final, por lo que la base de datos queda intacta."
+    )
+
+    ESCENARIOS = ['crear_reserva', 'sesion_api', 'reservas_masivas', 'serializacion', 'conexiones', 'login']
+    # Escenarios que necesitan cerrar conexiones entre peticiones: no pueden
+    # ir dentro de la transacción y limpian lo que crean
+    SIN_TRANSACCION = {'conexiones'}
+
+    def add_arguments(self, parser):
+        parser.add_argument('escenario', choices=self.ESCENARIOS, help="Escenario a medir")
+        parser.add_argument(
+            '--tamanos', type=int, nargs='+', default=[1000, 10000, 100000],
+            help="Cantidad de filas en la tabla de reservas para cada medición",
+        )
+        parser.add_argument('--muestras', type=int, default=200, help="Operaciones medidas por tamaño")
+        parser.add_argument('--salas', type=int, default=50, help="Salas entre las que se reparten las filas")
+        parser.add_argument('--lote', type=int, default=1000, help="Reservas por lote en reservas_masivas")
+
+    def handle(self, *args, **options):
+        if options['escenario'] in self.SIN_TRANSACCION:
+            return getattr(self, f"bench_{options['escenario']}")(options)
+        with transaction.atomic():
+            getattr(self, f"bench_{options['escenario']}")(options)
+            transaction.set_rollback(True)
+
+    def reporte(self, etiqueta, tiempos):
+        ms = [t * 1000 for t in tiempos]
+        self.stdout.write(
+            f"{etiqueta:>24} | media {statistics.mean(ms):7.3f} ms"
+            f" | p50 {percentil(ms, 50):7.3f} ms | p95 {percentil(ms, 95):7.3f} ms"
+            f" | p99 {percentil(ms, 99):7.3f} ms"
+        )
+
+    # ------------------------------------------------------------------
+    # Escenarios
+    # ------------------------------------------------------------------
+    def bench_crear_reserva(self, options):
+        """Latencia de Reserva.save() (validación de solapamiento + INSERT)"""
+        usuario = Usuario.objects.create_user(
+            username='bench@bench.local', email='bench@bench.local', password=None,
+            first_name='Bench', last_name='Mark',
+        )
+        salas = Sala.objects.bulk_create([
+            Sala(nombre=f'BENCH-{i:04d}', capacidad=10, ubicacion='Bench', equipamiento='')
+            for i in range(options['salas'])
+        ])
+
+        inicio_relleno = date(2000, 1, 1)
+        inicio_muestras = date(2100, 1, 1)
+        filas = 0
+        n_muestra = 0
+        tiempos_por_tamano = []
+
+        for tamano in sorted(options['tamanos']):
+            # Rellenar la tabla hasta el tamaño pedido: 8 bloques por día y sala
+            lote = []
+            while filas < tamano:
+                bloque = filas % 8
+                dia = filas // (8 * len(salas))
+                lote.append(Reserva(
+                    usuario=usuario,
+                    sala=salas[(filas // 8) % len(salas)],
+                    fecha=inicio_relleno + timedelta(days=dia),
+                    hora_inicio=dtime(8 + bloque),
+                    hora_fin=dtime(9 + bloque),
+                    estado='confirmada',
+                    motivo_uso='relleno',
+                ))
+                filas += 1
+                if len(lote) >= 5000:
+                    Reserva.objects.bulk_create(lote)
+                    lote = []
+            if lote:
+                Reserva.objects.bulk_create(lote)
+
+            tiempos = []
+            for _ in range(options['muestras']):
+                reserva = Reserva(
+                    usuario=usuario,
+                    sala=salas[n_muestra % len(salas)],
+                    fecha=inicio_muestras + timedelta(days=n_muestra // len(salas)),
+                    hora_inicio=dtime(10),
+                    hora_fin=dtime(11),
+                    motivo_uso='benchmark',
+                )
+                t0 = time.perf_counter()
+                reserva.save()
+                tiempos.append(time.perf_counter() - t0)
+                n_muestra += 1
+
+            self.reporte(f"{tamano:,} filas", tiempos)
+            tiempos_por_tamano.append(statistics.median(tiempos))
+
+        if len(tiempos_por_tamano) > 1:
+            factor = tiempos_por_tamano[-1] / tiempos_por_tamano[0]
+            self.stdout.write(self.style.SUCCESS(
+                f"Relación p50 mayor/menor tamaño: {factor:.2f}x (≈1 indica latencia constante)"
+            ))
+
+    def bench_sesion_api(self, options):
+        """Consultas a django_session por llamada autenticada a la API"""
+        usuario = Usuario.objects.create_user(
+            username='bench@bench.local', email='bench@bench.local', password=None,
+            first_name='Bench', last_name='Mark',
+        )
+        token = str(AccessToken.for_user(usuario))
+        legado = [
+            'reservas.management.commands.benchmark.JWTAuthMiddlewareLegado'
+            if m == 'reservas_proyecto.middleware.JWTAuthMiddleware' else m
+            for m in settings.MIDDLEWARE
+        ]
+
+        for etiqueta, middleware in (('sesión por petición', legado), ('sin sesión', settings.MIDDLEWARE)):
+            with override_settings(MIDDLEWARE=middleware):
+                cliente = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}')
+                tiempos = []
+                lecturas = escrituras = 0
+                for _ in range(options['muestras']):
+                    with CaptureQueriesContext(connection) as consultas:
+                        t0 = time.perf_counter()
+                        cliente.get('/api/auth/check/')
+                        tiempos.append(time.perf_counter() - t0)
+                    for consulta in consultas.captured_queries:
+                        if 'django_session' in consulta['sql']:
+                            if consulta['sql'].lstrip().upper().startswith('SELECT'):
+                                lecturas += 1
+                            else:
+                                escrituras += 1
+                self.reporte(etiqueta, tiempos)
+                self.stdout.write(
+                    f"{'':>24} | lecturas de sesión/petición {lecturas / options['muestras']:.2f}"
+                    f" | escrituras de sesión/petición {escrituras / options['muestras']:.2f}"
+                )
+
+    def bench_reservas_masivas(self, options):
+        """Reservas por segundo: un POST por reserva contra /api/reservas/bulk/"""
+        usuario = Usuario.objects.create_user(
+            username='bench@bench.local', email='bench@bench.local', password=None,
+            first_name='Bench', last_name='Mark',
+        )
+        salas = Sala.objects.bulk_create([
+            Sala(nombre=f'BENCH-{i:04d}', capacidad=10, ubicacion='Bench', equipamiento='')
+            for i in range(options['salas'])
+        ])
+        cliente = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(usuario)}')
+
+        def lote(inicio):
+            # 8 bloques de una hora por sala y día, sin solapamientos
+            return [
+                {
+                    'sala': salas[(n // 8) % len(salas)].pk,
+                    'fecha': str(inicio + timedelta(days=n // (8 * len(salas)))),
+                    'hora_inicio': f'{8 + n % 8:02d}:00',
+                    'hora_fin': f'{9 + n % 8:02d}:00',
+                    'motivo_uso': 'benchmark',
+                }
+                for n in range(options['lote'])
+            ]
+
+        tiempos = []
+        t0 = time.perf_counter()
+        for item in lote(date(2100, 1, 1)):
+            t1 = time.perf_counter()
+            respuesta = cliente.post('/api/reservas/', item, content_type='application/json')
+            tiempos.append(time.perf_counter() - t1)
+            assert respuesta.status_code == 201, respuesta.content
+        individual = time.perf_counter() - t0
+        self.reporte('POST por reserva', tiempos)
+
+        t0 = time.perf_counter()
+        respuesta = cliente.post(
+            '/api/reservas/bulk/', {'reservas': lote(date(2200, 1, 1))}, content_type='application/json',
+        )
+        masivo = time.perf_counter() - t0
+        assert respuesta.status_code == 201, respuesta.content
+
+        n = options['lote']
+        self.stdout.write(f"{'POST por reserva':>24} | {n / individual:9.1f} reservas/s ({individual:.2f} s)")
+        self.stdout.write(f"{'/api/reservas/bulk/':>24} | {n / masivo:9.1f} reservas/s ({masivo:.2f} s)")
+        self.stdout.write(self.style.SUCCESS(f"Aceleración del lote: {individual / masivo:.1f}x"))
+
+    def bench_serializacion(self, options):
+        """Filas por segundo de un listado: ReservaListSerializer vs. ReservaListadoRapido"""
+        usuario = Usuario.objects.create_user(
+            username='bench@bench.local', email='bench@bench.local', password=None,
+            first_name='Bench', last_name='Mark',
+        )
+        salas = Sala.objects.bulk_create([
+            Sala(nombre=f'BENCH-{i:04d}', capacidad=10, ubicacion='Bench', equipamiento='')
+            for i in range(options['salas'])
+        ])
+        n = max(options['tamanos'])
+        Reserva.objects.bulk_create([
+            Reserva(
+                usuario=usuario,
+                sala=salas[i % len(salas)],
+                fecha=date(2100, 1, 1) + timedelta(days=i // (8 * len(salas))),
+                hora_inicio=dtime(8 + (i // len(salas)) % 8),
+                hora_fin=dtime(9 + (i // len(salas)) % 8),
+                motivo_uso='benchmark',
+            )
+            for i in range(n)
+        ], batch_size=5000)
+        queryset = Reserva.objects.para_listado().order_by('-fecha', '-hora_inicio', '-id')
+        rapido = ReservaListadoRapido()
+
+        def serializer(filas):
+            return JSONRenderer().render(ReservaListSerializer(list(queryset[:filas]), many=True).data)
+
+        def plan(filas):
+            return JSONRapidoRenderer().render(rapido.serializar(list(ReservaListadoRapido.filas(queryset)[:filas])))
+
+        for filas in options['tamanos']:
+            if serializer(filas) != plan(filas):
+                raise AssertionError('La salida del plan no coincide con la del serializer')
+            for etiqueta, funcion in (('ReservaListSerializer', serializer), ('plan + renderer', plan)):
+                tiempos = []
+                for _ in range(max(1, options['muestras'] // 20)):
+                    t0 = time.perf_counter()
+                    funcion(filas)
+                    tiempos.append(time.perf_counter() - t0)
+                mediana = statistics.median(tiempos)
+                self.stdout.write(
+                    f"{f'{filas:,} filas':>12} {etiqueta:>22} | {filas / mediana:12,.0f} filas/s"
+                    f" | p50 {mediana * 1000:9.2f} ms"
+                )
+        self.stdout.write(self.style.SUCCESS("Salida idéntica byte a byte en todos los tamaños"))
+
+    def bench_conexiones(self, options):
+        """
+        Latencia de peticiones autenticadas sin reutilizar conexiones,
+        con conexiones persistentes (CONN_MAX_AGE) y con el pool de
+        reservas_proyecto.backends. Como en un servidor real, las conexiones
+        se cierran (o devuelven) al final de cada petición.
+        """
+        original = connections['default']
+        base = dict(original.settings_dict)
+        # 'mysql' o 'sqlite3', venga de django.db.backends o de los backends con pool
+        motor = base['ENGINE'].rsplit('.', 1)[1]
+        modos = (
+            ('sin pool', {'ENGINE': f'django.db.backends.{motor}', 'CONN_MAX_AGE': 0}),
+            ('persistente', {
+                'ENGINE': f'django.db.backends.{motor}', 'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True,
+            }),
+            ('pool', {'ENGINE': f'reservas_proyecto.backends.{motor}', 'CONN_MAX_AGE': 0}),
+        )
+        usuario = Usuario.objects.create_user(
+            username='bench@bench.local', email='bench@bench.local', password=None,
+            first_name='Bench', last_name='Mark',
+        )
+        cliente = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(usuario)}')
+        try:
+            for etiqueta, ajustes in modos:
+                datos = {**base, **ajustes}
+                wrapper = load_backend(datos['ENGINE']).DatabaseWrapper(datos, 'default')
+                connections['default'] = wrapper
+                # connection_created se emite también al reutilizar una conexión
+                # del pool: se cuentan los objetos DB-API distintos
+                abiertas = {}
+                contar = lambda sender, connection, **kwargs: abiertas.setdefault(
+                    id(connection.connection), connection.connection,
+                )
+                connection_created.connect(contar, weak=False)
+                try:
+                    tiempos = []
+                    for _ in range(options['muestras']):
+                        t0 = time.perf_counter()
+                        # El Client de pruebas desconecta close_old_connections
+                        # de las signals de petición: se llama a mano
+                        close_old_connections()
+                        cliente.get('/api/reservas/mis_reservas/')
+                        close_old_connections()
+                        tiempos.append(time.perf_counter() - t0)
+                    self.reporte(etiqueta, tiempos)
+                    self.stdout.write(
+                        f"{'':>24} | conexiones abiertas {len(abiertas)} en {options['muestras']} peticiones"
+                    )
+                finally:
+                    connection_created.disconnect(contar)
+                    wrapper.close()
+                    if getattr(wrapper, 'pool', None) is not None:
+                        wrapper.pool.vaciar()
+                    connections['default'] = original
+        finally:
+            usuario.delete()
+
+    def bench_login(self, options):
+        """
+        Logins por segundo y núcleo (un solo hilo) contra /api/auth/login/
+        con cada hasher, y costo de un intento rechazado por el límite de
+        intentos (reservas.limite_login)
+        """
+        clave = 'Bench-Login-2024'
+        usuario = Usuario.objects.create_user(
+            username='bench@bench.local', email='bench@bench.local', password=None,
+            first_name='Bench', last_name='Mark',
+        )
+        cliente = Client(HTTP_HOST='localhost')
+        cuerpo = {'email': usuario.email, 'password': clave}
+        hashers = [
+            ('pbkdf2', 'reservas.hashers.PBKDF2Ajustable'),
+            ('scrypt', 'reservas.hashers.ScryptAjustable'),
+            ('argon2', 'reservas.hashers.Argon2Ajustable'),
+        ]
+        sin_limite = {**settings.LIMITE_LOGIN, 'HABILITADO': False}
+        for etiqueta, hasher in hashers:
+            with override_settings(PASSWORD_HASHERS=[hasher], LIMITE_LOGIN=sin_limite):
+                try:
+                    usuario.set_password(clave)
+                except ValueError as exc:  # argon2-cffi no instalado
+                    self.stdout.write(f"{etiqueta:>24} | omitido: {exc}")
+                    continue
+                usuario.save(update_fields=['password'])
+                tiempos = []
+                for _ in range(options['muestras']):
+                    t0 = time.perf_counter()
+                    respuesta = cliente.post('/api/auth/login/', cuerpo, content_type='application/json')
+                    tiempos.append(time.perf_counter() - t0)
+                    assert respuesta.status_code == 200, respuesta.content
+                self.reporte(etiqueta, tiempos)
+                self.stdout.write(f"{'':>24} | {1 / statistics.mean(tiempos):7.1f} logins/s por núcleo")
+
+        ventanas.limpiar()
+        try:
+            with override_settings(LIMITE_LOGIN={**settings.LIMITE_LOGIN, 'POR_EMAIL': (1, 3600)}):
+                cliente.post('/api/auth/login/', {**cuerpo, 'password': 'incorrecta'}, content_type='application/json')
+                tiempos = []
+                for _ in range(options['muestras']):
+                    t0 = time.perf_counter()
+                    respuesta = cliente.post('/api/auth/login/', cuerpo, content_type='application/json')
+                    tiempos.append(time.perf_counter() - t0)
+                    assert respuesta.status_code == 429, respuesta.content
+                self.reporte('rechazado (429)', tiempos)
+                self.stdout.write(f"{'':>24} | {1 / statistics.mean(tiempos):7.1f} intentos/s por núcleo")
+        finally:
+            ventanas.limpiar()
@@ -0,0 +1,246 @@
+import http.client
+import json
+import re
+import socket
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reservas.models import Usuario, Sala, Reserva
+from reservas import disponibilidad
+from .benchmark import percentil
+
+CONSULTAS_SERVER_TIMING = re.compile(r'db;[^,]*desc="(\d+) consultas"')
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga contra un servidor en ejecución (runserver, gunicorn, "
+        "uvicorn...) que usa la misma base de datos: mide p50/p95/p99 y consultas "
+        "SQL por petición (de la cabecera Server-Timing) de los endpoints "
+        "principales. Pensado para correr sobre los datos de crear_datos y "
+        "comparar entre versiones con --guardar y --comparar."
+    )
+
+    ESCENARIOS = [
+        'listado', 'hoy', 'pendientes', 'mis_reservas', 'crear', 'confirmar', 'check', 'me', 'disponibles',
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Servidor a medir")
+        parser.add_argument('--escenarios', nargs='+', choices=self.ESCENARIOS, default=self.ESCENARIOS)
+        parser.add_argument('--concurrencia', type=int, default=10, help="Peticiones simultáneas")
+        parser.add_argument('--peticiones', type=int, default=200, help="Peticiones por escenario")
+        parser.add_argument('--usuarios', type=int, default=100, help="Usuarios distintos para mis_reservas y crear")
+        parser.add_argument(
+            '--clientes-lentos', type=int, default=0,
+            help="Conexiones extra que envían sus peticiones byte a byte durante toda la prueba "
+                 "(en un servidor WSGI cada una retiene un hilo mientras llega la petición)",
+        )
+        parser.add_argument('--pausa-lenta', type=float, default=0.05, help="Segundos entre bytes de un cliente lento")
+        parser.add_argument('--guardar', help="Escribir los resultados en este archivo JSON")
+        parser.add_argument('--comparar', help="Resultados JSON de una ejecución anterior para mostrar la diferencia")
+        parser.add_argument(
+            '--conservar', action='store_true',
+            help="No borrar al final las reservas creadas por los escenarios crear y confirmar",
+        )
+
+    def handle(self, *args, **options):
+        self.url = options['url'].rstrip('/')
+        admin = Usuario.objects.filter(rol='admin').order_by('id').first() or \
+            Usuario.objects.filter(is_superuser=True).order_by('id').first()
+        if admin is None:
+            raise CommandError("Se necesita un usuario administrador (manage.py crear_admin)")
+        self.token_admin = str(AccessToken.for_user(admin))
+        self.tokens = [
+            str(AccessToken.for_user(usuario))
+            for usuario in Usuario.objects.filter(rol='usuario').order_by('id')[:options['usuarios']]
+        ] or [self.token_admin]
+        self.salas = list(Sala.objects.filter(estado='disponible').order_by('id').values_list('id', flat=True))
+        self.creadas = []
+        self._lock = threading.Lock()
+
+        resultados = {}
+        detener = threading.Event()
+        lentos = [
+            threading.Thread(target=self.cliente_lento, args=(detener, options['pausa_lenta']), daemon=True)
+            for _ in range(options['clientes_lentos'])
+        ]
+        for hilo in lentos:
+            hilo.start()
+        try:
+            for escenario in options['escenarios']:
+                peticiones = getattr(self, f'peticiones_{escenario}')(options['peticiones'])
+                resultados[escenario] = self.ejecutar(peticiones, options['concurrencia'])
+                self.reporte(escenario, resultados[escenario])
+        finally:
+            detener.set()
+            for hilo in lentos:
+                hilo.join()
+            if self.creadas and not options['conservar']:
+                Reserva.objects.filter(pk__in=self.creadas).delete()
+
+        anteriores = {}
+        if options['comparar']:
+            with open(options['comparar']) as archivo:
+                anteriores = json.load(archivo)['resultados']
+            self.comparacion(resultados, anteriores)
+        if options['guardar']:
+            with open(options['guardar'], 'w') as archivo:
+                json.dump({
+                    'fecha': timezone.now().isoformat(),
+                    'url': self.url,
+                    'concurrencia': options['concurrencia'],
+                    'resultados': resultados,
+                }, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Resultados guardados en {options['guardar']}"))
+
+    # ----- Peticiones por escenario: (método, ruta, cuerpo, token) -----
+
+    def peticiones_listado(self, n):
+        return [('GET', '/api/reservas/', None, self.token_admin)] * n
+
+    def peticiones_hoy(self, n):
+        return [('GET', '/api/reservas/hoy/', None, self.token_admin)] * n
+
+    def peticiones_pendientes(self, n):
+        return [('GET', '/api/reservas/pendientes/', None, self.token_admin)] * n
+
+    def peticiones_mis_reservas(self, n):
+        return [('GET', '/api/reservas/mis_reservas/', None, self.tokens[i % len(self.tokens)]) for i in range(n)]
+
+    def peticiones_check(self, n):
+        return [('GET', '/api/auth/check/', None, self.tokens[i % len(self.tokens)]) for i in range(n)]
+
+    def peticiones_me(self, n):
+        return [('GET', '/api/usuarios/me/', None, self.tokens[i % len(self.tokens)]) for i in range(n)]
+
+    def peticiones_disponibles(self, n):
+        return [('GET', '/api/salas/disponibles/', None, self.tokens[i % len(self.tokens)]) for i in range(n)]
+
+    def peticiones_crear(self, n):
+        """
+        Cada petición reserva un bloque de una hora que nadie más ocupa:
+        salas y horas en rotación, en fechas posteriores a todos los datos.
+        """
+        if not self.salas:
+            raise CommandError("No hay salas disponibles para el escenario crear")
+        ultima = Reserva.objects.order_by('-fecha').values_list('fecha', flat=True).first()
+        inicio = max(ultima or timezone.localdate(), timezone.localdate()) + timedelta(days=1)
+        horas = disponibilidad.HORA_CIERRE - disponibilidad.HORA_APERTURA
+        peticiones = []
+        for i in range(n):
+            hora = disponibilidad.HORA_APERTURA + (i // len(self.salas)) % horas
+            cuerpo = {
+                'sala': self.salas[i % len(self.salas)],
+                'fecha': (inicio + timedelta(days=i // (len(self.salas) * horas))).isoformat(),
+                'hora_inicio': f'{hora:02d}:00',
+                'hora_fin': f'{hora + 1:02d}:00',
+                'motivo_uso': 'Prueba de carga',
+            }
+            peticiones.append(('POST', '/api/reservas/', cuerpo, self.tokens[i % len(self.tokens)]))
+        return peticiones
+
+    def peticiones_confirmar(self, n):
+        # Reservas pendientes recién creadas (por el escenario crear o aquí mismo)
+        if len(self.creadas) < n:
+            self.ejecutar(self.peticiones_crear(n - len(self.creadas)), 10)
+        pendientes = Reserva.objects.filter(pk__in=self.creadas, estado='pendiente').values_list('id', flat=True)[:n]
+        return [('POST', f'/api/reservas/{pk}/confirmar/', None, self.token_admin) for pk in pendientes]
+
+    # ----- Ejecución -----
+
+    def peticion(self, metodo, ruta, cuerpo, token):
+        datos = json.dumps(cuerpo).encode() if cuerpo is not None else None
+        solicitud = urllib.request.Request(self.url + ruta, data=datos, method=metodo, headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json',
+        })
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(solicitud, timeout=60) as respuesta:
+                contenido = respuesta.read()
+                estado, cabeceras = respuesta.status, respuesta.headers
+        except urllib.error.HTTPError as e:
+            contenido = e.read()
+            estado, cabeceras = e.code, e.headers
+        except (OSError, http.client.HTTPException):
+            # Conexión rechazada o cortada, timeout...: un error más, no el fin de la prueba
+            contenido, estado, cabeceras = b'', None, {}
+        duracion = time.perf_counter() - inicio
+
+        if metodo == 'POST' and ruta == '/api/reservas/' and estado == 201:
+            with self._lock:
+                self.creadas.append(json.loads(contenido)['id'])
+        coincidencia = CONSULTAS_SERVER_TIMING.search(cabeceras.get('Server-Timing', ''))
+        return duracion, estado, int(coincidencia.group(1)) if coincidencia else None
+
+    def cliente_lento(self, detener, pausa):
+        """Repite GET /api/auth/check/ enviando la petición byte a byte hasta ``detener``"""
+        destino = urlsplit(self.url)
+        peticion = (
+            f'GET /api/auth/check/ HTTP/1.1\r\nHost: {destino.netloc}\r\n'
+            f'Authorization: Bearer {self.tokens[0]}\r\nConnection: close\r\n\r\n'
+        ).encode()
+        while not detener.is_set():
+            try:
+                with socket.create_connection((destino.hostname, destino.port or 80), timeout=60) as conexion:
+                    for i in range(len(peticion)):
+                        if detener.wait(pausa):
+                            return
+                        conexion.sendall(peticion[i:i + 1])
+                    while conexion.recv(65536):
+                        pass
+            except OSError:
+                detener.wait(0.5)
+
+    def ejecutar(self, peticiones, concurrencia):
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            medidas = list(pool.map(lambda p: self.peticion(*p), peticiones))
+        total = time.perf_counter() - inicio
+
+        ms = [duracion * 1000 for duracion, _, _ in medidas]
+        consultas = [n for _, _, n in medidas if n is not None]
+        errores = sum(1 for _, estado, _ in medidas if estado is None or estado >= 400)
+        return {
+            'peticiones': len(medidas),
+            'errores': errores,
+            'rps': round(len(medidas) / total, 1) if total else 0.0,
+            'p50_ms': round(percentil(ms, 50), 2),
+            'p95_ms': round(percentil(ms, 95), 2),
+            'p99_ms': round(percentil(ms, 99), 2),
+            'consultas_media': round(statistics.mean(consultas), 1) if consultas else None,
+            'consultas_max': max(consultas) if consultas else None,
+        }
+
+    def reporte(self, escenario, r):
+        consultas = '-' if r['consultas_media'] is None else f"{r['consultas_media']:.1f} (máx {r['consultas_max']})"
+        self.stdout.write(
+            f"{escenario:>14} | {r['peticiones']:>5} pet. {r['errores']:>4} err. | {r['rps']:>7} pet/s"
+            f" | p50 {r['p50_ms']:>8.2f} ms  p95 {r['p95_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms"
+            f" | SQL/pet. {consultas}"
+        )
+
+    def comparacion(self, resultados, anteriores):
+        self.stdout.write("\nDiferencia con la ejecución anterior (p95 y consultas):")
+        for escenario, r in resultados.items():
+            antes = anteriores.get(escenario)
+            if not antes:
+                continue
+            cambio = (r['p95_ms'] - antes['p95_ms']) / antes['p95_ms'] * 100 if antes['p95_ms'] else 0.0
+            linea = (
+                f"{escenario:>14} | p95 {antes['p95_ms']:.2f} → {r['p95_ms']:.2f} ms ({cambio:+.1f}%)"
+                f" | SQL/pet. {antes['consultas_media']} → {r['consultas_media']}"
+            )
+            empeora = cambio > 10 or (r['consultas_max'] or 0) > (antes['consultas_max'] or 0)
+            self.stdout.write(self.style.WARNING(linea) if empeora else linea)
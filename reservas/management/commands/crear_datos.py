@@ -1,203 +1,245 @@
+import math
+import random
+from datetime import time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
-from reservas.models import Usuario, Sala, Reserva
-from datetime import date, time, timedelta
+from django.db import transaction
 from django.utils import timezone
 
+from reservas.models import (
+    Usuario, Sala, Reserva, SerieReserva, DisponibilidadSala, ResumenDiario, ResumenCarrera,
+)
+from reservas.estadisticas import invalidar_estadisticas
+from reservas.cache_salas import invalidar_salas
+from reservas import analitica, disponibilidad
+
+DOMINIO = 'datos.cl'
+NOMBRES = [
+    'Juan', 'María', 'Carlos', 'Ana', 'Pedro', 'Camila', 'Diego', 'Valentina', 'Matías', 'Javiera',
+    'Felipe', 'Fernanda', 'Sebastián', 'Catalina', 'Nicolás', 'Constanza', 'Tomás', 'Francisca',
+    'Benjamín', 'Isidora', 'Ignacio', 'Antonia', 'Vicente', 'Sofía', 'Cristóbal', 'Daniela',
+]
+APELLIDOS = [
+    'Pérez', 'González', 'Rodríguez', 'Martínez', 'Silva', 'Muñoz', 'Rojas', 'Díaz', 'Soto',
+    'Contreras', 'López', 'Morales', 'Sepúlveda', 'Fuentes', 'Hernández', 'Torres', 'Araya',
+    'Flores', 'Espinoza', 'Valenzuela', 'Castillo', 'Tapia', 'Reyes', 'Gutiérrez', 'Castro',
+]
+CARRERAS = [
+    'Ingeniería Informática', 'Ingeniería Civil', 'Administración de Empresas', 'Psicología',
+    'Derecho', 'Medicina', 'Enfermería', 'Arquitectura', 'Pedagogía en Matemáticas', 'Periodismo',
+    'Ingeniería Comercial', 'Kinesiología', 'Diseño', 'Contador Auditor', 'Trabajo Social',
+]
+EQUIPAMIENTOS = [
+    'Pizarra, WiFi',
+    'Proyector, Pizarra, WiFi',
+    'TV, Pizarra, WiFi',
+    'Proyector, Pizarra Digital, 2 Computadores, WiFi',
+    'Proyector, Pizarra, Mesa grande, WiFi',
+]
+MOTIVOS = [
+    'Estudio para examen', 'Reunión de proyecto grupal', 'Preparación de presentación',
+    'Estudio individual', 'Taller de estudio', 'Reunión de equipo', 'Proyecto de investigación',
+    'Ayudantía', 'Estudio para certamen', 'Ensayo de defensa de tesis',
+]
+# Demanda relativa por hora de inicio (picos a media mañana y primera hora de la tarde)
+PESOS_HORA = {
+    8: 3, 9: 6, 10: 9, 11: 9, 12: 6, 13: 4, 14: 8, 15: 9, 16: 7, 17: 5, 18: 4, 19: 2, 20: 1,
+}
+# (duración en minutos, peso)
+DURACIONES = [(60, 50), (90, 15), (120, 25), (180, 7), (240, 3)]
+# Demanda relativa por día de la semana (lunes = 0)
+PESOS_DIA_SEMANA = [1.0, 1.0, 1.0, 1.0, 0.8, 0.25, 0.05]
+# (estado, peso) según si la fecha ya pasó o no
+ESTADOS_PASADO = [('confirmada', 75), ('cancelada', 15), ('pendiente', 10)]
+ESTADOS_FUTURO = [('pendiente', 55), ('confirmada', 35), ('cancelada', 10)]
+
+
 class Command(BaseCommand):
-    help = 'Crea datos de prueba para el sistema de reservas'
-
-    def handle(self, *args, **kwargs):
-        self.stdout.write('Creando datos de prueba...')
-        
-        # Limpiar datos existentes (opcional)
-        self.stdout.write('Limpiando datos antiguos...')
-        Reserva.objects.all().delete()
-        Usuario.objects.all().delete()
-        Sala.objects.all().delete()
-        
-        # Crear Usuarios
-        self.stdout.write('Creando usuarios...')
-        usuarios = [
-            Usuario.objects.create(
-                nombre='Juan Pérez',
-                email='juan.perez@mail.com',
-                telefono='+56912345678',
-                carrera='Ingeniería Informática'
-            ),
-            Usuario.objects.create(
-                nombre='María González',
-                email='maria.gonzalez@mail.com',
-                telefono='+56987654321',
-                carrera='Ingeniería Civil'
-            ),
-            Usuario.objects.create(
-                nombre='Carlos Rodríguez',
-                email='carlos.rodriguez@mail.com',
-                telefono='+56923456789',
-                carrera='Administración de Empresas'
-            ),
-            Usuario.objects.create(
-                nombre='Ana Martínez',
-                email='ana.martinez@mail.com',
-                telefono='+56956781234',
-                carrera='Psicología'
-            ),
-            Usuario.objects.create(
-                nombre='Pedro Silva',
-                email='pedro.silva@mail.com',
-                telefono='+56934567890',
-                carrera='Derecho'
-            ),
-        ]
+    help = (
+        "Genera datos de prueba con distribuciones realistas (horas punta, días "
+        "hábiles, usuarios y salas más populares que otros) e inserta por lotes. "
+        "Con la misma --semilla genera siempre los mismos datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=50)
+        parser.add_argument('--salas', type=int, default=10)
+        parser.add_argument('--reservas', type=int, default=2000)
+        parser.add_argument(
+            '--densidad', type=float, default=4.0,
+            help="Reservas promedio por sala y día hábil; define cuántos días abarcan los datos",
+        )
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=5000, help="Filas por INSERT")
+        parser.add_argument('--clave', default='clave123', help="Contraseña de todos los usuarios generados")
+        parser.add_argument(
+            '--limpiar', action='store_true',
+            help="Borrar antes las reservas, series, salas y usuarios que no son administradores. "
+                 "Sin esta opción las reservas nuevas van solo a las salas creadas en esta ejecución",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['semilla'])
+        self.lote = options['lote']
+
+        if options['limpiar']:
+            self.stdout.write('Limpiando datos antiguos...')
+            self.limpiar()
+
+        usuarios = self.crear_usuarios(options['usuarios'], options['clave'])
         self.stdout.write(self.style.SUCCESS(f'✓ {len(usuarios)} usuarios creados'))
-        
-        # Crear Salas
-        self.stdout.write('Creando salas...')
-        salas = [
-            Sala.objects.create(
-                nombre='Sala A-101',
-                capacidad=8,
-                ubicacion='Edificio A, Piso 1',
-                equipamiento='Proyector, Pizarra, 8 sillas, WiFi',
-                estado='disponible'
-            ),
-            Sala.objects.create(
-                nombre='Sala B-202',
-                capacidad=12,
-                ubicacion='Edificio B, Piso 2',
-                equipamiento='Proyector, Pizarra Digital, 12 sillas, 2 Computadores, WiFi',
-                estado='disponible'
-            ),
-            Sala.objects.create(
-                nombre='Sala C-303',
-                capacidad=6,
-                ubicacion='Edificio C, Piso 3',
-                equipamiento='TV, Pizarra, 6 sillas, WiFi',
-                estado='disponible'
-            ),
-            Sala.objects.create(
-                nombre='Sala D-104',
-                capacidad=15,
-                ubicacion='Edificio D, Piso 1',
-                equipamiento='Proyector, Pizarra, 15 sillas, Mesa grande, WiFi',
-                estado='disponible'
-            ),
-            Sala.objects.create(
-                nombre='Sala E-205',
-                capacidad=4,
-                ubicacion='Edificio E, Piso 2',
-                equipamiento='Pizarra, 4 sillas, Mesa pequeña, WiFi',
-                estado='mantenimiento'
-            ),
-        ]
+        salas = self.crear_salas(options['salas'])
         self.stdout.write(self.style.SUCCESS(f'✓ {len(salas)} salas creadas'))
-        
-        # Crear Reservas
-        self.stdout.write('Creando reservas...')
-        hoy = timezone.now().date()
-        manana = hoy + timedelta(days=1)
-        pasado_manana = hoy + timedelta(days=2)
-        
-        reservas = [
-            # Reservas para hoy
-            Reserva.objects.create(
-                usuario=usuarios[0],
-                sala=salas[0],
-                fecha=hoy,
-                hora_inicio=time(9, 0),
-                hora_fin=time(11, 0),
-                estado='confirmada',
-                motivo_uso='Estudio para examen de matemáticas'
-            ),
-            Reserva.objects.create(
-                usuario=usuarios[1],
-                sala=salas[1],
-                fecha=hoy,
-                hora_inicio=time(14, 0),
-                hora_fin=time(16, 0),
-                estado='confirmada',
-                motivo_uso='Reunión de proyecto grupal'
-            ),
-            Reserva.objects.create(
-                usuario=usuarios[2],
-                sala=salas[2],
-                fecha=hoy,
-                hora_inicio=time(10, 0),
-                hora_fin=time(12, 0),
-                estado='pendiente',
-                motivo_uso='Preparación de presentación'
-            ),
-            
-            # Reservas para mañana
-            Reserva.objects.create(
-                usuario=usuarios[0],
-                sala=salas[0],
-                fecha=manana,
-                hora_inicio=time(8, 0),
-                hora_fin=time(10, 0),
-                estado='confirmada',
-                motivo_uso='Estudio individual'
-            ),
-            Reserva.objects.create(
-                usuario=usuarios[3],
-                sala=salas[1],
-                fecha=manana,
-                hora_inicio=time(15, 0),
-                hora_fin=time(18, 0),
-                estado='pendiente',
-                motivo_uso='Taller de estudio'
-            ),
-            Reserva.objects.create(
-                usuario=usuarios[4],
-                sala=salas[3],
-                fecha=manana,
-                hora_inicio=time(11, 0),
-                hora_fin=time(13, 0),
-                estado='confirmada',
-                motivo_uso='Reunión de equipo'
-            ),
-            
-            # Reservas para pasado mañana
-            Reserva.objects.create(
-                usuario=usuarios[1],
-                sala=salas[2],
-                fecha=pasado_manana,
-                hora_inicio=time(9, 0),
-                hora_fin=time(12, 0),
-                estado='pendiente',
-                motivo_uso='Proyecto de investigación'
-            ),
-            Reserva.objects.create(
-                usuario=usuarios[2],
-                sala=salas[0],
-                fecha=pasado_manana,
-                hora_inicio=time(13, 0),
-                hora_fin=time(15, 0),
-                estado='confirmada',
-                motivo_uso='Estudio para certamen'
-            ),
-            
-            # Una reserva cancelada
-            Reserva.objects.create(
-                usuario=usuarios[3],
-                sala=salas[1],
-                fecha=hoy,
-                hora_inicio=time(17, 0),
-                hora_fin=time(19, 0),
-                estado='cancelada',
-                motivo_uso='Reunión cancelada'
-            ),
-        ]
-        
-        self.stdout.write(self.style.SUCCESS(f'✓ {len(reservas)} reservas creadas'))
-        
-        # Resumen
+        creadas = self.crear_reservas(usuarios, salas, options['reservas'], options['densidad'])
+        self.stdout.write(self.style.SUCCESS(f'✓ {creadas} reservas creadas'))
+
+        # bulk_create y limpiar() no emiten signals: reconstruir lo que mantienen
+        call_command('reconstruir_disponibilidad', stdout=self.stdout)
+        analitica.reconstruir()
+        invalidar_estadisticas()
+        invalidar_salas()
+
         self.stdout.write(self.style.SUCCESS('\n' + '='*50))
         self.stdout.write(self.style.SUCCESS('¡Datos de prueba creados exitosamente!'))
         self.stdout.write(self.style.SUCCESS('='*50))
         self.stdout.write(f'Total Usuarios: {Usuario.objects.count()}')
         self.stdout.write(f'Total Salas: {Sala.objects.count()}')
         self.stdout.write(f'Total Reservas: {Reserva.objects.count()}')
-        self.stdout.write(f'  - Confirmadas: {Reserva.objects.filter(estado="confirmada").count()}')
-        self.stdout.write(f'  - Pendientes: {Reserva.objects.filter(estado="pendiente").count()}')
-        self.stdout.write(f'  - Canceladas: {Reserva.objects.filter(estado="cancelada").count()}')
\ No newline at end of file
+        for estado, _ in Reserva.ESTADOS_RESERVA:
+            self.stdout.write(f'  - {estado}: {Reserva.objects.filter(estado=estado).count()}')
+
+    def limpiar(self):
+        """
+        Borra con un DELETE por tabla, sin la cascada del ORM ni signals: a
+        millones de filas, los handlers de post_delete por reserva (lápida,
+        mapa de disponibilidad, delta de analítica, evento) serían inviables.
+        Los mapas y resúmenes se vacían aquí y se reconstruyen al final.
+        """
+        with transaction.atomic():
+            for modelo in (Reserva, SerieReserva, DisponibilidadSala, ResumenDiario, ResumenCarrera, Sala):
+                modelo.objects.all()._raw_delete(modelo.objects.db)
+            # Sin reservas ni series que arrastrar: pocos usuarios, borrado normal
+            Usuario.objects.filter(is_staff=False, is_superuser=False).exclude(rol='admin').delete()
+
+    def _pesos_zipf(self, n, exponente):
+        """Pesos acumulados: unos pocos elementos concentran buena parte de la demanda"""
+        pesos = [1 / (i + 1) ** exponente for i in range(n)]
+        self.rng.shuffle(pesos)
+        acumulados, total = [], 0.0
+        for peso in pesos:
+            total += peso
+            acumulados.append(total)
+        return acumulados
+
+    def crear_usuarios(self, cantidad, clave):
+        clave = make_password(clave)
+        inicio = Usuario.objects.filter(email__endswith=f'@{DOMINIO}').count()
+        nuevos = []
+        for i in range(inicio, inicio + cantidad):
+            nombre = self.rng.choice(NOMBRES)
+            apellido = self.rng.choice(APELLIDOS)
+            email = f'{nombre.lower()}.{apellido.lower()}{i}@{DOMINIO}'
+            nuevos.append(Usuario(
+                username=email,
+                email=email,
+                password=clave,
+                first_name=nombre,
+                last_name=apellido,
+                telefono=f'+569{self.rng.randrange(10**8):08d}',
+                carrera=self.rng.choice(CARRERAS),
+            ))
+        Usuario.objects.bulk_create(nuevos, batch_size=self.lote)
+        return list(Usuario.objects.filter(email__endswith=f'@{DOMINIO}').order_by('id').values_list('id', flat=True))
+
+    def crear_salas(self, cantidad):
+        """
+        Devuelve solo las salas creadas: las existentes pueden tener reservas
+        que crear_reservas no conoce y con las que se solaparía
+        """
+        inicio = Sala.objects.count()
+        nuevas = []
+        for i in range(inicio, inicio + cantidad):
+            edificio = chr(ord('A') + i % 8)
+            piso = 1 + (i // 8) % 5
+            nuevas.append(Sala(
+                nombre=f'Sala {edificio}-{piso}{i:03d}',
+                capacidad=self.rng.choice([4, 6, 8, 8, 10, 12, 15, 20, 30]),
+                ubicacion=f'Edificio {edificio}, Piso {piso}',
+                equipamiento=self.rng.choice(EQUIPAMIENTOS),
+                estado='mantenimiento' if self.rng.random() < 0.05 else 'disponible',
+            ))
+        Sala.objects.bulk_create(nuevas, batch_size=self.lote)
+        return list(
+            Sala.objects.filter(nombre__in=[sala.nombre for sala in nuevas]).order_by('id').values_list('id', flat=True)
+        )
+
+    def _horario(self):
+        hora = self.rng.choices(list(PESOS_HORA), weights=list(PESOS_HORA.values()))[0]
+        inicio = hora * 60 + self.rng.choice([0, 0, 0, 30])
+        duracion = self.rng.choices([d for d, _ in DURACIONES], weights=[p for _, p in DURACIONES])[0]
+        fin = min(inicio + duracion, disponibilidad.HORA_CIERRE * 60)
+        return time(inicio // 60, inicio % 60), time(fin // 60, fin % 60)
+
+    def crear_reservas(self, usuarios, salas, cantidad, densidad):
+        """
+        Recorre los días desde el pasado hacia el futuro (80% / 20% del rango)
+        y, por sala, ubica sin solapamientos una cantidad de reservas que
+        depende del día de la semana y de la popularidad de la sala.
+        """
+        if not usuarios or not salas or cantidad <= 0:
+            return 0
+        hoy = timezone.localdate()
+        semana = sum(PESOS_DIA_SEMANA) / 7
+        dias = max(1, math.ceil(cantidad / (len(salas) * densidad * semana)))
+        fecha = hoy - timedelta(days=int(dias * 0.8))
+        pesos_usuarios = self._pesos_zipf(len(usuarios), 0.8)
+        pesos_salas = self._pesos_zipf(len(salas), 0.5)
+        media_salas = pesos_salas[-1] / len(salas)
+        popularidad = [
+            (actual - anterior) / media_salas
+            for anterior, actual in zip([0.0] + pesos_salas[:-1], pesos_salas)
+        ]
+
+        creadas = 0
+        pendientes = []
+        while creadas < cantidad:
+            estados = ESTADOS_PASADO if fecha < hoy else ESTADOS_FUTURO
+            esperado = densidad * PESOS_DIA_SEMANA[fecha.weekday()]
+            for sala_id, factor in zip(salas, popularidad):
+                ocupacion = 0
+                intentos = round(self.rng.gauss(esperado * factor, 1))
+                for _ in range(max(0, intentos)):
+                    hora_inicio, hora_fin = self._horario()
+                    mascara = disponibilidad.mascara(hora_inicio, hora_fin)
+                    if ocupacion & mascara:
+                        continue
+                    estado = self.rng.choices([e for e, _ in estados], weights=[p for _, p in estados])[0]
+                    if estado != 'cancelada':
+                        ocupacion |= mascara
+                    pendientes.append(Reserva(
+                        usuario_id=self.rng.choices(usuarios, cum_weights=pesos_usuarios)[0],
+                        sala_id=sala_id,
+                        fecha=fecha,
+                        hora_inicio=hora_inicio,
+                        hora_fin=hora_fin,
+                        estado=estado,
+                        motivo_uso=self.rng.choice(MOTIVOS),
+                    ))
+                    creadas += 1
+                    if creadas >= cantidad:
+                        break
+                if creadas >= cantidad:
+                    break
+            if len(pendientes) >= self.lote:
+                self._insertar(pendientes)
+                pendientes = []
+                self.stdout.write(f'  {creadas}/{cantidad} reservas...')
+            fecha += timedelta(days=1)
+        self._insertar(pendientes)
+        return creadas
+
+    def _insertar(self, reservas):
+        with transaction.atomic():
+            Reserva.objects.bulk_create(reservas, batch_size=self.lote)
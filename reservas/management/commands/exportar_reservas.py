@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from reservas.models import Reserva
+from reservas import exportacion
+
+
+class Command(BaseCommand):
+    help = "Exporta reservas a CSV o JSONL en memoria constante (lotes por keyset)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(exportacion.FORMATOS), default='csv')
+        parser.add_argument('--desde', help="Fecha inicial AAAA-MM-DD (inclusive)")
+        parser.add_argument('--hasta', help="Fecha final AAAA-MM-DD (inclusive)")
+        parser.add_argument('--sala', type=int, help="Id de la sala")
+        parser.add_argument('--estado', choices=[e for e, _ in Reserva.ESTADOS_RESERVA])
+        parser.add_argument('--salida', help="Archivo de salida (por defecto, la salida estándar)")
+        parser.add_argument('--lote', type=int, help="Filas por consulta (por defecto, EXPORTACION_TAMANO_LOTE)")
+
+    def handle(self, *args, **options):
+        try:
+            desde = parse_date(options['desde']) if options['desde'] else None
+            hasta = parse_date(options['hasta']) if options['hasta'] else None
+        except ValueError:
+            desde = hasta = None
+        if (options['desde'] and desde is None) or (options['hasta'] and hasta is None):
+            raise CommandError("Formato de fecha inválido, use AAAA-MM-DD")
+
+        export = exportacion.Exportacion(
+            exportacion.filtrar(desde, hasta, options['sala'], options['estado']),
+            options['formato'],
+            tamano_lote=options['lote'],
+        )
+        salida = open(options['salida'], 'wb') if options['salida'] else sys.stdout.buffer
+        try:
+            for parte in export:
+                salida.write(parte)
+        finally:
+            if options['salida']:
+                salida.close()
+
+        if options['salida']:
+            self.stdout.write(self.style.SUCCESS(f"✅ {export.filas} reservas exportadas a {options['salida']}"))
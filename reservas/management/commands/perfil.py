@@ -0,0 +1,48 @@
+import glob
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas_proyecto import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        "Combina y muestra los histogramas de perfilado que cada proceso vuelca "
+        "en PERFILADO['DIRECTORIO']"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', help="Directorio de volcados (por defecto PERFILADO['DIRECTORIO'])")
+        parser.add_argument('--json', action='store_true', help="Imprimir el resultado completo en JSON")
+        parser.add_argument('--orden', default='total_ms', help="Métrica para ordenar las rutas (por su p95)")
+
+    def handle(self, *args, **options):
+        directorio = options['directorio'] or getattr(settings, 'PERFILADO', {}).get('DIRECTORIO')
+        if not directorio:
+            raise CommandError("Defina PERFILADO['DIRECTORIO'] o use --directorio")
+
+        snapshots = []
+        for ruta in glob.glob(os.path.join(directorio, 'perfil-*.json')):
+            with open(ruta) as archivo:
+                snapshots.append(json.load(archivo))
+        datos = profiling.combinar(snapshots)
+
+        if options['json']:
+            self.stdout.write(json.dumps(datos, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'ruta':<40} {'n':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+            f" {'db p95':>8} {'sql p95':>8} {'ser p95':>8} {'bytes p95':>10}"
+        )
+        orden = options['orden']
+        for ruta, m in sorted(datos.items(), key=lambda item: -item[1][orden]['p95']):
+            self.stdout.write(
+                f"{ruta:<40} {m['total_ms']['cantidad']:>7} {m['total_ms']['p50']:>8}"
+                f" {m['total_ms']['p95']:>8} {m['total_ms']['p99']:>8} {m['db_ms']['p95']:>8}"
+                f" {m['consultas']['p95']:>8} {m['serializer_ms']['p95']:>8} {m['bytes']['p95']:>10}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(snapshots)} procesos combinados"))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from reservas import tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra por lotes los refresh tokens expirados de token_blacklist "
+        "(pendientes y revocados). Con --cada queda en ejecución y purga "
+        "periódicamente; `manage.py trabajador` también lo hace (tarea purgar_tokens)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, help="Filas por DELETE (por defecto TOKENS_JWT['LOTE'])")
+        parser.add_argument(
+            '--cada', type=float, nargs='?', const=0,
+            help="Repetir cada N segundos (sin valor: TOKENS_JWT['INTERVALO'])",
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options['cada']
+        if intervalo == 0:
+            intervalo = tokens._config()['INTERVALO']
+        while True:
+            pendientes, revocados = tokens.purgar_expirados(options['lote'])
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {pendientes} tokens expirados borrados ({revocados} en la lista negra)"
+            ))
+            if intervalo is None:
+                return
+            close_old_connections()
+            time.sleep(intervalo)
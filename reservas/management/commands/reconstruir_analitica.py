@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from reservas import analitica
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los resúmenes diarios de analítica (por sala y por carrera) a partir de las reservas"
+
+    def handle(self, *args, **kwargs):
+        salas, carreras = analitica.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {salas} resúmenes por sala y {carreras} por carrera reconstruidos"
+        ))
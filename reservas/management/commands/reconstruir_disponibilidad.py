@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reservas.models import Reserva, DisponibilidadSala
+from reservas import disponibilidad
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los mapas de ocupación por sala y día a partir de las reservas activas"
+
+    def handle(self, *args, **kwargs):
+        mapas = {}
+        reservas = (
+            Reserva.objects.exclude(estado='cancelada').order_by()
+            .values_list('sala_id', 'fecha', 'hora_inicio', 'hora_fin')
+            .iterator(chunk_size=5000)
+        )
+        for sala_id, fecha, hora_inicio, hora_fin in reservas:
+            clave = (sala_id, fecha)
+            mapas[clave] = mapas.get(clave, 0) | disponibilidad.mascara(hora_inicio, hora_fin)
+
+        with transaction.atomic():
+            DisponibilidadSala.objects.all().delete()
+            DisponibilidadSala.objects.bulk_create(
+                [
+                    DisponibilidadSala(sala_id=sala_id, fecha=fecha, ocupacion=ocupacion)
+                    for (sala_id, fecha), ocupacion in mapas.items()
+                ],
+                batch_size=5000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(mapas)} mapas de ocupación reconstruidos"))
@@ -0,0 +1,37 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia la base SQLite primaria sobre las réplicas (DB_REPLICAS) para "
+        "probar en local la lectura desde réplicas. Con MySQL la replicación "
+        "es tarea del servidor."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('alias', nargs='*', help="Réplicas a sincronizar (por defecto, todas)")
+
+    def handle(self, *args, **options):
+        destinos = options['alias'] or settings.REPLICAS['ALIAS']
+        if not destinos:
+            raise CommandError("No hay réplicas configuradas (variable de entorno DB_REPLICAS)")
+        primaria = connections[DEFAULT_DB_ALIAS]
+        if primaria.vendor != 'sqlite':
+            raise CommandError("Solo se sincronizan réplicas SQLite")
+
+        primaria.ensure_connection()
+        for alias in destinos:
+            if alias not in settings.REPLICAS['ALIAS']:
+                raise CommandError(f"{alias} no es una réplica configurada")
+            connections[alias].close()
+            destino = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                # API de respaldo en línea de SQLite: copia consistente
+                primaria.connection.backup(destino)
+            finally:
+                destino.close()
+            self.stdout.write(self.style.SUCCESS(f"✅ {alias} sincronizada"))
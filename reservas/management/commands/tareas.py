@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from reservas import tareas
+
+
+class Command(BaseCommand):
+    help = "Métricas de la cola de tareas en segundo plano: profundidad, retraso y duración por tarea"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help="Imprimir las métricas en JSON")
+
+    def handle(self, *args, **options):
+        datos = tareas.metricas()
+        if options['json']:
+            self.stdout.write(json.dumps(datos, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'tarea':<22} {'cola':>6} {'retraso s':>10} {'futuras':>8} {'en curso':>9}"
+            f" {'fallidas':>9} {'hechas/h':>9} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9}"
+        )
+        for nombre, m in sorted(datos.items()):
+            self.stdout.write(
+                f"{nombre:<22} {m['cola']:>6} {m['retraso_s']:>10} {m['programadas']:>8} {m['en_curso']:>9}"
+                f" {m['fallidas']:>9} {m['completadas_hora']:>9} {m['duracion_p50_ms'] or '-':>9}"
+                f" {m['duracion_p95_ms'] or '-':>9} {round(m['duracion_maxima_ms'] or 0, 3) or '-':>9}"
+            )
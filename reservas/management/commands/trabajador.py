@@ -0,0 +1,44 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from reservas import tareas
+from reservas_proyecto import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta las tareas en segundo plano (reservas.tareas): notificaciones, "
+        "deltas de analítica, vencimiento de pendientes, recordatorios y purgas. "
+        "Se pueden lanzar varios trabajadores en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, help="Tareas reclamadas por vuelta (por defecto TAREAS['LOTE'])")
+        parser.add_argument('--pausa', type=float, help="Segundos de espera con la cola vacía (por defecto TAREAS['PAUSA'])")
+        parser.add_argument('--una-vez', action='store_true', help="Vaciar la cola de tareas vencidas y terminar")
+
+    def handle(self, *args, **options):
+        config = tareas._config()
+        pausa = options['pausa'] if options['pausa'] is not None else config['PAUSA']
+        perfilado = getattr(settings, 'PERFILADO', {})
+        self.detener = False
+        # SIGTERM termina la vuelta en curso antes de salir
+        signal.signal(signal.SIGTERM, lambda *args: setattr(self, 'detener', True))
+
+        total = 0
+        while not self.detener:
+            close_old_connections()
+            tareas.programar_periodicas()
+            ejecutadas = tareas.ejecutar_pendientes(options['lote'])
+            total += ejecutadas
+            if perfilado.get('DIRECTORIO'):
+                profiling.registro.volcar_si_corresponde(perfilado['DIRECTORIO'], perfilado.get('INTERVALO_VOLCADO', 60))
+            if not ejecutadas:
+                if options['una_vez']:
+                    break
+                time.sleep(pausa)
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} tareas ejecutadas"))
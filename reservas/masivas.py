@@ -0,0 +1,168 @@
+"""
+Creación de reservas por lote (/api/reservas/bulk/).
+
+En lugar de ``Reserva.save()`` por ítem, el lote completo se valida con unas
+pocas consultas por conjuntos (salas, reservas existentes de los mismos días
+y series), se comparan los ítems entre sí y se inserta con ``bulk_create``. Como ``bulk_create`` no emite
+signals, aquí se actualizan los mapas de disponibilidad y los resúmenes de
+analítica, se invalidan las estadísticas y el caché de salas y se publican
+los eventos.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Sala, Reserva, DisponibilidadSala, SerieReserva
+from .serializers import ReservaMasivaSerializer
+from .estadisticas import invalidar_estadisticas
+from .cache_salas import invalidar_salas
+from . import analitica, disponibilidad, eventos
+
+TODO_O_NADA = 'todo_o_nada'
+PARCIAL = 'parcial'
+MODOS = (TODO_O_NADA, PARCIAL)
+
+
+def _error(indice, errores):
+    return {'indice': indice, 'estado': 'error', 'errores': errores}
+
+
+def _solapan(a, b):
+    return a['hora_inicio'] < b['hora_fin'] and b['hora_inicio'] < a['hora_fin']
+
+
+def _ocupadas(candidatos):
+    """
+    Reservas activas de los días (sala, fecha) del lote, con una sola
+    consulta (índice reservas_sala_fecha_idx). Se leen con las salas ya
+    bloqueadas; los mapas de DisponibilidadSala no sirven de filtro porque
+    redondean a bloques de 15 minutos.
+    """
+    dias = {(attrs['sala'], attrs['fecha']) for _, attrs in candidatos}
+    if not dias:
+        return {}
+    ocupadas = defaultdict(list)
+    filas = Reserva.objects.filter(
+        sala_id__in={sala for sala, _ in dias}, fecha__in={fecha for _, fecha in dias},
+    ).exclude(estado='cancelada').order_by().values('sala_id', 'fecha', 'hora_inicio', 'hora_fin')
+    for fila in filas:
+        if (fila['sala_id'], fila['fecha']) in dias:
+            ocupadas[(fila['sala_id'], fila['fecha'])].append(fila)
+    return ocupadas
+
+
+def _series(candidatos):
+    """Series activas de las salas del lote que cruzan su rango de fechas, por sala"""
+    if not candidatos:
+        return {}
+    fechas = [attrs['fecha'] for _, attrs in candidatos]
+    por_sala = defaultdict(list)
+    for serie in SerieReserva.objects.filter(
+        sala_id__in={attrs['sala'] for _, attrs in candidatos},
+        fecha_inicio__lte=max(fechas),
+        fecha_fin__gte=min(fechas),
+    ).exclude(estado='cancelada'):
+        por_sala[serie.sala_id].append(serie)
+    return por_sala
+
+
+def _asignar_ids(reservas):
+    """Backends sin RETURNING en bulk_create (MySQL): recuperar los ids por
+    (sala, fecha, hora de inicio), únicos entre las reservas activas"""
+    ids = dict(
+        ((sala_id, fecha, hora_inicio), pk)
+        for pk, sala_id, fecha, hora_inicio in Reserva.objects.filter(
+            sala_id__in={r.sala_id for r in reservas}, fecha__in={r.fecha for r in reservas},
+        ).exclude(estado='cancelada').values_list('id', 'sala_id', 'fecha', 'hora_inicio')
+    )
+    for reserva in reservas:
+        reserva.pk = ids.get((reserva.sala_id, reserva.fecha, reserva.hora_inicio))
+
+
+def _publicar(datos):
+    for datos_reserva in datos:
+        eventos.difusor.publicar('reserva.creada', datos_reserva)
+
+
+def crear_reservas(usuario, items, modo=TODO_O_NADA):
+    """
+    Crea las reservas válidas de ``items`` a nombre de ``usuario`` y devuelve
+    un resultado por ítem, en el mismo orden. En modo ``todo_o_nada`` un solo
+    error impide crear el lote completo (los ítems válidos quedan ``omitida``).
+    """
+    resultados = [None] * len(items)
+    validos = []
+    for indice, item in enumerate(items):
+        serializer = ReservaMasivaSerializer(data=item)
+        if serializer.is_valid():
+            validos.append((indice, serializer.validated_data))
+        else:
+            resultados[indice] = _error(indice, serializer.errors)
+
+    with transaction.atomic():
+        # Mismo bloqueo de sala que Reserva.save(), en orden de id para que
+        # dos lotes concurrentes no se bloqueen mutuamente
+        salas = {
+            sala.pk: sala for sala in Sala.objects.select_for_update().filter(
+                pk__in={attrs['sala'] for _, attrs in validos},
+            ).order_by('pk').only('id', 'estado')
+        }
+        candidatos = []
+        for indice, attrs in validos:
+            sala = salas.get(attrs['sala'])
+            if sala is None:
+                resultados[indice] = _error(indice, {'sala': ['La sala no existe']})
+            elif sala.estado != 'disponible':
+                resultados[indice] = _error(indice, {'sala': ['La sala no está disponible']})
+            else:
+                candidatos.append((indice, attrs))
+
+        ocupadas = _ocupadas(candidatos)
+        series = _series(candidatos)
+        aceptadas = defaultdict(list)
+        nuevas = []
+        for indice, attrs in candidatos:
+            dia = (attrs['sala'], attrs['fecha'])
+            if any(_solapan(attrs, fila) for fila in ocupadas.get(dia, ())):
+                resultados[indice] = _error(indice, {'non_field_errors': ['La sala ya tiene una reserva en ese horario']})
+            elif any(
+                _solapan(attrs, {'hora_inicio': serie.hora_inicio, 'hora_fin': serie.hora_fin}) and serie.incluye(attrs['fecha'])
+                for serie in series.get(attrs['sala'], ())
+            ):
+                resultados[indice] = _error(indice, {'non_field_errors': ['La sala tiene una reserva recurrente en ese horario']})
+            elif any(_solapan(attrs, otra) for otra in aceptadas[dia]):
+                resultados[indice] = _error(indice, {'non_field_errors': ['Se solapa con otra reserva del lote']})
+            else:
+                aceptadas[dia].append(attrs)
+                nuevas.append((indice, Reserva(
+                    usuario=usuario,
+                    sala_id=attrs['sala'],
+                    fecha=attrs['fecha'],
+                    hora_inicio=attrs['hora_inicio'],
+                    hora_fin=attrs['hora_fin'],
+                    motivo_uso=attrs['motivo_uso'],
+                )))
+
+        if modo == TODO_O_NADA and len(nuevas) < len(items):
+            for indice, _ in nuevas:
+                resultados[indice] = {'indice': indice, 'estado': 'omitida'}
+            return resultados
+
+        reservas = Reserva.objects.bulk_create([reserva for _, reserva in nuevas], batch_size=1000)
+        if reservas and reservas[0].pk is None:
+            _asignar_ids(reservas)
+
+        mascaras = defaultdict(int)
+        for reserva in reservas:
+            mascaras[(reserva.sala_id, reserva.fecha)] |= disponibilidad.mascara(reserva.hora_inicio, reserva.hora_fin)
+        DisponibilidadSala.ocupar_lote(mascaras)
+        analitica.registrar_lote(reservas)
+
+        if reservas:
+            transaction.on_commit(invalidar_estadisticas)
+            invalidar_salas()
+            transaction.on_commit(lambda: _publicar([eventos.datos_reserva(r) for r in reservas]))
+
+    for indice, reserva in nuevas:
+        resultados[indice] = {'indice': indice, 'estado': 'creada', 'id': reserva.pk}
+    return resultados
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['sala', 'fecha', 'hora_inicio', 'hora_fin'], name='reservas_sala_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['usuario', 'fecha'], name='reservas_usuario_fecha_idx'),
+        ),
+    ]
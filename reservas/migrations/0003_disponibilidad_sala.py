@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_disponibilidad(apps, schema_editor):
+    from reservas.disponibilidad import mascara
+
+    Reserva = apps.get_model('reservas', 'Reserva')
+    DisponibilidadSala = apps.get_model('reservas', 'DisponibilidadSala')
+
+    mapas = {}
+    reservas = (
+        Reserva.objects.exclude(estado='cancelada').order_by()
+        .values_list('sala_id', 'fecha', 'hora_inicio', 'hora_fin')
+        .iterator(chunk_size=5000)
+    )
+    for sala_id, fecha, hora_inicio, hora_fin in reservas:
+        mapas[(sala_id, fecha)] = mapas.get((sala_id, fecha), 0) | mascara(hora_inicio, hora_fin)
+
+    DisponibilidadSala.objects.bulk_create(
+        [
+            DisponibilidadSala(sala_id=sala_id, fecha=fecha, ocupacion=ocupacion)
+            for (sala_id, fecha), ocupacion in mapas.items()
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0002_indices_conflictos_reserva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisponibilidadSala',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('ocupacion', models.BigIntegerField(default=0)),
+                ('sala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disponibilidad', to='reservas.sala')),
+            ],
+            options={
+                'verbose_name': 'Disponibilidad de sala',
+                'verbose_name_plural': 'Disponibilidad de salas',
+                'db_table': 'disponibilidad_salas',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='disponibilidadsala',
+            constraint=models.UniqueConstraint(fields=('sala', 'fecha'), name='disponibilidad_sala_fecha_unica'),
+        ),
+        migrations.RunPython(poblar_disponibilidad, migrations.RunPython.noop),
+    ]
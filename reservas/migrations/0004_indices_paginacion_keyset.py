@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0003_disponibilidad_sala'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reserva',
+            name='reservas_usuario_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['usuario', 'fecha', 'hora_inicio', 'id'], name='reservas_usuario_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha', 'hora_inicio', 'id'], name='reservas_orden_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0004_indices_paginacion_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Eliminacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('reserva', 'Reserva'), ('sala', 'Sala')], max_length=20)),
+                ('objeto_id', models.BigIntegerField()),
+                ('propietario', models.BigIntegerField(blank=True, null=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Eliminación',
+                'verbose_name_plural': 'Eliminaciones',
+                'db_table': 'eliminaciones',
+            },
+        ),
+        migrations.AddField(
+            model_name='sala',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha_modificacion', 'id'], name='reservas_modificacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sala',
+            index=models.Index(fields=['fecha_modificacion', 'id'], name='salas_modificacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eliminacion',
+            index=models.Index(fields=['fecha', 'id'], name='eliminaciones_fecha_idx'),
+        ),
+    ]
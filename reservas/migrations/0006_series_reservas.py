@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 21:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0005_feed_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmada', 'Confirmada'), ('cancelada', 'Cancelada')], default='pendiente', max_length=20)),
+                ('motivo_uso', models.TextField()),
+                ('frecuencia', models.CharField(choices=[('diaria', 'Diaria'), ('semanal', 'Semanal')], default='semanal', max_length=10)),
+                ('intervalo', models.PositiveSmallIntegerField(default=1)),
+                ('dias_semana', models.JSONField(blank=True, default=list)),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('excepciones', models.JSONField(blank=True, default=list)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True)),
+                ('sala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='reservas.sala')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Serie de reservas',
+                'verbose_name_plural': 'Series de reservas',
+                'db_table': 'series_reservas',
+                'indexes': [models.Index(fields=['sala', 'fecha_inicio', 'fecha_fin'], name='series_sala_rango_idx')],
+            },
+        ),
+    ]
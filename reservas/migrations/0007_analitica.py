@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_resumenes(apps, schema_editor):
+    from reservas.analitica import CAMPOS_VALORES, sumar_reservas
+
+    Reserva = apps.get_model('reservas', 'Reserva')
+    reservas = (
+        Reserva.objects.order_by().values_list(*CAMPOS_VALORES, 'usuario__carrera')
+        .iterator(chunk_size=5000)
+    )
+    sumar_reservas(reservas).crear(
+        apps.get_model('reservas', 'ResumenDiario'), apps.get_model('reservas', 'ResumenCarrera'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0006_series_reservas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCarrera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('carrera', models.CharField(max_length=100)),
+                ('reservas', models.IntegerField(default=0)),
+                ('canceladas', models.IntegerField(default=0)),
+                ('minutos_reservados', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por carrera',
+                'verbose_name_plural': 'Resúmenes diarios por carrera',
+                'db_table': 'resumen_diario_carreras',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('reservas', models.IntegerField(default=0)),
+                ('pendientes', models.IntegerField(default=0)),
+                ('confirmadas', models.IntegerField(default=0)),
+                ('canceladas', models.IntegerField(default=0)),
+                ('minutos_reservados', models.IntegerField(default=0)),
+                ('minutos_confirmados', models.IntegerField(default=0)),
+                ('sala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='reservas.sala')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de sala',
+                'verbose_name_plural': 'Resúmenes diarios de salas',
+                'db_table': 'resumen_diario_salas',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumencarrera',
+            constraint=models.UniqueConstraint(fields=('fecha', 'carrera'), name='resumen_fecha_carrera_unico'),
+        ),
+        migrations.AddIndex(
+            model_name='resumendiario',
+            index=models.Index(fields=['fecha', 'sala'], name='resumen_fecha_sala_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(fields=('sala', 'fecha'), name='resumen_sala_fecha_unico'),
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+# Índice para purgar por expires_at (reservas.tokens.purgar_expirados). La
+# tabla es de token_blacklist: se crea con el schema editor, fuera del estado
+# de migraciones de esa app.
+INDICE = models.Index(fields=['expires_at'], name='tokens_expiracion_idx')
+
+
+def crear_indice(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('token_blacklist', 'OutstandingToken'), INDICE)
+
+
+def eliminar_indice(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('token_blacklist', 'OutstandingToken'), INDICE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0007_analitica'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0009_tareas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha', 'hora_inicio', 'id', 'fecha_modificacion'], name='reservas_estado_listado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='reservas_estado_creacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sala',
+            index=models.Index(fields=['estado', 'nombre'], name='salas_estado_nombre_idx'),
+        ),
+    ]
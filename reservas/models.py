@@ -1,7 +1,13 @@
 
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from . import disponibilidad
 
 class Usuario(AbstractUser):
     """
@@ -53,16 +59,50 @@ class Sala(models.Model):
     equipamiento = models.TextField(help_text="Ej: Proyector, Pizarra, Computadores")
     estado = models.CharField(max_length=20, choices=ESTADOS, default='disponible')
     imagen = models.URLField(blank=True, null=True, help_text="URL de imagen de la sala")
+    fecha_modificacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'salas'
         verbose_name = 'Sala'
         verbose_name_plural = 'Salas'
+        indexes = [
+            models.Index(fields=['fecha_modificacion', 'id'], name='salas_modificacion_idx'),
+            # SalaViewSet.disponibles (estado='disponible' ORDER BY nombre)
+            models.Index(fields=['estado', 'nombre'], name='salas_estado_nombre_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - Capacidad: {self.capacidad}"
 
 
+class ReservaQuerySet(models.QuerySet):
+    def conflictos(self, sala, fecha, hora_inicio, hora_fin, excluir=None):
+        """
+        Reservas activas de la sala que se solapan con el intervalo dado.
+        Solo recorre las filas de esa sala y ese día (índice sala/fecha/hora).
+        """
+        queryset = self.filter(
+            sala=sala,
+            fecha=fecha,
+            hora_inicio__lt=hora_fin,
+            hora_fin__gt=hora_inicio,
+        ).exclude(estado='cancelada')
+        if excluir is not None:
+            queryset = queryset.exclude(pk=excluir)
+        return queryset
+    
+    def para_listado(self):
+        """
+        Une usuario y sala en la misma consulta y trae solo las columnas que
+        usan ReservaListSerializer y Reserva.__str__.
+        """
+        return self.select_related('usuario', 'sala').only(
+            'id', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'usuario', 'sala',
+            'usuario__first_name', 'usuario__last_name', 'usuario__email',
+            'sala__nombre', 'sala__ubicacion',
+        )
+
+
 class Reserva(models.Model):
     ESTADOS_RESERVA = [
         ('pendiente', 'Pendiente'),
@@ -80,11 +120,31 @@ class Reserva(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_modificacion = models.DateTimeField(auto_now=True)
     
+    objects = ReservaQuerySet.as_manager()
+    
     class Meta:
         db_table = 'reservas'
         verbose_name = 'Reserva'
         verbose_name_plural = 'Reservas'
         ordering = ['-fecha', '-hora_inicio']
+        indexes = [
+            models.Index(fields=['sala', 'fecha', 'hora_inicio', 'hora_fin'], name='reservas_sala_fecha_idx'),
+            models.Index(fields=['usuario', 'fecha', 'hora_inicio', 'id'], name='reservas_usuario_orden_idx'),
+            # Orden de los listados paginados por keyset (-fecha, -hora_inicio, -id)
+            models.Index(fields=['fecha', 'hora_inicio', 'id'], name='reservas_orden_idx'),
+            # Feed de cambios (/api/cambios/)
+            models.Index(fields=['fecha_modificacion', 'id'], name='reservas_modificacion_idx'),
+            # /api/reservas/pendientes/: el listado recorre el índice en el orden
+            # de la paginación y el ETag (MAX(fecha_modificacion), COUNT) se
+            # calcula solo con el índice. Compuestos y no parciales: MySQL no
+            # admite índices con condición ni con INCLUDE.
+            models.Index(
+                fields=['estado', 'fecha', 'hora_inicio', 'id', 'fecha_modificacion'],
+                name='reservas_estado_listado_idx',
+            ),
+            # Tarea expirar_pendientes (estado='pendiente' ORDER BY fecha_creacion)
+            models.Index(fields=['estado', 'fecha_creacion'], name='reservas_estado_creacion_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sala.nombre} - {self.usuario.get_full_name()} - {self.fecha}"
@@ -92,9 +152,416 @@ class Reserva(models.Model):
     def clean(self):
         if self.hora_fin <= self.hora_inicio:
             raise ValidationError('La hora de fin debe ser posterior a la hora de inicio')
+        
+        if self.estado != 'cancelada' and self.sala_id and self.fecha:
+            conflictos = Reserva.objects.conflictos(
+                self.sala_id, self.fecha, self.hora_inicio, self.hora_fin, excluir=self.pk
+            )
+            if conflictos.exists():
+                raise ValidationError('La sala ya tiene una reserva en ese horario')
+            if SerieReserva.objects.ocupan(self.sala_id, self.fecha, self.hora_inicio, self.hora_fin):
+                raise ValidationError('La sala tiene una reserva recurrente en ese horario')
     
     def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+        # Bloquear la fila de la sala serializa a los escritores concurrentes
+        # de una misma sala, de modo que la verificación de solapamiento y el
+        # INSERT ocurren sin que otra transacción se intercale.
+        with transaction.atomic():
+            if self.sala_id:
+                list(Sala.objects.select_for_update().filter(pk=self.sala_id).values_list('pk'))
+            anterior = None
+            if self.pk:
+                anterior = Reserva.objects.filter(pk=self.pk).values(
+                    'sala_id', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'usuario_id'
+                ).first()
+            self.full_clean()
+            # Para los signals de post_save: evento de cambio de estado y
+            # deltas de los resúmenes de analítica
+            self._anterior = anterior
+            self._estado_anterior = anterior['estado'] if anterior else None
+            super().save(*args, **kwargs)
+            
+            if anterior and anterior['estado'] != 'cancelada':
+                DisponibilidadSala.liberar(anterior['sala_id'], anterior['fecha'])
+            if self.estado != 'cancelada':
+                DisponibilidadSala.ocupar(self.sala_id, self.fecha, self.hora_inicio, self.hora_fin)
 
 
+class SerieReservaQuerySet(models.QuerySet):
+    def solapadas(self, sala, desde, hasta, hora_inicio, hora_fin, excluir=None):
+        """
+        Series activas de la sala cuyo rango de fechas y horario se cruzan con
+        los dados. Solo hay conflicto en las fechas que la serie incluye
+        (``SerieReserva.incluye``).
+        """
+        queryset = self.filter(
+            sala=sala,
+            fecha_inicio__lte=hasta,
+            fecha_fin__gte=desde,
+            hora_inicio__lt=hora_fin,
+            hora_fin__gt=hora_inicio,
+        ).exclude(estado='cancelada')
+        if excluir is not None:
+            queryset = queryset.exclude(pk=excluir)
+        return queryset
+    
+    def para_listado(self):
+        """Columnas que usan la expansión de ocurrencias y OcurrenciaSerializer"""
+        return self.select_related('usuario', 'sala').only(
+            'id', 'usuario', 'sala', 'hora_inicio', 'hora_fin', 'estado',
+            'frecuencia', 'intervalo', 'dias_semana', 'fecha_inicio', 'fecha_fin', 'excepciones',
+            'usuario__first_name', 'usuario__last_name', 'sala__nombre', 'sala__ubicacion',
+        )
+    
+    def ocupan(self, sala, fecha, hora_inicio, hora_fin, excluir=None):
+        """True si alguna serie tiene una ocurrencia que se solapa con el intervalo"""
+        return any(
+            serie.incluye(fecha)
+            for serie in self.solapadas(sala, fecha, fecha, hora_inicio, hora_fin, excluir=excluir)
+        )
+
+
+class SerieReserva(models.Model):
+    """
+    Reserva recurrente (p. ej. una clase semanal durante el semestre): una
+    sola fila con la regla de recurrencia en lugar de una Reserva por fecha.
+    Las ocurrencias no se guardan; se expanden bajo demanda con ``fechas()``
+    (ver reservas.series).
+    """
+    FRECUENCIAS = [
+        ('diaria', 'Diaria'),
+        ('semanal', 'Semanal'),
+    ]
+    
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='series')
+    sala = models.ForeignKey(Sala, on_delete=models.CASCADE, related_name='series')
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    estado = models.CharField(max_length=20, choices=Reserva.ESTADOS_RESERVA, default='pendiente')
+    motivo_uso = models.TextField()
+    
+    # Regla: cada ``intervalo`` días o semanas desde fecha_inicio hasta fecha_fin;
+    # las semanales solo en ``dias_semana`` (0 = lunes ... 6 = domingo)
+    frecuencia = models.CharField(max_length=10, choices=FRECUENCIAS, default='semanal')
+    intervalo = models.PositiveSmallIntegerField(default=1)
+    dias_semana = models.JSONField(default=list, blank=True)
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    # Fechas (AAAA-MM-DD) sin ocurrencia: feriados, clases suspendidas, etc.
+    excepciones = models.JSONField(default=list, blank=True)
+    
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+    
+    objects = SerieReservaQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'series_reservas'
+        verbose_name = 'Serie de reservas'
+        verbose_name_plural = 'Series de reservas'
+        indexes = [
+            models.Index(fields=['sala', 'fecha_inicio', 'fecha_fin'], name='series_sala_rango_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sala.nombre} - {self.get_frecuencia_display()} - {self.fecha_inicio} a {self.fecha_fin}"
+    
+    def incluye(self, fecha):
+        """True si ``fecha`` es una ocurrencia de la serie"""
+        if not self.fecha_inicio <= fecha <= self.fecha_fin:
+            return False
+        if fecha.isoformat() in self.excepciones:
+            return False
+        if self.frecuencia == 'diaria':
+            return (fecha - self.fecha_inicio).days % self.intervalo == 0
+        # Semanas contadas desde el lunes de la semana de inicio
+        lunes_inicio = self.fecha_inicio - timedelta(days=self.fecha_inicio.weekday())
+        semanas = (fecha - lunes_inicio).days // 7
+        return fecha.weekday() in self.dias_semana and semanas % self.intervalo == 0
+    
+    def fechas(self, desde=None, hasta=None, reverso=False):
+        """Genera las fechas de las ocurrencias entre ``desde`` y ``hasta`` (inclusive)"""
+        desde = max(desde or self.fecha_inicio, self.fecha_inicio)
+        hasta = min(hasta or self.fecha_fin, self.fecha_fin)
+        if hasta < desde:
+            return
+        paso = timedelta(days=-1 if reverso else 1)
+        fecha = hasta if reverso else desde
+        for _ in range((hasta - desde).days + 1):
+            if self.incluye(fecha):
+                yield fecha
+            fecha += paso
+    
+    def clean(self):
+        if self.hora_fin <= self.hora_inicio:
+            raise ValidationError('La hora de fin debe ser posterior a la hora de inicio')
+        if self.fecha_fin < self.fecha_inicio:
+            raise ValidationError('La fecha de fin debe ser posterior a la fecha de inicio')
+        if self.intervalo < 1:
+            raise ValidationError('El intervalo debe ser al menos 1')
+        if self.frecuencia == 'semanal':
+            if not self.dias_semana:
+                raise ValidationError('Una serie semanal requiere al menos un día de la semana')
+            if any(dia not in range(7) for dia in self.dias_semana):
+                raise ValidationError('Los días de la semana van de 0 (lunes) a 6 (domingo)')
+        
+        if self.estado != 'cancelada' and self.sala_id:
+            if self.fecha_en_conflicto() is not None:
+                raise ValidationError('La sala ya tiene una reserva en el horario de la serie')
+    
+    def fecha_en_conflicto(self):
+        """
+        Primera ocurrencia que choca con una reserva u otra serie de la sala, o
+        None. Las ocurrencias se expanden solo aquí, contra las filas que ya
+        se cruzan en rango de fechas y horario.
+        """
+        reservas = Reserva.objects.filter(
+            sala_id=self.sala_id,
+            fecha__range=(self.fecha_inicio, self.fecha_fin),
+            hora_inicio__lt=self.hora_fin,
+            hora_fin__gt=self.hora_inicio,
+        ).exclude(estado='cancelada').values_list('fecha', flat=True)
+        for fecha in sorted(set(reservas)):
+            if self.incluye(fecha):
+                return fecha
+        
+        otras = SerieReserva.objects.solapadas(
+            self.sala_id, self.fecha_inicio, self.fecha_fin, self.hora_inicio, self.hora_fin, excluir=self.pk
+        )
+        for otra in otras:
+            for fecha in self.fechas(otra.fecha_inicio, otra.fecha_fin):
+                if otra.incluye(fecha):
+                    return fecha
+        return None
+    
+    def save(self, *args, **kwargs):
+        # Mismo bloqueo de sala que Reserva.save()
+        with transaction.atomic():
+            if self.sala_id:
+                list(Sala.objects.select_for_update().filter(pk=self.sala_id).values_list('pk'))
+            self.full_clean()
+            super().save(*args, **kwargs)
+
+
+class DisponibilidadSala(models.Model):
+    """
+    Mapa de bits de los bloques de 15 minutos ocupados de una sala en un día.
+    Se mantiene desde Reserva.save() y al eliminar una reserva: ocupar es un
+    OR sobre el entero y liberar rehace el mapa del día con las reservas
+    activas que quedan.
+    """
+    sala = models.ForeignKey(Sala, on_delete=models.CASCADE, related_name='disponibilidad')
+    fecha = models.DateField()
+    ocupacion = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'disponibilidad_salas'
+        verbose_name = 'Disponibilidad de sala'
+        verbose_name_plural = 'Disponibilidad de salas'
+        constraints = [
+            models.UniqueConstraint(fields=['sala', 'fecha'], name='disponibilidad_sala_fecha_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sala_id} - {self.fecha}"
+    
+    @classmethod
+    def ocupar(cls, sala_id, fecha, hora_inicio, hora_fin):
+        mascara = disponibilidad.mascara(hora_inicio, hora_fin)
+        if not mascara:
+            return
+        filas = cls.objects.filter(sala_id=sala_id, fecha=fecha).update(
+            ocupacion=F('ocupacion').bitor(mascara)
+        )
+        if not filas:
+            cls.objects.create(sala_id=sala_id, fecha=fecha, ocupacion=mascara)
+    
+    @classmethod
+    def ocupar_lote(cls, mascaras):
+        """
+        Igual que ``ocupar`` para muchos días a la vez: ``mascaras`` es un dict
+        ``{(sala_id, fecha): mascara}``. Un UPDATE con OR para las filas que ya
+        existen y un INSERT para las que faltan. Como ``ocupar``, requiere que
+        las salas estén bloqueadas por la transacción en curso.
+        """
+        if not mascaras:
+            return
+        salas = {sala_id for sala_id, _ in mascaras}
+        fechas = {fecha for _, fecha in mascaras}
+        existentes = [
+            fila for fila in cls.objects.filter(sala_id__in=salas, fecha__in=fechas).only('id', 'sala_id', 'fecha')
+            if (fila.sala_id, fila.fecha) in mascaras
+        ]
+        for fila in existentes:
+            fila.ocupacion = F('ocupacion').bitor(mascaras[(fila.sala_id, fila.fecha)])
+        cls.objects.bulk_update(existentes, ['ocupacion'], batch_size=1000)
+        
+        presentes = {(fila.sala_id, fila.fecha) for fila in existentes}
+        cls.objects.bulk_create([
+            cls(sala_id=sala_id, fecha=fecha, ocupacion=mascara)
+            for (sala_id, fecha), mascara in mascaras.items()
+            if (sala_id, fecha) not in presentes
+        ], batch_size=1000)
+    
+    @classmethod
+    def liberar(cls, sala_id, fecha):
+        """Quita del mapa de ``fecha`` una reserva ya cancelada, movida o borrada"""
+        cls.liberar_lote({(sala_id, fecha)})
+    
+    @classmethod
+    def liberar_lote(cls, claves):
+        """
+        Rehace los mapas de ``claves`` (pares ``(sala_id, fecha)``) a partir
+        de las reservas activas que quedan. No se descuenta la máscara de la
+        reserva liberada: los bloques de 15 minutos se redondean hacia afuera
+        y dos reservas seguidas (09:00-09:10 y 09:10-09:20) comparten un
+        bloque que debe seguir ocupado.
+        """
+        if not claves:
+            return
+        salas = {sala_id for sala_id, _ in claves}
+        fechas = {fecha for _, fecha in claves}
+        with transaction.atomic():
+            # Mismo bloqueo de sala que Reserva.save(): nadie ocupa bloques
+            # entre la lectura de las reservas y el UPDATE
+            list(Sala.objects.select_for_update().filter(pk__in=salas).order_by('pk').values_list('pk'))
+            mapas = dict.fromkeys(claves, 0)
+            activas = Reserva.objects.filter(sala_id__in=salas, fecha__in=fechas).exclude(
+                estado='cancelada'
+            ).order_by().values_list('sala_id', 'fecha', 'hora_inicio', 'hora_fin')
+            for sala_id, fecha, hora_inicio, hora_fin in activas:
+                if (sala_id, fecha) in mapas:
+                    mapas[(sala_id, fecha)] |= disponibilidad.mascara(hora_inicio, hora_fin)
+            filas = [
+                fila for fila in cls.objects.filter(sala_id__in=salas, fecha__in=fechas).only('id', 'sala_id', 'fecha')
+                if (fila.sala_id, fila.fecha) in mapas
+            ]
+            for fila in filas:
+                fila.ocupacion = mapas[(fila.sala_id, fila.fecha)]
+            cls.objects.bulk_update(filas, ['ocupacion'], batch_size=1000)
+
+
+class ResumenDiario(models.Model):
+    """
+    Totales de reservas de una sala en un día, para reportes. Se mantiene
+    incrementalmente en cada escritura de Reserva (reservas.analitica) y se
+    puede reconstruir con ``manage.py reconstruir_analitica``.
+    """
+    sala = models.ForeignKey(Sala, on_delete=models.CASCADE, related_name='resumenes')
+    fecha = models.DateField()
+    reservas = models.IntegerField(default=0)
+    pendientes = models.IntegerField(default=0)
+    confirmadas = models.IntegerField(default=0)
+    canceladas = models.IntegerField(default=0)
+    # Minutos de las reservas no canceladas / solo de las confirmadas
+    minutos_reservados = models.IntegerField(default=0)
+    minutos_confirmados = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'resumen_diario_salas'
+        verbose_name = 'Resumen diario de sala'
+        verbose_name_plural = 'Resúmenes diarios de salas'
+        constraints = [
+            models.UniqueConstraint(fields=['sala', 'fecha'], name='resumen_sala_fecha_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha', 'sala'], name='resumen_fecha_sala_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.sala_id} - {self.fecha}"
+
+
+class ResumenCarrera(models.Model):
+    """
+    Totales diarios de reservas por carrera del usuario (mismo mantenimiento
+    que ResumenDiario). Al cambiar la carrera de un usuario se traspasan sus
+    reservas a la nueva (analitica.cambiar_carrera).
+    """
+    fecha = models.DateField()
+    carrera = models.CharField(max_length=100)
+    reservas = models.IntegerField(default=0)
+    canceladas = models.IntegerField(default=0)
+    minutos_reservados = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'resumen_diario_carreras'
+        verbose_name = 'Resumen diario por carrera'
+        verbose_name_plural = 'Resúmenes diarios por carrera'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'carrera'], name='resumen_fecha_carrera_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.carrera} - {self.fecha}"
+
+
+class Eliminacion(models.Model):
+    """
+    Registro (tombstone) de reservas y salas eliminadas, para que el feed de
+    cambios pueda informar las bajas a los clientes.
+    """
+    MODELOS = [
+        ('reserva', 'Reserva'),
+        ('sala', 'Sala'),
+    ]
+    
+    modelo = models.CharField(max_length=20, choices=MODELOS)
+    objeto_id = models.BigIntegerField()
+    # Dueño de la reserva eliminada (sin FK: el usuario puede eliminarse también)
+    propietario = models.BigIntegerField(null=True, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'eliminaciones'
+        verbose_name = 'Eliminación'
+        verbose_name_plural = 'Eliminaciones'
+        indexes = [
+            models.Index(fields=['fecha', 'id'], name='eliminaciones_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} - {self.fecha}"
+
+
+class Tarea(models.Model):
+    """
+    Trabajo en segundo plano (reservas.tareas), ejecutado por
+    ``manage.py trabajador``. ``clave`` (única mientras la tarea está activa)
+    evita encolar dos veces el mismo trabajo, p. ej. una tarea periódica.
+    """
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+    
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    clave = models.CharField(max_length=150, null=True, blank=True, unique=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    ejecutar_en = models.DateTimeField(default=timezone.now)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    iniciada_en = models.DateTimeField(null=True, blank=True)
+    terminada_en = models.DateTimeField(null=True, blank=True)
+    duracion_ms = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'tareas'
+        verbose_name = 'Tarea'
+        verbose_name_plural = 'Tareas'
+        indexes = [
+            # Reclamar las tareas vencidas y medir la cola por nombre
+            models.Index(fields=['estado', 'ejecutar_en'], name='tareas_cola_idx'),
+            models.Index(fields=['nombre', 'estado'], name='tareas_nombre_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nombre} ({self.estado})"
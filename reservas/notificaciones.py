@@ -0,0 +1,85 @@
+"""
+Notificaciones a los usuarios (confirmaciones, cancelaciones, vencimientos y
+recordatorios), enviadas por el trabajador de reservas.tareas y nunca
+dentro de una petición.
+
+``settings.NOTIFICACIONES['BACKEND']``: BackendConsola (desarrollo),
+BackendArchivo (una línea JSON por mensaje, OPCIONES={'ruta': ...}) o
+BackendCorreo (django.core.mail con EMAIL_BACKEND).
+"""
+import json
+import sys
+import threading
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+
+class BackendConsola:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def enviar(self, mensajes):
+        with self._lock:
+            for mensaje in mensajes:
+                self.stream.write(f"[{mensaje['tipo']}] {mensaje['para']}: {mensaje['asunto']}\n{mensaje['cuerpo']}\n")
+            self.stream.flush()
+
+
+class BackendArchivo:
+    def __init__(self, ruta='notificaciones.jsonl'):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+
+    def enviar(self, mensajes):
+        with self._lock, open(self.ruta, 'a', encoding='utf-8') as archivo:
+            for mensaje in mensajes:
+                archivo.write(json.dumps(mensaje, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+
+
+class BackendCorreo:
+    def __init__(self, remitente=None):
+        self.remitente = remitente or settings.DEFAULT_FROM_EMAIL
+
+    def enviar(self, mensajes):
+        # Una sola conexión SMTP para todo el lote
+        send_mass_mail(
+            [(m['asunto'], m['cuerpo'], self.remitente, [m['para']]) for m in mensajes],
+            fail_silently=False,
+        )
+
+
+def _crear_backend():
+    config = getattr(settings, 'NOTIFICACIONES', {})
+    backend = import_string(config.get('BACKEND', 'reservas.notificaciones.BackendConsola'))
+    return backend(**config.get('OPCIONES', {}))
+
+
+backend = _crear_backend()
+
+
+ASUNTOS = {
+    'reserva.confirmada': 'Tu reserva fue confirmada',
+    'reserva.cancelada': 'Tu reserva fue cancelada',
+    'reserva.expirada': 'Tu reserva pendiente expiró',
+    'reserva.recordatorio': 'Recordatorio de reserva',
+}
+
+
+def mensaje(tipo, usuario, reserva, sala_nombre):
+    """``reserva``: dict con id, fecha, hora_inicio y hora_fin"""
+    cuerpo = (
+        f"Hola {usuario.first_name or usuario.email},\n\n"
+        f"{ASUNTOS[tipo]}: sala {sala_nombre}, {reserva['fecha']} "
+        f"de {str(reserva['hora_inicio'])[:5]} a {str(reserva['hora_fin'])[:5]} (reserva #{reserva['id']})."
+    )
+    return {
+        'tipo': tipo,
+        'para': usuario.email,
+        'asunto': ASUNTOS[tipo],
+        'cuerpo': cuerpo,
+        'reserva': reserva['id'],
+    }
@@ -0,0 +1,222 @@
+import base64
+import heapq
+import json
+from itertools import dropwhile, islice
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import series as series_reservas
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por keyset (seek): en lugar de OFFSET/COUNT, cada página
+    continúa desde los valores de orden de la última fila devuelta, de modo
+    que el costo de una página no depende de cuán profundo se navegue.
+
+    El orden debe ser total, por eso siempre termina en la clave primaria.
+    """
+    ordering = ('-pk',)
+    cursor_query_param = 'cursor'
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'PAGINACION_MAX_PAGE_SIZE', 100)
+    invalid_cursor_message = 'Cursor inválido'
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(tamano, self.max_page_size))
+
+    def _campos(self, model):
+        campos = []
+        for orden in self.ordering:
+            nombre = orden.lstrip('-')
+            campo = model._meta.pk if nombre == 'pk' else model._meta.get_field(nombre)
+            campos.append((campo.attname, campo, orden.startswith('-')))
+        return campos
+
+    def _filtro(self, campos, valores, reverso):
+        """Filas estrictamente posteriores (o anteriores si reverso) a ``valores``"""
+        filtro = Q()
+        for i, (nombre, _, descendente) in enumerate(campos):
+            operador = 'lt' if descendente != reverso else 'gt'
+            condicion = {previo: valores[j] for j, (previo, _, _) in enumerate(campos[:i])}
+            condicion[f'{nombre}__{operador}'] = valores[i]
+            filtro |= Q(**condicion)
+        return filtro
+
+    def _decodificar(self, request, campos):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if len(datos['v']) != len(campos):
+                raise ValueError
+            valores = [campo.to_python(v) for (_, campo, _), v in zip(campos, datos['v'])]
+            self.datos_cursor = datos
+            return valores, bool(datos.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _codificar(self, fila, reverso):
+        datos = {'v': [force_str(getattr(fila, nombre)) for nombre, _, _ in self.campos]}
+        if reverso:
+            datos['r'] = 1
+        cursor = base64.urlsafe_b64encode(json.dumps(datos, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def _preparar(self, queryset, request):
+        """(consulta de la página + 1 fila, tamaño, valores del cursor, reverso)"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.campos = self._campos(queryset.model)
+        tamano = self.get_page_size(request)
+
+        valores, reverso = self._decodificar(request, self.campos)
+        if reverso:
+            orden = [o[1:] if o.startswith('-') else f'-{o}' for o in self.ordering]
+        else:
+            orden = list(self.ordering)
+        queryset = queryset.order_by(*orden)
+        if valores is not None:
+            queryset = queryset.filter(self._filtro(self.campos, valores, reverso))
+        return queryset[:tamano + 1], tamano, valores, reverso
+
+    def _pagina(self, filas, tamano, valores, reverso):
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano]
+        if reverso:
+            filas.reverse()
+
+        # Retrocediendo, siempre hay página siguiente (la fila del cursor) y hay
+        # anterior solo si sobraron filas; avanzando es al revés.
+        self.next_url = None
+        self.previous_url = None
+        if filas:
+            if reverso or hay_mas:
+                self.next_url = self._codificar(filas[-1], False)
+            if (reverso and hay_mas) or (not reverso and valores is not None):
+                self.previous_url = self._codificar(filas[0], True)
+        elif valores is not None:
+            self.previous_url = remove_query_param(self.base_url, self.cursor_query_param)
+        return filas
+
+    def paginate_queryset(self, queryset, request, view=None):
+        consulta, *estado = self._preparar(queryset, request)
+        return self._pagina(list(consulta), *estado)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset para vistas async (ORM async)"""
+        consulta, *estado = self._preparar(queryset, request)
+        return self._pagina([fila async for fila in consulta], *estado)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.next_url),
+            ('previous', self.previous_url),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ReservaKeysetPagination(KeysetPagination):
+    """Orden por defecto de Reserva (fecha y hora descendentes) + id como desempate"""
+    ordering = ('-fecha', '-hora_inicio', '-id')
+
+
+class ReservaConSeriesPagination(ReservaKeysetPagination):
+    """
+    Reservas individuales intercaladas con las ocurrencias de ``series`` en el
+    mismo orden descendente (``series_reservas.clave_orden``). Las
+    ocurrencias se generan perezosamente y solo hasta completar la página.
+    Con series, el listado solo avanza: ``previous`` es siempre null.
+    """
+
+    def _preparar_series(self, queryset, request, series, desde, hasta):
+        """(consulta de la página + 1 fila, ocurrencias desde el cursor, tamaño)"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.campos = self._campos(queryset.model)
+        tamano = self.get_page_size(request)
+
+        valores, reverso = self._decodificar(request, self.campos)
+        if reverso:
+            raise NotFound(self.invalid_cursor_message)
+        queryset = queryset.order_by(*self.ordering)
+        if valores is not None:
+            fecha, hora_inicio, pk = valores
+            tipo = self.datos_cursor.get('t', series_reservas.TIPO_RESERVA)
+            if tipo not in (series_reservas.TIPO_RESERVA, series_reservas.TIPO_OCURRENCIA):
+                raise NotFound(self.invalid_cursor_message)
+            if tipo == series_reservas.TIPO_RESERVA:
+                queryset = queryset.filter(self._filtro(self.campos, valores, False))
+            else:
+                # A igual fecha y hora las reservas van antes que las ocurrencias
+                queryset = queryset.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, hora_inicio__lt=hora_inicio))
+            hasta = min(hasta, fecha) if hasta else fecha
+
+        ocurrencias = series_reservas.ocurrencias(series, desde, hasta, reverso=True)
+        if valores is not None:
+            cursor = (fecha, hora_inicio, tipo, pk)
+            ocurrencias = dropwhile(lambda o: series_reservas.clave_orden(o) >= cursor, ocurrencias)
+        return queryset[:tamano + 1], ocurrencias, tamano
+
+    def _pagina_series(self, filas, ocurrencias, tamano):
+        filas = list(islice(
+            heapq.merge(filas, ocurrencias, key=series_reservas.clave_orden, reverse=True),
+            tamano + 1,
+        ))
+        self.next_url = self._codificar_fila(filas[tamano - 1]) if len(filas) > tamano else None
+        self.previous_url = None
+        return filas[:tamano]
+
+    def paginate_queryset(self, queryset, request, view=None, series=(), desde=None, hasta=None):
+        if not series:
+            return super().paginate_queryset(queryset, request, view=view)
+        consulta, ocurrencias, tamano = self._preparar_series(queryset, request, series, desde, hasta)
+        return self._pagina_series(list(consulta), ocurrencias, tamano)
+
+    async def apaginate_queryset(self, queryset, request, view=None, series=(), desde=None, hasta=None):
+        if not series:
+            return await super().apaginate_queryset(queryset, request, view=view)
+        consulta, ocurrencias, tamano = self._preparar_series(queryset, request, series, desde, hasta)
+        return self._pagina_series([fila async for fila in consulta], ocurrencias, tamano)
+
+    def ventana(self, queryset, request):
+        """
+        Consulta, sin evaluar, de las reservas que puede mostrar la página
+        pedida (y la siguiente): con sus ids y fecha_modificacion,
+        reservas.condicional arma el ETag sin recorrer el listado completo.
+        Es la misma consulta con o sin series, salvo al retroceder.
+        """
+        _, reverso = self._decodificar(request, self._campos(queryset.model))
+        if reverso:
+            return self._preparar(queryset, request)[0]
+        return self._preparar_series(queryset, request, (), None, None)[0]
+
+    def _codificar_fila(self, fila):
+        fecha, hora_inicio, tipo, pk = series_reservas.clave_orden(fila)
+        datos = {'v': [force_str(fecha), force_str(hora_inicio), force_str(pk)], 't': tipo}
+        cursor = base64.urlsafe_b64encode(json.dumps(datos, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
@@ -0,0 +1,42 @@
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    JSONRenderer que codifica con orjson si está instalado. Produce los mismos
+    bytes que JSONRenderer con la configuración por defecto de DRF (compacto,
+    UTF-8 sin escapar): las fechas y los tipos que orjson no conoce pasan por
+    el encoder de DRF, y ante cualquier otra diferencia posible (indentación
+    pedida, claves no str, enteros enormes) se usa el JSONRenderer normal.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            contenido = orjson.dumps(
+                data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Mismo escape que JSONRenderer para los separadores de línea de JavaScript
+        return contenido.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def respuesta_json(datos, status=200, headers=None):
+    """
+    HttpResponse con el mismo cuerpo que Response(datos) de DRF con
+    JSONRapidoRenderer, para vistas de Django sin la maquinaria de DRF
+    (reservas.async_views)
+    """
+    contenido = b'' if datos is None else JSONRapidoRenderer().render(datos)
+    return HttpResponse(contenido, status=status, headers=headers, content_type='application/json')
@@ -1,16 +1,316 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework import serializers
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.password_validation import validate_password
+from datetime import datetime, date, time, timedelta
+from operator import itemgetter
+from reservas_proyecto.profiling import medir
+from .models import Sala, Reserva, SerieReserva
+from . import disponibilidad
 
-class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+Usuario = get_user_model()
+
+
+class ListSerializerMedido(serializers.ListSerializer):
+    """ListSerializer que reporta su tiempo al perfil de la petición"""
+
+    @property
+    def data(self):
+        with medir('serializer'):
+            return super().data
+
+
+class SerializerMedidoMixin:
+    """Reporta el tiempo de ``.data`` al perfil de la petición (ProfilingMiddleware)"""
+
+    @property
+    def data(self):
+        with medir('serializer'):
+            return super().data
+
+
+class UsuarioSerializer(SerializerMedidoMixin, serializers.ModelSerializer):
+    """Serializer para mostrar y editar usuarios"""
+    nombre_completo = serializers.ReadOnlyField()
+    es_admin = serializers.ReadOnlyField()
+    total_reservas = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Usuario
+        list_serializer_class = ListSerializerMedido
+        fields = [
+            'id', 'username', 'email', 'first_name', 'last_name', 'nombre_completo',
+            'telefono', 'carrera', 'rol', 'es_admin', 'is_active',
+            'fecha_registro', 'total_reservas',
+        ]
+        read_only_fields = ['id', 'fecha_registro']
+
+    def get_total_reservas(self, obj):
+        # Los viewsets anotan el total en la misma consulta; el conteo por
+        # fila queda solo para instancias sueltas (p. ej. /usuarios/me/)
+        total = getattr(obj, 'num_reservas', None)
+        return obj.reservas.count() if total is None else total
+
+
+class RegistroSerializer(SerializerMedidoMixin, serializers.ModelSerializer):
+    """Serializer para el registro de nuevos usuarios"""
+    password = serializers.CharField(write_only=True, validators=[validate_password])
+    password2 = serializers.CharField(write_only=True)
+
+    class Meta:
+        model = Usuario
+        fields = [
+            'username', 'email', 'password', 'password2',
+            'first_name', 'last_name', 'telefono', 'carrera',
+        ]
+
+    def validate(self, attrs):
+        if attrs['password'] != attrs['password2']:
+            raise serializers.ValidationError({'password': 'Las contraseñas no coinciden'})
+        return attrs
+
+    def create(self, validated_data):
+        validated_data.pop('password2')
+        password = validated_data.pop('password')
+        return Usuario.objects.create_user(password=password, **validated_data)
+
+
+class SalaSerializer(SerializerMedidoMixin, serializers.ModelSerializer):
+    """Serializer para salas"""
+    total_reservas = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Sala
+        list_serializer_class = ListSerializerMedido
+        fields = [
+            'id', 'nombre', 'capacidad', 'ubicacion', 'equipamiento',
+            'estado', 'imagen', 'total_reservas',
+        ]
+
+    def get_total_reservas(self, obj):
+        # El listado, detalle y /disponibles/ de salas y el feed de cambios
+        # anotan el total en la misma consulta; el conteo queda solo para la
+        # sala recién creada o actualizada
+        total = getattr(obj, 'num_reservas', None)
+        return obj.reservas.count() if total is None else total
+
+
+def duracion_horas(hora_inicio, hora_fin):
+    inicio = datetime.combine(date.min, hora_inicio)
+    fin = datetime.combine(date.min, hora_fin)
+    return round((fin - inicio).total_seconds() / 3600, 2)
+
+
+def validar_horario(hora_inicio, hora_fin):
+    """Orden, horario de atención y duración máxima de una reserva"""
+    if hora_fin <= hora_inicio:
+        raise serializers.ValidationError('La hora de fin debe ser posterior a la hora de inicio')
+
+    if hora_inicio < time(disponibilidad.HORA_APERTURA) or hora_fin > time(disponibilidad.HORA_CIERRE):
+        raise serializers.ValidationError(
+            f'El horario debe estar entre las {disponibilidad.HORA_APERTURA:02d}:00 '
+            f'y las {disponibilidad.HORA_CIERRE:02d}:00'
+        )
+    duracion = datetime.combine(date.min, hora_fin) - datetime.combine(date.min, hora_inicio)
+    if duracion > timedelta(hours=disponibilidad.DURACION_MAXIMA_HORAS):
+        raise serializers.ValidationError(
+            f'La reserva no puede durar más de {disponibilidad.DURACION_MAXIMA_HORAS} horas'
+        )
+
+
+class ReservaSerializer(SerializerMedidoMixin, serializers.ModelSerializer):
+    """Serializer completo para crear y ver reservas"""
+    usuario = serializers.PrimaryKeyRelatedField(read_only=True)
+    usuario_nombre = serializers.CharField(source='usuario.get_full_name', read_only=True)
+    usuario_email = serializers.EmailField(source='usuario.email', read_only=True)
+    sala_nombre = serializers.CharField(source='sala.nombre', read_only=True)
+    sala_ubicacion = serializers.CharField(source='sala.ubicacion', read_only=True)
+    duracion_horas = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Reserva
+        list_serializer_class = ListSerializerMedido
+        fields = [
+            'id', 'usuario', 'usuario_nombre', 'usuario_email',
+            'sala', 'sala_nombre', 'sala_ubicacion',
+            'fecha', 'hora_inicio', 'hora_fin', 'duracion_horas',
+            'estado', 'motivo_uso', 'fecha_creacion', 'fecha_modificacion',
+        ]
+        read_only_fields = ['id', 'estado', 'fecha_creacion', 'fecha_modificacion']
+
+    def get_duracion_horas(self, obj):
+        return duracion_horas(obj.hora_inicio, obj.hora_fin)
 
     def validate(self, attrs):
-        data = super().validate(attrs)
+        sala = attrs.get('sala', getattr(self.instance, 'sala', None))
+        fecha = attrs.get('fecha', getattr(self.instance, 'fecha', None))
+        hora_inicio = attrs.get('hora_inicio', getattr(self.instance, 'hora_inicio', None))
+        hora_fin = attrs.get('hora_fin', getattr(self.instance, 'hora_fin', None))
 
-        data["user"] = {
-            "id": self.user.id,
-            "email": self.user.email,
-            "nombre_completo": self.user.get_full_name(),
-            "rol": self.user.rol,
-            "es_admin": self.user.es_admin,
-        }
+        if hora_inicio and hora_fin:
+            validar_horario(hora_inicio, hora_fin)
 
-        return data
+        # Sala y solapamiento solo al crear o al mover la reserva: editar el
+        # motivo de una reserva en una sala que pasó a mantenimiento es válido
+        mueve = self.instance is None or any(
+            campo in attrs and attrs[campo] != getattr(self.instance, campo)
+            for campo in ('sala', 'fecha', 'hora_inicio', 'hora_fin')
+        )
+        if mueve and sala and sala.estado != 'disponible':
+            raise serializers.ValidationError({'sala': 'La sala no está disponible'})
+
+        if mueve and sala and fecha and hora_inicio and hora_fin:
+            conflictos = Reserva.objects.conflictos(
+                sala, fecha, hora_inicio, hora_fin,
+                excluir=getattr(self.instance, 'pk', None),
+            )
+            if conflictos.exists():
+                raise serializers.ValidationError('La sala ya tiene una reserva en ese horario')
+
+        return attrs
+
+
+class ReservaListSerializer(SerializerMedidoMixin, serializers.ModelSerializer):
+    """Serializer reducido para listados de reservas"""
+    usuario_nombre = serializers.CharField(source='usuario.get_full_name', read_only=True)
+    sala_nombre = serializers.CharField(source='sala.nombre', read_only=True)
+    sala_ubicacion = serializers.CharField(source='sala.ubicacion', read_only=True)
+    duracion_horas = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Reserva
+        list_serializer_class = ListSerializerMedido
+        fields = [
+            'id', 'usuario', 'usuario_nombre', 'sala', 'sala_nombre', 'sala_ubicacion',
+            'fecha', 'hora_inicio', 'hora_fin', 'duracion_horas', 'estado',
+        ]
+
+    def get_duracion_horas(self, obj):
+        return duracion_horas(obj.hora_inicio, obj.hora_fin)
+
+
+class ReservaListadoRapido:
+    """
+    Variante de solo lectura de ReservaListSerializer para los listados:
+    recibe filas de ``values_list(*COLUMNAS, named=True)`` (sin instanciar
+    modelos) y las convierte con un plan precompilado de (clave, función)
+    que reproduce las claves, el orden y el formato del serializer.
+    """
+    COLUMNAS = (
+        'id', 'usuario_id', 'usuario__first_name', 'usuario__last_name',
+        'sala_id', 'sala__nombre', 'sala__ubicacion', 'fecha', 'hora_inicio', 'hora_fin', 'estado',
+    )
+
+    def __init__(self):
+        i = {columna: indice for indice, columna in enumerate(self.COLUMNAS)}
+        nombre, apellido = i['usuario__first_name'], i['usuario__last_name']
+        fecha, inicio, fin = i['fecha'], i['hora_inicio'], i['hora_fin']
+        # DateField y TimeField de DRF serializan con isoformat() (ISO 8601);
+        # usuario_nombre es Usuario.get_full_name()
+        self.plan = [
+            ('id', itemgetter(i['id'])),
+            ('usuario', itemgetter(i['usuario_id'])),
+            ('usuario_nombre', lambda f: f'{f[nombre]} {f[apellido]}'.strip()),
+            ('sala', itemgetter(i['sala_id'])),
+            ('sala_nombre', itemgetter(i['sala__nombre'])),
+            ('sala_ubicacion', itemgetter(i['sala__ubicacion'])),
+            ('fecha', lambda f: f[fecha].isoformat()),
+            ('hora_inicio', lambda f: f[inicio].isoformat()),
+            ('hora_fin', lambda f: f[fin].isoformat()),
+            ('duracion_horas', lambda f: duracion_horas(f[inicio], f[fin])),
+            ('estado', itemgetter(i['estado'])),
+        ]
+        assert [clave for clave, _ in self.plan] == ReservaListSerializer.Meta.fields
+
+    @classmethod
+    def filas(cls, queryset):
+        return queryset.values_list(*cls.COLUMNAS, named=True)
+
+    def serializar(self, filas):
+        plan = self.plan
+        with medir('serializer'):
+            return [{clave: obtener(fila) for clave, obtener in plan} for fila in filas]
+
+
+class OcurrenciaSerializer(SerializerMedidoMixin, serializers.Serializer):
+    """
+    Ocurrencia de una serie (reservas.series.Ocurrencia) con los mismos campos
+    que ReservaListSerializer, más ``serie``. El id es ``"<serie>:<fecha>"``.
+    """
+    id = serializers.CharField()
+    serie = serializers.IntegerField(source='serie.pk')
+    usuario = serializers.IntegerField(source='serie.usuario_id')
+    usuario_nombre = serializers.CharField(source='serie.usuario.get_full_name')
+    sala = serializers.IntegerField(source='serie.sala_id')
+    sala_nombre = serializers.CharField(source='serie.sala.nombre')
+    sala_ubicacion = serializers.CharField(source='serie.sala.ubicacion')
+    fecha = serializers.DateField()
+    hora_inicio = serializers.TimeField()
+    hora_fin = serializers.TimeField()
+    duracion_horas = serializers.SerializerMethodField()
+    estado = serializers.CharField()
+
+    class Meta:
+        list_serializer_class = ListSerializerMedido
+
+    def get_duracion_horas(self, obj):
+        return duracion_horas(obj.hora_inicio, obj.hora_fin)
+
+
+class SerieReservaSerializer(SerializerMedidoMixin, serializers.ModelSerializer):
+    """Serializer para crear y ver series de reservas recurrentes"""
+    usuario = serializers.PrimaryKeyRelatedField(read_only=True)
+    usuario_nombre = serializers.CharField(source='usuario.get_full_name', read_only=True)
+    sala_nombre = serializers.CharField(source='sala.nombre', read_only=True)
+    dias_semana = serializers.ListField(child=serializers.IntegerField(min_value=0, max_value=6), required=False)
+    excepciones = serializers.ListField(child=serializers.DateField(), required=False)
+
+    class Meta:
+        model = SerieReserva
+        list_serializer_class = ListSerializerMedido
+        fields = [
+            'id', 'usuario', 'usuario_nombre', 'sala', 'sala_nombre',
+            'hora_inicio', 'hora_fin', 'estado', 'motivo_uso',
+            'frecuencia', 'intervalo', 'dias_semana', 'fecha_inicio', 'fecha_fin', 'excepciones',
+            'fecha_creacion', 'fecha_modificacion',
+        ]
+        read_only_fields = ['id', 'estado', 'fecha_creacion', 'fecha_modificacion']
+
+    def validate(self, attrs):
+        sala = attrs.get('sala', getattr(self.instance, 'sala', None))
+        hora_inicio = attrs.get('hora_inicio', getattr(self.instance, 'hora_inicio', None))
+        hora_fin = attrs.get('hora_fin', getattr(self.instance, 'hora_fin', None))
+        fecha_inicio = attrs.get('fecha_inicio', getattr(self.instance, 'fecha_inicio', None))
+        fecha_fin = attrs.get('fecha_fin', getattr(self.instance, 'fecha_fin', None))
+
+        if hora_inicio and hora_fin:
+            validar_horario(hora_inicio, hora_fin)
+
+        if fecha_inicio and fecha_fin and (fecha_fin - fecha_inicio).days > settings.SERIES_MAXIMO_DIAS:
+            raise serializers.ValidationError(
+                f'Una serie no puede abarcar más de {settings.SERIES_MAXIMO_DIAS} días'
+            )
+
+        if sala and sala.estado != 'disponible':
+            raise serializers.ValidationError({'sala': 'La sala no está disponible'})
+
+        # El modelo guarda las excepciones como texto AAAA-MM-DD
+        if 'excepciones' in attrs:
+            attrs['excepciones'] = sorted({fecha.isoformat() for fecha in attrs['excepciones']})
+        return attrs
+
+
+class ReservaMasivaSerializer(serializers.Serializer):
+    """
+    Un ítem de /api/reservas/bulk/. La sala se recibe como id y se resuelve
+    para todo el lote de una vez (reservas.masivas), no ítem por ítem.
+    """
+    sala = serializers.IntegerField(min_value=1)
+    fecha = serializers.DateField()
+    hora_inicio = serializers.TimeField()
+    hora_fin = serializers.TimeField()
+    motivo_uso = serializers.CharField()
+
+    def validate(self, attrs):
+        validar_horario(attrs['hora_inicio'], attrs['hora_fin'])
+        return attrs
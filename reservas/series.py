@@ -0,0 +1,68 @@
+"""
+Expansión perezosa de las series de reservas (SerieReserva) y su mezcla con
+las reservas individuales.
+
+Las ocurrencias no existen en la base de datos: ``ocurrencias()`` las genera
+en orden a partir de las reglas y ``heapq.merge`` las intercala con las
+filas de Reserva, de modo que un listado solo expande las fechas que caben
+en la página pedida.
+"""
+import heapq
+
+from . import disponibilidad
+
+# Posición de cada tipo de fila a igual fecha y hora (orden descendente:
+# primero las reservas individuales, luego las ocurrencias)
+TIPO_OCURRENCIA = 0
+TIPO_RESERVA = 1
+
+
+class Ocurrencia:
+    """Una fecha de una serie, con la forma de una Reserva para los listados"""
+    __slots__ = ('serie', 'fecha')
+
+    def __init__(self, serie, fecha):
+        self.serie = serie
+        self.fecha = fecha
+
+    @property
+    def id(self):
+        return f'{self.serie.pk}:{self.fecha.isoformat()}'
+
+    def __getattr__(self, nombre):
+        # usuario, sala, hora_inicio, hora_fin, estado, motivo_uso...
+        return getattr(self.serie, nombre)
+
+
+def clave_orden(fila):
+    """
+    Clave de orden común a Reserva (o sus filas de ``values_list``) y
+    Ocurrencia: (fecha, hora, tipo, id)
+    """
+    if isinstance(fila, Ocurrencia):
+        return (fila.fecha, fila.serie.hora_inicio, TIPO_OCURRENCIA, fila.serie.pk)
+    return (fila.fecha, fila.hora_inicio, TIPO_RESERVA, fila.id)
+
+
+def ocurrencias(series, desde=None, hasta=None, reverso=False):
+    """
+    Genera las ocurrencias de todas las ``series`` entre ``desde`` y
+    ``hasta``, ordenadas por ``clave_orden`` (descendente con ``reverso``).
+    """
+    generadores = [
+        (Ocurrencia(serie, fecha) for fecha in serie.fechas(desde, hasta, reverso=reverso))
+        for serie in series
+    ]
+    return heapq.merge(*generadores, key=clave_orden, reverse=reverso)
+
+
+def mapas_ocupacion(series, desde, hasta):
+    """``{(sala_id, fecha): mascara}`` de los bloques que ocupan las series"""
+    mapas = {}
+    for serie in series:
+        mascara = disponibilidad.mascara(serie.hora_inicio, serie.hora_fin)
+        for fecha in serie.fechas(desde, hasta):
+            clave = (serie.sala_id, fecha)
+            mapas[clave] = mapas.get(clave, 0) | mascara
+    return mapas
+
@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .models import Usuario, Sala, Reserva, DisponibilidadSala, Eliminacion
+from .estadisticas import invalidar_estadisticas
+from .cache_salas import invalidar_salas, invalidar_por_reserva
+from .authentication import invalidar_usuario
+from .tokens import lista_negra
+from . import analitica, eventos, trabajos
+
+
+def liberar_disponibilidad(sender, instance, **kwargs):
+    if instance.estado != 'cancelada':
+        DisponibilidadSala.liberar(instance.sala_id, instance.fecha)
+
+
+def actualizar_resumenes(sender, instance, **kwargs):
+    analitica.registrar_cambio(getattr(instance, '_anterior', None), analitica.valores(instance))
+
+
+def descontar_resumenes(sender, instance, **kwargs):
+    analitica.registrar_cambio(analitica.valores(instance), None)
+
+
+def registrar_eliminacion(sender, instance, **kwargs):
+    """Lápida para el feed de cambios: los clientes quitan el objeto de su vista"""
+    Eliminacion.objects.create(
+        modelo=sender._meta.model_name,
+        objeto_id=instance.pk,
+        propietario=getattr(instance, 'usuario_id', None),
+    )
+
+
+def publicar_reserva(sender, instance, created, **kwargs):
+    tipo = eventos.tipo_evento_reserva(getattr(instance, '_estado_anterior', None), instance.estado, created)
+    datos = eventos.datos_reserva(instance)
+    transaction.on_commit(lambda: eventos.difusor.publicar(tipo, datos))
+
+
+def notificar_cambio_estado(sender, instance, created, **kwargs):
+    """Confirmaciones y cancelaciones: las envía el trabajador (reservas.tareas)"""
+    tipo = eventos.tipo_evento_reserva(getattr(instance, '_estado_anterior', None), instance.estado, created)
+    if tipo in ('reserva.confirmada', 'reserva.cancelada'):
+        trabajos.encolar_notificaciones(tipo, [{
+            'id': instance.pk, 'usuario_id': instance.usuario_id, 'sala_id': instance.sala_id,
+            'fecha': instance.fecha, 'hora_inicio': instance.hora_inicio, 'hora_fin': instance.hora_fin,
+        }])
+
+
+def publicar_reserva_eliminada(sender, instance, **kwargs):
+    datos = eventos.datos_reserva(instance)
+    transaction.on_commit(lambda: eventos.difusor.publicar('reserva.eliminada', datos))
+
+
+def recordar_estado_sala(sender, instance, **kwargs):
+    instance._estado_anterior = (
+        Sala.objects.filter(pk=instance.pk).values_list('estado', flat=True).first() if instance.pk else None
+    )
+
+
+def publicar_estado_sala(sender, instance, created, **kwargs):
+    if not created and instance.estado != instance._estado_anterior:
+        datos = eventos.datos_sala(instance)
+        transaction.on_commit(lambda: eventos.difusor.publicar('sala.estado', datos))
+
+
+def recordar_carrera(sender, instance, update_fields=None, **kwargs):
+    # Los guardados parciales que no tocan la carrera (p. ej. last_login) no la consultan
+    if instance.pk is None or (update_fields is not None and 'carrera' not in update_fields):
+        instance._carrera_anterior = None
+        return
+    instance._carrera_anterior = Usuario.objects.filter(pk=instance.pk).values_list('carrera', flat=True).first()
+
+
+def traspasar_resumenes_de_carrera(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_carrera_anterior', None)
+    if not created and anterior is not None and anterior != instance.carrera:
+        analitica.cambiar_carrera(instance.pk, anterior, instance.carrera)
+
+
+def invalidar_usuario_cacheado(sender, instance, **kwargs):
+    invalidar_usuario(instance.pk)
+
+
+def invalidar_usuario_de_token(sender, instance, **kwargs):
+    if BlacklistedToken.token.is_cached(instance):
+        user_id, jti = instance.token.user_id, instance.token.jti
+    else:
+        user_id, jti = OutstandingToken.objects.filter(pk=instance.token_id).values_list(
+            'user_id', 'jti',
+        ).first() or (None, None)
+    if jti is not None:
+        transaction.on_commit(lambda: lista_negra.agregar(jti))
+    if user_id is not None:
+        invalidar_usuario(user_id)
+
+
+def conectar_signals():
+    for modelo in (Sala, Reserva):
+        post_save.connect(invalidar_estadisticas, sender=modelo, dispatch_uid=f'estadisticas_save_{modelo.__name__}')
+        post_delete.connect(invalidar_estadisticas, sender=modelo, dispatch_uid=f'estadisticas_delete_{modelo.__name__}')
+        post_delete.connect(registrar_eliminacion, sender=modelo, dispatch_uid=f'cambios_delete_{modelo.__name__}')
+    post_save.connect(invalidar_salas, sender=Sala, dispatch_uid='cache_salas_save_sala')
+    post_delete.connect(invalidar_salas, sender=Sala, dispatch_uid='cache_salas_delete_sala')
+    post_save.connect(invalidar_por_reserva, sender=Reserva, dispatch_uid='cache_salas_save_reserva')
+    post_delete.connect(invalidar_por_reserva, sender=Reserva, dispatch_uid='cache_salas_delete_reserva')
+    post_delete.connect(liberar_disponibilidad, sender=Reserva, dispatch_uid='disponibilidad_delete_reserva')
+    post_save.connect(actualizar_resumenes, sender=Reserva, dispatch_uid='analitica_save_reserva')
+    post_delete.connect(descontar_resumenes, sender=Reserva, dispatch_uid='analitica_delete_reserva')
+    post_save.connect(publicar_reserva, sender=Reserva, dispatch_uid='eventos_save_reserva')
+    post_save.connect(notificar_cambio_estado, sender=Reserva, dispatch_uid='notificaciones_save_reserva')
+    post_delete.connect(publicar_reserva_eliminada, sender=Reserva, dispatch_uid='eventos_delete_reserva')
+    pre_save.connect(recordar_estado_sala, sender=Sala, dispatch_uid='eventos_pre_save_sala')
+    post_save.connect(publicar_estado_sala, sender=Sala, dispatch_uid='eventos_save_sala')
+    pre_save.connect(recordar_carrera, sender=Usuario, dispatch_uid='analitica_pre_save_usuario')
+    post_save.connect(traspasar_resumenes_de_carrera, sender=Usuario, dispatch_uid='analitica_save_usuario')
+    post_save.connect(invalidar_usuario_cacheado, sender=Usuario, dispatch_uid='jwt_cache_save_usuario')
+    post_delete.connect(invalidar_usuario_cacheado, sender=Usuario, dispatch_uid='jwt_cache_delete_usuario')
+    post_save.connect(invalidar_usuario_de_token, sender=BlacklistedToken, dispatch_uid='jwt_cache_blacklist')
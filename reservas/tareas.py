@@ -0,0 +1,249 @@
+"""
+Cola de trabajos en segundo plano guardada en la base de datos (modelo Tarea).
+
+- ``@tarea('nombre')`` registra una función (en reservas.trabajos);
+  ``encolar('nombre', **argumentos)`` la programa dentro de la transacción en
+  curso: si la petición se revierte, la tarea tampoco existe.
+- ``manage.py trabajador`` reclama las tareas vencidas (SELECT ... FOR
+  UPDATE SKIP LOCKED, así que puede haber varios trabajadores), las ejecuta
+  y reintenta con espera exponencial las que fallan.
+- Las tareas de ``TAREAS['PERIODICAS']`` se vuelven a programar al terminar;
+  lo que devuelven (un dict) son los argumentos de la siguiente ejecución.
+- Con ``lote=True`` la función recibe la lista de argumentos de todas las
+  tareas de ese nombre reclamadas juntas (p. ej. para agrupar UPDATEs).
+
+Métricas: profundidad de la cola por nombre (``metricas()``, ``manage.py
+tareas``) y duración de cada ejecución, guardada en la tarea y registrada en
+los histogramas de reservas_proyecto.profiling como ``tarea:<nombre>``.
+"""
+import logging
+import time
+import traceback
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from reservas_proyecto import profiling
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+
+def _config():
+    return {
+        'LOTE': 100,
+        'PAUSA': 1.0,
+        'MAXIMO_INTENTOS': 5,
+        'REINTENTO_SEGUNDOS': 30,
+        'TIEMPO_MAXIMO': 600,
+        'RETENCION_DIAS': 7,
+        'PERIODICAS': {},
+        **getattr(settings, 'TAREAS', {}),
+    }
+
+
+@dataclass
+class Definicion:
+    nombre: str
+    funcion: object
+    lote: bool = False
+
+
+_registro = {}
+
+
+def tarea(nombre, lote=False):
+    """Decorador: registra ``funcion`` como la tarea ``nombre``"""
+    def registrar(funcion):
+        _registro[nombre] = Definicion(nombre, funcion, lote)
+        return funcion
+    return registrar
+
+
+def definicion(nombre):
+    try:
+        return _registro[nombre]
+    except KeyError:
+        raise LookupError(f"Tarea no registrada: {nombre}")
+
+
+def encolar(nombre, ejecutar_en=None, clave=None, **argumentos):
+    """
+    Programa la tarea ``nombre``. Con ``clave``, si ya hay una tarea activa
+    con esa clave no se crea otra y devuelve None.
+    """
+    definicion(nombre)
+    tarea = Tarea(
+        nombre=nombre, argumentos=argumentos, clave=clave, ejecutar_en=ejecutar_en or timezone.now(),
+    )
+    if clave is None:
+        tarea.save()
+        return tarea
+    try:
+        with transaction.atomic():
+            tarea.save()
+    except IntegrityError:
+        return None
+    return tarea
+
+
+def encolar_lote(nombre, lista_argumentos):
+    """Una tarea por dict de ``lista_argumentos``, con un solo INSERT"""
+    definicion(nombre)
+    ahora = timezone.now()
+    return Tarea.objects.bulk_create(
+        [Tarea(nombre=nombre, argumentos=argumentos, ejecutar_en=ahora) for argumentos in lista_argumentos],
+        batch_size=1000,
+    )
+
+
+def programar_periodicas():
+    """Encola las tareas periódicas que no tienen una ejecución activa"""
+    periodicas = _config()['PERIODICAS']
+    activas = set(Tarea.objects.filter(
+        clave__in=list(periodicas), estado__in=[Tarea.PENDIENTE, Tarea.EN_CURSO],
+    ).values_list('clave', flat=True))
+    for nombre in periodicas:
+        if nombre not in activas:
+            encolar(nombre, clave=nombre)
+
+
+def reclamar(limite):
+    """
+    Marca como en curso hasta ``limite`` tareas vencidas (o en curso desde
+    hace más de TIEMPO_MAXIMO: su trabajador murió) y las devuelve
+    """
+    config = _config()
+    ahora = timezone.now()
+    vencidas = (
+        Q(estado=Tarea.PENDIENTE, ejecutar_en__lte=ahora)
+        | Q(estado=Tarea.EN_CURSO, iniciada_en__lt=ahora - timedelta(seconds=config['TIEMPO_MAXIMO']))
+    )
+    with transaction.atomic():
+        ids = list(
+            Tarea.objects.select_for_update(skip_locked=True).filter(vencidas)
+            .order_by('ejecutar_en').values_list('id', flat=True)[:limite]
+        )
+        if not ids:
+            return []
+        Tarea.objects.filter(pk__in=ids).update(estado=Tarea.EN_CURSO, iniciada_en=ahora, intentos=F('intentos') + 1)
+    return list(Tarea.objects.filter(pk__in=ids).order_by('ejecutar_en'))
+
+
+def _ejecutar(definicion, tareas):
+    """Ejecuta una tarea (o un lote) midiendo su duración y sus consultas"""
+    from reservas_proyecto.middleware import ProfilingMiddleware
+
+    perfil = profiling.Perfil()
+    try:
+        with ProfilingMiddleware.envolver_conexiones(perfil), profiling.activar(perfil):
+            if definicion.lote:
+                return definicion.funcion([t.argumentos for t in tareas])
+            return definicion.funcion(**tareas[0].argumentos)
+    finally:
+        duracion = time.perf_counter() - perfil.inicio
+        profiling.registro.registrar(f'tarea:{definicion.nombre}', {
+            'total_ms': duracion * 1000, 'db_ms': perfil.db * 1000, 'consultas': perfil.consultas,
+        })
+        for t in tareas:
+            t.duracion_ms = duracion * 1000 / len(tareas)
+
+
+def _terminar(tareas, resultado):
+    ahora = timezone.now()
+    periodicas = _config()['PERIODICAS']
+    with transaction.atomic():
+        for t in tareas:
+            t.estado, t.terminada_en, t.clave, t.error = Tarea.COMPLETADA, ahora, None, ''
+        Tarea.objects.bulk_update(tareas, ['estado', 'terminada_en', 'clave', 'error', 'duracion_ms'])
+        for t in tareas:
+            if t.nombre in periodicas:
+                encolar(
+                    t.nombre, ejecutar_en=t.iniciada_en + timedelta(seconds=periodicas[t.nombre]),
+                    clave=t.nombre, **(resultado if isinstance(resultado, dict) else {}),
+                )
+
+
+def _fallar(tareas, error):
+    config = _config()
+    ahora = timezone.now()
+    for t in tareas:
+        t.error = error
+        if t.intentos < config['MAXIMO_INTENTOS']:
+            t.estado = Tarea.PENDIENTE
+            t.ejecutar_en = ahora + timedelta(seconds=config['REINTENTO_SEGUNDOS'] * 2 ** (t.intentos - 1))
+        else:
+            t.estado, t.terminada_en, t.clave = Tarea.FALLIDA, ahora, None
+    Tarea.objects.bulk_update(tareas, ['estado', 'ejecutar_en', 'terminada_en', 'clave', 'error', 'duracion_ms'])
+
+
+def ejecutar_pendientes(limite=None):
+    """Reclama y ejecuta un lote de tareas. Devuelve cuántas se ejecutaron"""
+    reclamadas = reclamar(limite or _config()['LOTE'])
+    grupos = defaultdict(list)
+    for t in reclamadas:
+        try:
+            definicion_tarea = definicion(t.nombre)
+        except LookupError as exc:
+            _fallar([t], str(exc))
+            continue
+        # Las tareas de lote se ejecutan juntas; las demás, una por una
+        grupos[(t.nombre, None if definicion_tarea.lote else t.pk)].append(t)
+
+    for (nombre, _), tareas in grupos.items():
+        try:
+            resultado = _ejecutar(definicion(nombre), tareas)
+        except Exception:
+            logger.exception('Falló la tarea %s', nombre)
+            _fallar(tareas, traceback.format_exc())
+        else:
+            _terminar(tareas, resultado)
+    return len(reclamadas)
+
+
+def metricas():
+    """
+    Por nombre de tarea: cola (pendientes ya vencidas), programadas a
+    futuro, en curso, fallidas y duración de las completadas en la última hora
+    """
+    ahora = timezone.now()
+    hace_una_hora = ahora - timedelta(hours=1)
+    filas = Tarea.objects.order_by().values('nombre').annotate(
+        cola=Count('id', filter=Q(estado=Tarea.PENDIENTE, ejecutar_en__lte=ahora)),
+        programadas=Count('id', filter=Q(estado=Tarea.PENDIENTE, ejecutar_en__gt=ahora)),
+        en_curso=Count('id', filter=Q(estado=Tarea.EN_CURSO)),
+        fallidas=Count('id', filter=Q(estado=Tarea.FALLIDA)),
+        completadas_hora=Count('id', filter=Q(estado=Tarea.COMPLETADA, terminada_en__gte=hace_una_hora)),
+        duracion_maxima_ms=Max('duracion_ms', filter=Q(estado=Tarea.COMPLETADA, terminada_en__gte=hace_una_hora)),
+    )
+    resultado = {fila.pop('nombre'): fila for fila in filas}
+    for nombre, datos in resultado.items():
+        duraciones = sorted(Tarea.objects.filter(
+            nombre=nombre, estado=Tarea.COMPLETADA, terminada_en__gte=hace_una_hora,
+        ).order_by('-terminada_en').values_list('duracion_ms', flat=True)[:1000])
+        datos['duracion_p50_ms'] = round(duraciones[len(duraciones) // 2], 3) if duraciones else None
+        datos['duracion_p95_ms'] = round(duraciones[int(len(duraciones) * 0.95)], 3) if duraciones else None
+        # Antigüedad de la tarea vencida más vieja: cuánto se atrasa la cola
+        primera = Tarea.objects.filter(
+            nombre=nombre, estado=Tarea.PENDIENTE, ejecutar_en__lte=ahora,
+        ).order_by('ejecutar_en').values_list('ejecutar_en', flat=True).first()
+        datos['retraso_s'] = round((ahora - primera).total_seconds(), 1) if primera else 0
+    return resultado
+
+
+def purgar(lote=1000):
+    """Borra por lotes las tareas terminadas hace más de RETENCION_DIAS. Devuelve cuántas"""
+    limite = timezone.now() - timedelta(days=_config()['RETENCION_DIAS'])
+    total = 0
+    while True:
+        ids = list(Tarea.objects.filter(
+            estado__in=[Tarea.COMPLETADA, Tarea.FALLIDA], terminada_en__lt=limite,
+        ).values_list('id', flat=True)[:lote])
+        if not ids:
+            return total
+        total += Tarea.objects.filter(pk__in=ids).delete()[0]
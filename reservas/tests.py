@@ -1,3 +1,1832 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+from datetime import time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Usuario, Sala, Reserva, SerieReserva, ResumenDiario, ResumenCarrera
+from . import analitica, disponibilidad, eventos, masivas, notificaciones, tareas
+
+
+class ConsultasPorEndpointTests(TestCase):
+    """
+    Cada endpoint de lectura debe ejecutar un número fijo de consultas,
+    independiente de la cantidad de filas que devuelve (sin N+1).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.cl', email='admin@test.cl', password='x',
+            first_name='Ana', last_name='Admin', rol='admin',
+        )
+        cls.usuario = Usuario.objects.create_user(
+            username='user@test.cl', email='user@test.cl', password='x',
+            first_name='Uno', last_name='Usuario',
+        )
+        cls.salas = [
+            Sala.objects.create(nombre=f'Sala {i}', capacidad=10, ubicacion='Edificio A', equipamiento='')
+            for i in range(3)
+        ]
+        cls.siguiente_dia = 0
+
+    def crear_reservas(self, cantidad):
+        hoy = timezone.localdate()
+        reservas = []
+        for i in range(cantidad):
+            # La primera tanda cae hoy (para /hoy/), el resto en días futuros
+            dia = hoy if i < len(self.salas) else hoy + timedelta(days=1 + self.siguiente_dia)
+            reservas.append(Reserva(
+                usuario=self.usuario if i % 2 else self.admin,
+                sala=self.salas[i % len(self.salas)],
+                fecha=dia,
+                hora_inicio=time(9 + (i // len(self.salas)) % 8),
+                hora_fin=time(10 + (i // len(self.salas)) % 8),
+                motivo_uso='test',
+            ))
+            self.siguiente_dia += 1
+        Reserva.objects.bulk_create(reservas)
+
+    def assertConsultasConstantes(self, usuario, url, consultas):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+
+        # Se mide la respuesta sin el caché de salas (reservas.cache_salas)
+        self.crear_reservas(3)
+        cache.clear()
+        with self.assertNumQueries(consultas):
+            respuesta = cliente.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+
+        self.crear_reservas(20)
+        cache.clear()
+        with self.assertNumQueries(consultas):
+            respuesta = cliente.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+
+    # Las lecturas de ReservaViewSet suman un agregado por fuente para el
+    # ETag (reservas.condicional)
+    def test_reservas_list(self):
+        self.assertConsultasConstantes(self.admin, '/api/reservas/', 2)
+
+    def test_reservas_list_usuario_regular(self):
+        self.assertConsultasConstantes(self.usuario, '/api/reservas/', 2)
+
+    def test_reservas_detail(self):
+        self.crear_reservas(1)
+        reserva = Reserva.objects.first()
+        cliente = APIClient()
+        cliente.force_authenticate(self.admin)
+        with self.assertNumQueries(2):
+            cliente.get(f'/api/reservas/{reserva.id}/')
+
+    def test_reservas_hoy(self):
+        # Series vigentes + reservas del día
+        self.assertConsultasConstantes(self.admin, '/api/reservas/hoy/', 4)
+
+    def test_reservas_pendientes(self):
+        self.assertConsultasConstantes(self.admin, '/api/reservas/pendientes/', 2)
+
+    def test_mis_reservas(self):
+        # Series del usuario + reservas individuales
+        self.assertConsultasConstantes(self.usuario, '/api/reservas/mis_reservas/', 4)
+
+    def test_reservas_de_usuario(self):
+        self.assertConsultasConstantes(self.admin, f'/api/usuarios/{self.usuario.id}/reservas/', 2)
+
+    def test_reservas_de_sala(self):
+        self.assertConsultasConstantes(self.admin, f'/api/salas/{self.salas[0].id}/reservas/', 2)
+
+    def test_usuarios_list(self):
+        # COUNT de la paginación + listado con total de reservas anotado
+        self.assertConsultasConstantes(self.admin, '/api/usuarios/', 2)
+
+    def test_salas_list(self):
+        self.assertConsultasConstantes(self.usuario, '/api/salas/', 2)
+
+    def test_salas_disponibles(self):
+        self.assertConsultasConstantes(self.usuario, '/api/salas/disponibles/', 1)
+
+
+class ConflictosReservaTests(TestCase):
+    """Reglas de solapamiento en la API y en el modelo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala X1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+        cls.manana = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.usuario)
+        self.existente = Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=self.manana,
+            hora_inicio=time(9), hora_fin=time(10), motivo_uso='existente',
+        )
+
+    def crear(self, inicio, fin):
+        return self.cliente.post('/api/reservas/', {
+            'sala': self.sala.id, 'fecha': str(self.manana),
+            'hora_inicio': inicio, 'hora_fin': fin, 'motivo_uso': 'clase',
+        }, format='json')
+
+    def test_solapadas_rechazadas(self):
+        self.assertEqual(self.crear('09:30', '10:30').status_code, 400)
+        self.assertEqual(self.crear('08:00', '11:00').status_code, 400)
+        otra = self.crear('11:00', '12:00')
+        self.assertEqual(otra.status_code, 201)
+        respuesta = self.cliente.patch(f"/api/reservas/{otra.data['id']}/", {'hora_inicio': '09:45'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_seguidas_y_canceladas_no_chocan(self):
+        self.assertEqual(self.crear('10:00', '11:00').status_code, 201)
+        self.assertEqual(self.crear('08:00', '09:00').status_code, 201)
+        self.existente.estado = 'cancelada'
+        self.existente.save()
+        self.assertEqual(self.crear('09:00', '10:00').status_code, 201)
+
+    def test_modelo(self):
+        with self.assertRaisesMessage(DjangoValidationError, 'La sala ya tiene una reserva en ese horario'):
+            Reserva.objects.create(
+                usuario=self.usuario, sala=self.sala, fecha=self.manana,
+                hora_inicio=time(9, 30), hora_fin=time(11), motivo_uso='choca',
+            )
+        Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=self.manana,
+            hora_inicio=time(9, 30), hora_fin=time(11), motivo_uso='cancelada', estado='cancelada',
+        )
+
+    def test_editar_en_sala_en_mantenimiento(self):
+        Sala.objects.filter(pk=self.sala.pk).update(estado='mantenimiento')
+        url = f'/api/reservas/{self.existente.pk}/'
+        respuesta = self.cliente.patch(url, {'motivo_uso': 'otro motivo'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        respuesta = self.cliente.patch(url, {'hora_fin': '10:30'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.data, {'sala': ['La sala no está disponible']})
+
+    def test_confirmar_con_conflicto(self):
+        # Datos inconsistentes (bulk_create no valida): confirmar responde 400, no 500
+        choca, = Reserva.objects.bulk_create([Reserva(
+            usuario=self.usuario, sala=self.sala, fecha=self.manana,
+            hora_inicio=time(9, 30), hora_fin=time(10, 30), motivo_uso='choca',
+        )])
+        respuesta = self.cliente.post(f'/api/reservas/{choca.pk}/confirmar/')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.data, ['La sala ya tiene una reserva en ese horario'])
+
+
+@override_settings(CAMBIOS_MARGEN_SEGUNDOS=0)
+class CambiosTests(TestCase):
+    """Feed de cambios /api/cambios/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.cl', email='admin@test.cl', password='x', rol='admin',
+        )
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        cls.otro = Usuario.objects.create_user(
+            username='otro@test.cl', email='otro@test.cl', password='x', first_name='Otro', last_name='Usuario',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala F1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+        cls.manana = timezone.localdate() + timedelta(days=1)
+
+    def reservar(self, usuario, hora):
+        return Reserva.objects.create(
+            usuario=usuario, sala=self.sala, fecha=self.manana,
+            hora_inicio=time(hora), hora_fin=time(hora + 1), motivo_uso='clase',
+        )
+
+    def cambios(self, usuario, desde=None, **cabeceras):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        return cliente.get('/api/cambios/', {'desde': desde} if desde else {}, **cabeceras)
+
+    def cursor(self, usuario):
+        return self.cambios(usuario).json()['cursor']
+
+    def test_sin_desde_solo_cursor(self):
+        self.reservar(self.usuario, 9)
+        datos = self.cambios(self.usuario).json()
+        self.assertTrue(datos.pop('cursor'))
+        self.assertEqual(datos, {'hay_mas': False, 'reservas': [], 'salas': [], 'eliminados': []})
+
+    def test_sin_cambios_mismo_etag(self):
+        cursor = self.cursor(self.usuario)
+        primera = self.cambios(self.usuario, cursor)
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(primera.json()['cursor'], cursor)
+        segunda = self.cambios(self.usuario, cursor)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(self.cambios(self.usuario, cursor, HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 304)
+
+        # Un cambio mueve el cursor y el ETag
+        self.reservar(self.usuario, 9)
+        tercera = self.cambios(self.usuario, cursor, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(tercera.status_code, 200)
+        self.assertNotEqual(tercera['ETag'], primera['ETag'])
+        self.assertEqual(self.cambios(self.usuario, 'no-es-un-cursor').status_code, 400)
+
+    def test_eliminacion_deja_lapida(self):
+        from .models import Eliminacion
+
+        reserva = self.reservar(self.usuario, 9)
+        cursor = self.cursor(self.usuario)
+        pk = reserva.pk
+        reserva.delete()
+        self.assertTrue(Eliminacion.objects.filter(modelo='reserva', objeto_id=pk).exists())
+        datos = self.cambios(self.usuario, cursor).json()
+        self.assertEqual(datos['eliminados'], [{'modelo': 'reserva', 'id': pk}])
+        # La lápida de una reserva ajena no se ve
+        self.assertEqual(self.cambios(self.otro, cursor).json()['eliminados'], [])
+
+    def test_usuario_solo_ve_las_suyas(self):
+        cursores = {u.pk: self.cursor(u) for u in (self.admin, self.usuario, self.otro)}
+        propia = self.reservar(self.usuario, 9)
+        ajena = self.reservar(self.otro, 11)
+
+        def ids(usuario):
+            return {r['id'] for r in self.cambios(usuario, cursores[usuario.pk]).json()['reservas']}
+
+        self.assertEqual(ids(self.usuario), {propia.pk})
+        self.assertEqual(ids(self.otro), {ajena.pk})
+        self.assertEqual(ids(self.admin), {propia.pk, ajena.pk})
+
+    def test_margen_retiene_filas_recientes(self):
+        cursor = self.cursor(self.usuario)
+        reserva = self.reservar(self.usuario, 9)
+        with override_settings(CAMBIOS_MARGEN_SEGUNDOS=60):
+            self.assertEqual(self.cambios(self.usuario, cursor).json()['reservas'], [])
+            Reserva.objects.filter(pk=reserva.pk).update(fecha_modificacion=timezone.now() - timedelta(seconds=61))
+            self.assertEqual([r['id'] for r in self.cambios(self.usuario, cursor).json()['reservas']], [reserva.pk])
+
+    def test_limite_y_hay_mas(self):
+        cursor = self.cursor(self.usuario)
+        reservas = [self.reservar(self.usuario, hora) for hora in (9, 11, 13)]
+        with override_settings(CAMBIOS_LIMITE=2):
+            datos = self.cambios(self.usuario, cursor).json()
+            self.assertTrue(datos['hay_mas'])
+            self.assertEqual([r['id'] for r in datos['reservas']], [r.pk for r in reservas[:2]])
+            datos = self.cambios(self.usuario, datos['cursor']).json()
+            self.assertFalse(datos['hay_mas'])
+            self.assertEqual([r['id'] for r in datos['reservas']], [reservas[2].pk])
+
+
+class EventosTests(TestCase):
+    """Eventos publicados al confirmar la transacción (backend en memoria)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='user@test.cl', email='user@test.cl', password='x',
+            first_name='Uno', last_name='Usuario',
+        )
+        cls.otro = Usuario.objects.create_user(
+            username='otro@test.cl', email='otro@test.cl', password='x',
+            first_name='Otro', last_name='Usuario',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala E', capacidad=10, ubicacion='Edificio A', equipamiento='')
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def suscribir(self, usuario):
+        async def suscribir():
+            return eventos.difusor.suscribir(eventos.visible_para(usuario))
+        suscripcion = self.loop.run_until_complete(suscribir())
+        self.addCleanup(eventos.difusor.cancelar, suscripcion)
+        return suscripcion
+
+    def recibidos(self, suscripcion):
+        async def vaciar():
+            await asyncio.sleep(0)
+            tipos = []
+            while not suscripcion.cola.empty():
+                tipos.append(suscripcion.cola.get_nowait()['tipo'])
+            return tipos
+        return self.loop.run_until_complete(vaciar())
+
+    def test_ciclo_de_vida_de_reserva(self):
+        propia = self.suscribir(self.usuario)
+        ajena = self.suscribir(self.otro)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva = Reserva.objects.create(
+                usuario=self.usuario, sala=self.sala, fecha=timezone.localdate() + timedelta(days=1),
+                hora_inicio=time(9), hora_fin=time(10), motivo_uso='test',
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.estado = 'confirmada'
+            reserva.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.estado = 'cancelada'
+            reserva.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sala.estado = 'mantenimiento'
+            self.sala.save()
+
+        self.assertEqual(self.recibidos(propia), [
+            'reserva.creada', 'reserva.confirmada', 'reserva.cancelada', 'reserva.eliminada', 'sala.estado',
+        ])
+        self.assertEqual(self.recibidos(ajena), ['sala.estado'])
+
+    def test_sin_asgi(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        autorizacion = f'Bearer {AccessToken.for_user(self.usuario)}'
+        respuesta = self.client.get('/api/eventos/', HTTP_AUTHORIZATION=autorizacion)
+        self.assertEqual(respuesta.status_code, 501)
+        self.assertEqual(respuesta.json()['sondeo'], '/api/cambios/')
+        respuesta = self.client.post('/api/eventos/ticket/', HTTP_AUTHORIZATION=autorizacion)
+        self.assertEqual(respuesta.status_code, 501)
+
+    async def test_ticket(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        await sync_to_async(cache.clear)()
+        token = str(AccessToken.for_user(self.usuario))
+        # El token de acceso no se acepta en la URL
+        respuesta = await self.async_client.get(f'/api/eventos/?token={token}')
+        self.assertEqual(respuesta.status_code, 401)
+
+        respuesta = await self.async_client.post('/api/eventos/ticket/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(respuesta.status_code, 200)
+        ticket = respuesta.json()['ticket']
+        self.assertNotIn(token, ticket)
+
+        respuesta = await self.async_client.get('/api/eventos/', {'ticket': ticket})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        flujo = respuesta.streaming_content
+        self.assertTrue((await anext(flujo)).startswith(b'retry: '))
+        await flujo.aclose()
+
+        # Un solo uso
+        respuesta = await self.async_client.get('/api/eventos/', {'ticket': ticket})
+        self.assertEqual(respuesta.status_code, 401)
+
+
+class DisponibilidadTests(TestCase):
+    """Mapas de DisponibilidadSala y grilla /api/salas/disponibilidad/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala D1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+        cls.manana = timezone.localdate() + timedelta(days=1)
+
+    def reservar(self, hora_inicio, hora_fin, **campos):
+        return Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=campos.pop('fecha', self.manana),
+            hora_inicio=hora_inicio, hora_fin=hora_fin, motivo_uso='clase', **campos,
+        )
+
+    def mapa(self, fecha=None):
+        from .models import DisponibilidadSala
+        fila = DisponibilidadSala.objects.filter(sala=self.sala, fecha=fecha or self.manana).first()
+        return fila.ocupacion if fila else 0
+
+    def grilla(self, **params):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuario)
+        return cliente.get('/api/salas/disponibilidad/', params)
+
+    def test_mapa_sigue_a_las_reservas(self):
+        reserva = self.reservar(time(9), time(10))
+        self.assertEqual(self.mapa(), disponibilidad.mascara(time(9), time(10)))
+
+        # Mover de horario y de día
+        reserva.hora_inicio, reserva.hora_fin = time(11), time(12, 30)
+        reserva.save()
+        self.assertEqual(self.mapa(), disponibilidad.mascara(time(11), time(12, 30)))
+        reserva.fecha = self.manana + timedelta(days=1)
+        reserva.save()
+        self.assertEqual(self.mapa(), 0)
+        self.assertEqual(self.mapa(reserva.fecha), disponibilidad.mascara(time(11), time(12, 30)))
+
+        reserva.estado = 'cancelada'
+        reserva.save()
+        self.assertEqual(self.mapa(reserva.fecha), 0)
+
+        self.reservar(time(14), time(15)).delete()
+        self.assertEqual(self.mapa(), 0)
+
+    def test_bloque_compartido(self):
+        # 09:00-09:10 y 09:10-09:20 comparten el bloque 09:00-09:15
+        a = self.reservar(time(9), time(9, 10))
+        b = self.reservar(time(9, 10), time(9, 20))
+        a.estado = 'cancelada'
+        a.save()
+        self.assertEqual(self.mapa(), disponibilidad.mascara(b.hora_inicio, b.hora_fin))
+
+        dia, = self.grilla(desde=self.manana, hasta=self.manana).json()['salas'][0]['dias']
+        self.assertEqual(dia['ocupados'], [['09:00', '09:30']])
+
+        b.delete()
+        self.assertEqual(self.mapa(), 0)
+        self.reservar(time(9, 5), time(9, 12))
+        self.reservar(time(9, 12), time(9, 20)).delete()
+        self.assertEqual(self.mapa(), disponibilidad.mascara(time(9, 5), time(9, 12)))
+
+    def test_grilla(self):
+        from .models import SerieReserva
+
+        self.reservar(time(8), time(9))
+        SerieReserva.objects.create(
+            usuario=self.usuario, sala=self.sala, hora_inicio=time(20), hora_fin=time(22), motivo_uso='serie',
+            frecuencia='diaria', fecha_inicio=self.manana, fecha_fin=self.manana,
+        )
+        cerrada = Sala.objects.create(
+            nombre='Sala D2', capacidad=5, ubicacion='Edificio A', equipamiento='', estado='mantenimiento',
+        )
+
+        respuesta = self.grilla(desde=self.manana, hasta=self.manana + timedelta(days=1))
+        self.assertEqual(respuesta.status_code, 200)
+        salas = {sala['sala']: sala for sala in respuesta.json()['salas']}
+        hoy, siguiente = salas[self.sala.id]['dias']
+        self.assertEqual(hoy['ocupados'], [['08:00', '09:00'], ['20:00', '22:00']])
+        self.assertEqual(hoy['libres'], [['09:00', '20:00']])
+        self.assertEqual(siguiente['libres'], [['08:00', '22:00']])
+        self.assertEqual(salas[cerrada.id]['dias'][0]['libres'], [])
+
+        self.assertEqual(self.grilla(desde='ayer').status_code, 400)
+        self.assertEqual(self.grilla(desde=self.manana, hasta=self.manana + timedelta(days=40)).status_code, 400)
+
+
+class ReservasMasivasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='user@test.cl', email='user@test.cl', password='x',
+            first_name='Uno', last_name='Usuario',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala M', capacidad=10, ubicacion='Edificio A', equipamiento='')
+        cls.fecha = timezone.localdate() + timedelta(days=1)
+        Reserva.objects.create(
+            usuario=cls.usuario, sala=cls.sala, fecha=cls.fecha,
+            hora_inicio=time(9), hora_fin=time(10), motivo_uso='existente',
+        )
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.usuario)
+        self.items = [
+            {'sala': self.sala.id, 'fecha': str(self.fecha), 'hora_inicio': inicio, 'hora_fin': fin, 'motivo_uso': 'lote'}
+            for inicio, fin in (('09:30', '10:30'), ('10:00', '11:00'), ('10:30', '11:30'), ('12:00', '13:00'))
+        ]
+
+    def test_todo_o_nada(self):
+        respuesta = self.cliente.post('/api/reservas/bulk/', {'reservas': self.items}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(
+            [r['estado'] for r in respuesta.data['resultados']], ['error', 'omitida', 'error', 'omitida'],
+        )
+        self.assertEqual(Reserva.objects.count(), 1)
+
+    def test_parcial(self):
+        respuesta = self.cliente.post(
+            '/api/reservas/bulk/', {'reservas': self.items, 'modo': 'parcial'}, format='json',
+        )
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual(
+            [r['estado'] for r in respuesta.data['resultados']], ['error', 'creada', 'error', 'creada'],
+        )
+        self.assertEqual(Reserva.objects.count(), 3)
+        # Los mapas de disponibilidad reflejan las reservas insertadas con bulk_create
+        self.assertEqual(
+            self.sala.disponibilidad.get(fecha=self.fecha).ocupacion,
+            disponibilidad.mascara(time(9), time(11)) | disponibilidad.mascara(time(12), time(13)),
+        )
+
+    def test_no_confia_en_los_mapas(self):
+        from .models import DisponibilidadSala
+
+        fecha = self.fecha + timedelta(days=1)
+        a = Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=fecha,
+            hora_inicio=time(9), hora_fin=time(9, 10), motivo_uso='a',
+        )
+        Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=fecha,
+            hora_inicio=time(9, 10), hora_fin=time(9, 20), motivo_uso='b',
+        )
+        a.estado = 'cancelada'
+        a.save()
+        item = {'sala': self.sala.id, 'fecha': str(fecha), 'hora_inicio': '09:05', 'hora_fin': '09:12', 'motivo_uso': 'lote'}
+        respuesta = self.cliente.post('/api/reservas/bulk/', {'reservas': [item]}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+        # Aunque el mapa esté desactualizado, decide la tabla de reservas
+        DisponibilidadSala.objects.filter(sala=self.sala, fecha=fecha).update(ocupacion=0)
+        respuesta = self.cliente.post('/api/reservas/bulk/', {'reservas': [item]}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(
+            respuesta.data['resultados'][0]['errores'],
+            {'non_field_errors': ['La sala ya tiene una reserva en ese horario']},
+        )
+
+
+class SeriesReservaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='user@test.cl', email='user@test.cl', password='x',
+            first_name='Uno', last_name='Usuario',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala S', capacidad=10, ubicacion='Edificio A', equipamiento='')
+        cls.lunes = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        # Lunes y miércoles de 10 a 12 durante 4 semanas, sin el segundo miércoles
+        cls.serie = SerieReserva.objects.create(
+            usuario=cls.usuario, sala=cls.sala, hora_inicio=time(10), hora_fin=time(12),
+            motivo_uso='Clase', dias_semana=[0, 2],
+            fecha_inicio=cls.lunes, fecha_fin=cls.lunes + timedelta(days=27),
+            excepciones=[(cls.lunes + timedelta(days=9)).isoformat()],
+        )
+        Reserva.objects.create(
+            usuario=cls.usuario, sala=cls.sala, fecha=cls.lunes + timedelta(days=1),
+            hora_inicio=time(9), hora_fin=time(10), motivo_uso='individual',
+        )
+
+    def test_expansion(self):
+        self.assertEqual(len(list(self.serie.fechas())), 7)
+        self.assertFalse(self.serie.incluye(self.lunes + timedelta(days=9)))
+
+    def test_conflicto_con_ocurrencia(self):
+        with self.assertRaises(DjangoValidationError):
+            Reserva.objects.create(
+                usuario=self.usuario, sala=self.sala, fecha=self.lunes + timedelta(days=14),
+                hora_inicio=time(11), hora_fin=time(13), motivo_uso='choca',
+            )
+        # Fecha exceptuada: libre
+        Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=self.lunes + timedelta(days=9),
+            hora_inicio=time(11), hora_fin=time(13), motivo_uso='no choca',
+        )
+
+    def test_mis_reservas_intercala_ocurrencias(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuario)
+        vistos = []
+        url = '/api/reservas/mis_reservas/?page_size=3'
+        while url:
+            datos = cliente.get(url).data
+            vistos += [(r['fecha'], r.get('serie')) for r in datos['results']]
+            url = datos['next']
+        self.assertEqual(len(vistos), 8)
+        self.assertEqual(vistos, sorted(vistos, key=lambda v: v[0], reverse=True))
+        self.assertEqual(sum(1 for _, serie in vistos if serie == self.serie.id), 7)
+
+    def test_disponibilidad_incluye_series(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuario)
+        datos = cliente.get('/api/salas/disponibilidad/', {'desde': str(self.lunes), 'hasta': str(self.lunes)}).data
+        dia = datos['salas'][0]['dias'][0]
+        self.assertEqual(dia['ocupados'], [['10:00', '12:00']])
+
+    def test_confirmar_con_conflicto(self):
+        # Una reserva que entró sin validar (bulk_create) choca con la serie
+        Reserva.objects.bulk_create([Reserva(
+            usuario=self.usuario, sala=self.sala, fecha=self.lunes,
+            hora_inicio=time(11), hora_fin=time(12), motivo_uso='choca',
+        )])
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuario)
+        respuesta = cliente.post(f'/api/series/{self.serie.pk}/confirmar/')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.data, ['La sala ya tiene una reserva en el horario de la serie'])
+
+
+class ExportacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.cl', email='admin@test.cl', password='x',
+            first_name='Ana', last_name='Admin', rol='admin',
+        )
+        cls.salas = [
+            Sala.objects.create(nombre=f'Sala X{i}', capacidad=10, ubicacion='Edificio A', equipamiento='')
+            for i in range(2)
+        ]
+        hoy = timezone.localdate()
+        Reserva.objects.bulk_create([
+            Reserva(
+                usuario=cls.admin, sala=cls.salas[i % 2], fecha=hoy + timedelta(days=i // 2),
+                hora_inicio=time(9), hora_fin=time(10), motivo_uso=f'motivo, "{i}"',
+                estado='cancelada' if i % 5 == 0 else 'pendiente',
+            )
+            for i in range(25)
+        ])
+
+    def exportar(self, **params):
+        cliente = APIClient()
+        cliente.force_authenticate(self.admin)
+        respuesta = cliente.get('/api/reservas/exportar/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return b''.join(respuesta.streaming_content).decode()
+
+    @override_settings(EXPORTACION_TAMANO_LOTE=4)
+    def test_csv_en_lotes(self):
+        filas = list(csv.reader(io.StringIO(self.exportar(sala=self.salas[0].id, estado='pendiente'))))
+        self.assertEqual(filas[0][:3], ['id', 'fecha', 'hora_inicio'])
+        esperadas = Reserva.objects.filter(sala=self.salas[0], estado='pendiente').order_by('fecha', 'hora_inicio', 'id')
+        self.assertEqual([int(f[0]) for f in filas[1:]], list(esperadas.values_list('id', flat=True)))
+
+    def test_jsonl(self):
+        lineas = self.exportar(formato='jsonl').splitlines()
+        self.assertEqual(len(lineas), 25)
+        self.assertEqual(json.loads(lineas[0])['motivo_uso'], 'motivo, "0"')
+
+
+class AnaliticaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.cl', email='admin@test.cl', password='x',
+            first_name='Ana', last_name='Admin', rol='admin', carrera='Ingeniería',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala R1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+
+    def resumenes(self):
+        return (
+            sorted(ResumenDiario.objects.filter(reservas__gt=0).values_list(
+                'sala_id', 'fecha', *analitica.CAMPOS_RESUMEN)),
+            sorted(ResumenCarrera.objects.filter(reservas__gt=0).values_list(
+                'fecha', 'carrera', *analitica.CAMPOS_CARRERA)),
+        )
+
+    def test_deltas_coinciden_con_reconstruccion(self):
+        ayer = timezone.localdate() - timedelta(days=1)
+        reservas = [
+            Reserva.objects.create(
+                usuario=self.admin, sala=self.sala, fecha=ayer,
+                hora_inicio=time(8 + 2 * i), hora_fin=time(9 + 2 * i), motivo_uso='clase',
+            )
+            for i in range(3)
+        ]
+        reservas[0].estado = 'confirmada'
+        reservas[0].save()
+        reservas[1].estado = 'cancelada'
+        reservas[1].save()
+        reservas[2].hora_fin = time(14)
+        reservas[2].save()
+        Reserva.objects.create(
+            usuario=self.admin, sala=self.sala, fecha=ayer + timedelta(days=1),
+            hora_inicio=time(8), hora_fin=time(9), motivo_uso='borrar',
+        ).delete()
+        masivas.crear_reservas(self.admin, [{
+            'sala': self.sala.id, 'fecha': ayer + timedelta(days=2),
+            'hora_inicio': '10:00', 'hora_fin': '11:30', 'motivo_uso': 'lote',
+        }])
+
+        incrementales = self.resumenes()
+        analitica.reconstruir()
+        self.assertEqual(self.resumenes(), incrementales)
+
+        fila = ResumenDiario.objects.get(sala=self.sala, fecha=ayer)
+        self.assertEqual((fila.reservas, fila.canceladas, fila.minutos_reservados), (3, 1, 60 + 120))
+
+        cliente = APIClient()
+        cliente.force_authenticate(self.admin)
+        respuesta = cliente.get('/api/analytics/salas/', {'desde': ayer, 'hasta': ayer})
+        self.assertEqual(respuesta.status_code, 200)
+        salas = respuesta.json()
+        self.assertEqual(salas[0]['tasa_ocupacion'], round(180 / analitica.MINUTOS_DIA, 4))
+        # La reserva que quedó pendiente en un día pasado cuenta como no-show
+        self.assertEqual(salas[0]['tasa_no_show'], 0.5)
+        self.assertEqual(cliente.get('/api/analytics/', {'desde': '2024-01-01', 'hasta': '2026-01-01'}).status_code, 400)
+
+    @override_settings(ANALITICA_DIFERIDA=True)
+    def test_deltas_diferidos(self):
+        ayer = timezone.localdate() - timedelta(days=1)
+        for i in range(2):
+            Reserva.objects.create(
+                usuario=self.admin, sala=self.sala, fecha=ayer,
+                hora_inicio=time(8 + 2 * i), hora_fin=time(9 + 2 * i), motivo_uso='clase',
+            )
+        # Los deltas esperan al trabajador, que los aplica en una pasada
+        self.assertFalse(ResumenDiario.objects.filter(reservas__gt=0).exists())
+        with mock.patch.object(notificaciones, 'backend', notificaciones.BackendConsola(io.StringIO())):
+            self.assertEqual(tareas.ejecutar_pendientes(), 2)
+        incrementales = self.resumenes()
+        self.assertEqual(ResumenDiario.objects.get(sala=self.sala, fecha=ayer).reservas, 2)
+        analitica.reconstruir()
+        self.assertEqual(self.resumenes(), incrementales)
+
+    def test_migracion_cuenta_las_reservas_existentes(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        ayer = timezone.localdate() - timedelta(days=1)
+        for i in range(3):
+            Reserva.objects.create(
+                usuario=self.admin, sala=self.sala, fecha=ayer,
+                hora_inicio=time(8 + 2 * i), hora_fin=time(9 + 2 * i), motivo_uso='clase',
+            )
+        esperados = self.resumenes()
+        ResumenDiario.objects.all().delete()
+        ResumenCarrera.objects.all().delete()
+
+        import_module('reservas.migrations.0007_analitica').poblar_resumenes(apps, None)
+        self.assertEqual(self.resumenes(), esperados)
+
+    def cambiar_carrera_con_reservas(self):
+        ayer = timezone.localdate() - timedelta(days=1)
+        usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x',
+            first_name='Uno', last_name='Usuario', carrera='Derecho',
+        )
+        reserva = Reserva.objects.create(
+            usuario=usuario, sala=self.sala, fecha=ayer, hora_inicio=time(8), hora_fin=time(9), motivo_uso='clase',
+        )
+        usuario.carrera = 'Medicina'
+        usuario.save()
+        reserva.estado = 'cancelada'
+        reserva.save()
+        return usuario
+
+    def test_cambio_de_carrera(self):
+        self.cambiar_carrera_con_reservas()
+        incrementales = self.resumenes()
+        self.assertEqual([fila[1] for fila in incrementales[1]], ['Medicina'])
+        self.assertFalse(ResumenCarrera.objects.filter(reservas__lt=0).exists())
+        analitica.reconstruir()
+        self.assertEqual(self.resumenes(), incrementales)
+
+        # Los guardados parciales sin la carrera no la consultan
+        usuario = Usuario.objects.get(email='u@test.cl')
+        with self.assertNumQueries(1):
+            usuario.save(update_fields=['last_login'])
+
+    @override_settings(ANALITICA_DIFERIDA=True)
+    def test_cambio_de_carrera_diferido(self):
+        # La creación sigue encolada (con la carrera anterior) cuando se traspasa
+        self.cambiar_carrera_con_reservas()
+        with mock.patch.object(notificaciones, 'backend', notificaciones.BackendConsola(io.StringIO())):
+            tareas.ejecutar_pendientes()
+        incrementales = self.resumenes()
+        self.assertFalse(ResumenCarrera.objects.exclude(reservas=0, canceladas=0, minutos_reservados=0).filter(
+            carrera='Derecho').exists())
+        analitica.reconstruir()
+        self.assertEqual(self.resumenes(), incrementales)
+
+
+class CrearDatosTests(TestCase):
+    def generar(self):
+        call_command('crear_datos', usuarios=20, salas=4, reservas=300, semilla=7, limpiar=True, stdout=io.StringIO())
+        return list(Reserva.objects.order_by('id').values_list(
+            'usuario__email', 'sala__nombre', 'fecha', 'hora_inicio', 'hora_fin', 'estado'))
+
+    def assertSinSolapamientos(self, reservas):
+        activas = {}
+        for _, sala, fecha, hora_inicio, hora_fin, estado in reservas:
+            if estado != 'cancelada':
+                mascara = disponibilidad.mascara(hora_inicio, hora_fin)
+                self.assertFalse(activas.get((sala, fecha), 0) & mascara)
+                activas[(sala, fecha)] = activas.get((sala, fecha), 0) | mascara
+
+    def test_determinista_y_sin_solapamientos(self):
+        reservas = self.generar()
+        self.assertEqual(len(reservas), 300)
+        self.assertEqual(self.generar(), reservas)
+        self.assertSinSolapamientos(reservas)
+
+    def test_limpiar_sin_signals(self):
+        from .models import Eliminacion
+
+        self.generar()
+        Eliminacion.objects.all().delete()
+        with mock.patch.object(analitica, 'registrar_cambios') as registrar:
+            self.generar()
+        registrar.assert_not_called()
+        self.assertFalse(Eliminacion.objects.exists())
+        # Mapas y resúmenes reconstruidos una vez, al final
+        self.assertEqual(ResumenDiario.objects.aggregate(total=Sum('reservas'))['total'], 300)
+
+    def test_sin_limpiar_solo_salas_nuevas(self):
+        anteriores = self.generar()
+        call_command('crear_datos', usuarios=5, salas=2, reservas=100, semilla=8, stdout=io.StringIO())
+        reservas = list(Reserva.objects.order_by('id').values_list(
+            'usuario__email', 'sala__nombre', 'fecha', 'hora_inicio', 'hora_fin', 'estado'))
+        self.assertEqual(reservas[:300], anteriores)
+        self.assertEqual(len({sala for _, sala, *_ in reservas[300:]}), 2)
+        self.assertFalse({sala for _, sala, *_ in reservas[300:]} & {sala for _, sala, *_ in anteriores})
+        self.assertSinSolapamientos(reservas)
+
+
+class CargaTests(SimpleTestCase):
+    def test_errores_de_conexion(self):
+        from .management.commands.carga import Command
+
+        comando = Command()
+        comando.url = 'http://127.0.0.1:9'
+        duracion, estado, consultas = comando.peticion('GET', '/api/auth/check/', None, 'token')
+        self.assertEqual((estado, consultas), (None, None))
+
+
+class CacheSalasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.cl', email='admin@test.cl', password='x', rol='admin',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala C1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.usuario)
+
+    def test_cache_etag_e_invalidacion(self):
+        respuesta = self.cliente.get('/api/salas/')
+        etag = respuesta['ETag']
+        self.assertIn('must-revalidate', respuesta['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cliente.get('/api/salas/').data, respuesta.data)
+            self.assertEqual(self.cliente.get('/api/salas/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Otros parámetros, otra entrada
+        self.assertNotEqual(self.cliente.get('/api/salas/', {'page': 1})['ETag'], etag)
+
+        # Una reserva nueva cambia total_reservas: nueva versión al confirmar
+        with self.captureOnCommitCallbacks(execute=True):
+            Reserva.objects.create(
+                usuario=self.usuario, sala=self.sala, fecha=timezone.localdate() + timedelta(days=1),
+                hora_inicio=time(9), hora_fin=time(10), motivo_uso='clase',
+            )
+        respuesta = self.cliente.get('/api/salas/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['results'][0]['total_reservas'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin_cliente().patch(f'/api/salas/{self.sala.id}/', {'estado': 'mantenimiento'}, format='json')
+        self.assertEqual(self.cliente.get('/api/salas/disponibles/').data, [])
+
+    def test_version_local_expira(self):
+        # Con LocMemCache otro proceso no ve la versión nueva: la local dura
+        # TTL_LOCAL segundos, y con ella el ETag y las entradas
+        import time as reloj
+
+        etag = self.cliente.get('/api/salas/')['ETag']
+        self.assertEqual(self.cliente.get('/api/salas/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        despues = reloj.time() + settings.SALAS_CACHE['TTL_LOCAL'] + 1
+        with mock.patch('time.time', return_value=despues):
+            respuesta = self.cliente.get('/api/salas/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def admin_cliente(self):
+        cliente = APIClient()
+        cliente.force_authenticate(self.admin)
+        return cliente
+
+
+class GetCondicionalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala G1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+
+    def setUp(self):
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.usuario)
+        self.reserva = Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=timezone.localdate() + timedelta(days=1),
+            hora_inicio=time(9), hora_fin=time(10), motivo_uso='clase',
+        )
+
+    def test_etag_y_last_modified(self):
+        for url in ['/api/reservas/', f'/api/reservas/{self.reserva.id}/', '/api/reservas/mis_reservas/']:
+            respuesta = self.cliente.get(url)
+            etag = respuesta['ETag']
+            with self.assertNumQueries(1 if url != '/api/reservas/mis_reservas/' else 2):
+                self.assertEqual(self.cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Otros parámetros, otro ETag
+        self.assertNotEqual(self.cliente.get('/api/reservas/', {'page_size': 5})['ETag'], etag)
+
+        # Last-Modified solo en el detalle
+        url = f'/api/reservas/{self.reserva.id}/'
+        respuesta = self.cliente.get(url)
+        self.assertEqual(self.cliente.get(url, HTTP_IF_MODIFIED_SINCE=respuesta['Last-Modified']).status_code, 304)
+        for url in ['/api/reservas/', '/api/reservas/mis_reservas/', '/api/reservas/pendientes/']:
+            respuesta = self.cliente.get(url)
+            self.assertNotIn('Last-Modified', respuesta)
+            self.assertEqual(
+                self.cliente.get(url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2100 00:00:00 GMT').status_code, 200,
+            )
+
+        # Una reserva que sale del filtro cambia el ETag
+        respuesta = self.cliente.get('/api/reservas/pendientes/')
+        self.cliente.post(f'/api/reservas/{self.reserva.id}/cancelar/')
+        self.assertEqual(
+            self.cliente.get('/api/reservas/pendientes/', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 200,
+        )
+
+        # Una baja no mueve MAX(fecha_modificacion) pero sí los ids de la ventana
+        Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=timezone.localdate() + timedelta(days=2),
+            hora_inicio=time(9), hora_fin=time(10), motivo_uso='otra',
+        )
+        respuesta = self.cliente.get('/api/reservas/')
+        self.reserva.delete()
+        self.assertEqual(self.cliente.get('/api/reservas/', HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 200)
+
+    def test_cambio_de_dia_y_series(self):
+        etag = self.cliente.get('/api/reservas/hoy/')['ETag']
+        self.assertEqual(self.cliente.get('/api/reservas/hoy/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        manana = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=manana):
+            self.assertEqual(self.cliente.get('/api/reservas/hoy/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        serie = SerieReserva.objects.create(
+            usuario=self.usuario, sala=self.sala, hora_inicio=time(15), hora_fin=time(16), motivo_uso='Clase',
+            dias_semana=list(range(7)), fecha_inicio=timezone.localdate(),
+            fecha_fin=timezone.localdate() + timedelta(days=3),
+        )
+        etag = self.cliente.get('/api/reservas/mis_reservas/')['ETag']
+        serie.delete()
+        self.assertEqual(
+            self.cliente.get('/api/reservas/mis_reservas/', HTTP_IF_NONE_MATCH=etag).status_code, 200,
+        )
+
+    def test_validador_de_la_pagina(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        manana = timezone.localdate() + timedelta(days=1)
+        # Orden del listado: 15h, 13h, 11h y la de las 9h de setUp
+        otras = [
+            Reserva.objects.create(
+                usuario=self.usuario, sala=self.sala, fecha=manana,
+                hora_inicio=time(hora), hora_fin=time(hora + 1), motivo_uso='clase',
+            )
+            for hora in (11, 13, 15)
+        ]
+        url = '/api/reservas/pendientes/?page_size=2'
+        etag = self.cliente.get(url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Solo la ventana de la página (page_size + 1 filas), sin COUNT de la tabla
+        sql, = [c['sql'] for c in consultas.captured_queries]
+        self.assertIn('LIMIT 3', sql)
+        self.assertNotIn('COUNT(', sql)
+
+        # Fuera de la ventana: la primera página sigue vigente
+        self.reserva.motivo_uso = 'otro motivo'
+        self.reserva.save()
+        self.assertEqual(self.cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Una baja en la página trae una fila más antigua: otro ETag
+        otras[2].delete()
+        self.assertEqual(self.cliente.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class EstadisticasTests(TestCase):
+    """Contadores cacheados de /api/stats/ y su invalidación"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.cl', email='admin@test.cl', password='x', rol='admin',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala T1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+        cls.manana = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = APIClient()
+        self.cliente.force_authenticate(self.admin)
+
+    def estadisticas(self):
+        respuesta = self.cliente.get('/api/stats/')
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.data
+
+    def reservar(self, hora):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Reserva.objects.create(
+                usuario=self.admin, sala=self.sala, fecha=self.manana,
+                hora_inicio=time(hora), hora_fin=time(hora + 1), motivo_uso='clase',
+            )
+
+    def test_segunda_peticion_desde_cache(self):
+        self.reservar(9)
+        datos = self.estadisticas()
+        self.assertEqual(datos['total_reservas'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.estadisticas(), datos)
+
+    def test_escrituras_invalidan(self):
+        reserva = self.reservar(9)
+        self.assertEqual(self.estadisticas()['total_reservas'], 1)
+
+        self.reservar(11)
+        self.assertEqual(self.estadisticas()['total_reservas'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.post(f'/api/reservas/{reserva.pk}/cancelar/')
+        self.assertEqual(self.estadisticas()['reservas_por_estado']['cancelada'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.delete()
+        datos = self.estadisticas()
+        self.assertEqual((datos['total_reservas'], datos['reservas_por_estado']['cancelada']), (1, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            masivas.crear_reservas(self.admin, [{
+                'sala': self.sala.id, 'fecha': self.manana,
+                'hora_inicio': '13:00', 'hora_fin': '14:00', 'motivo_uso': 'lote',
+            }])
+        self.assertEqual(self.estadisticas()['total_reservas'], 2)
+
+    def test_update_de_la_expiracion_invalida(self):
+        from .trabajos import expirar_pendientes
+
+        reserva = self.reservar(9)
+        self.assertEqual(self.estadisticas()['reservas_por_estado']['pendiente'], 1)
+        # expirar_pendientes cambia el estado con QuerySet.update(), sin signals
+        Reserva.objects.filter(pk=reserva.pk).update(fecha_creacion=timezone.now() - timedelta(days=7))
+        with self.captureOnCommitCallbacks(execute=True):
+            expirar_pendientes()
+        datos = self.estadisticas()
+        self.assertEqual((datos['reservas_por_estado']['pendiente'], datos['reservas_por_estado']['cancelada']), (0, 1))
+
+
+class PaginacionKeysetTests(TestCase):
+    """Paginación por keyset de los listados de reservas (results/next/previous)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.cl', email='admin@test.cl', password='x', rol='admin',
+        )
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        salas = [
+            Sala.objects.create(nombre=f'Sala P{i}', capacidad=10, ubicacion='Edificio A', equipamiento='')
+            for i in range(3)
+        ]
+        hoy = timezone.localdate()
+        # Misma fecha y hora en las tres salas: el id desempata
+        Reserva.objects.bulk_create([
+            Reserva(
+                usuario=cls.usuario if (dia + i) % 2 else cls.admin, sala=sala, fecha=hoy + timedelta(days=dia),
+                hora_inicio=time(hora), hora_fin=time(hora + 1), motivo_uso='clase',
+            )
+            for dia in range(4) for hora in (9, 11) for i, sala in enumerate(salas)
+        ])
+
+    def cliente(self, usuario):
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        return cliente
+
+    def recorrer(self, cliente, url):
+        paginas = []
+        while url:
+            respuesta = cliente.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            paginas.append([r['id'] for r in respuesta.data['results']])
+            url = respuesta.data['next']
+        return paginas
+
+    def esperado(self, queryset):
+        return list(queryset.order_by('-fecha', '-hora_inicio', '-id').values_list('id', flat=True))
+
+    def test_orden_estable_sin_duplicados_ni_huecos(self):
+        paginas = self.recorrer(self.cliente(self.admin), '/api/reservas/?page_size=5')
+        self.assertEqual([len(p) for p in paginas], [5, 5, 5, 5, 4])
+        self.assertEqual(sum(paginas, []), self.esperado(Reserva.objects.all()))
+
+    def test_previous_vuelve_a_la_pagina_anterior(self):
+        cliente = self.cliente(self.admin)
+        primera = cliente.get('/api/reservas/?page_size=5').data
+        self.assertIsNone(primera['previous'])
+        segunda = cliente.get(primera['next']).data
+        tercera = cliente.get(segunda['next']).data
+        self.assertEqual(cliente.get(tercera['previous']).data['results'], segunda['results'])
+        self.assertEqual(cliente.get(segunda['previous']).data['results'], primera['results'])
+
+    def test_cursor_invalido(self):
+        import base64
+
+        cliente = self.cliente(self.admin)
+        siguiente = cliente.get('/api/reservas/?page_size=5').data['next']
+        cursor = siguiente.split('cursor=')[1].split('&')[0]
+        datos = json.loads(base64.urlsafe_b64decode(cursor).decode())
+        adulterados = [
+            'no-es-base64',
+            base64.urlsafe_b64encode(json.dumps({'v': datos['v'][:2]}).encode()).decode(),
+            base64.urlsafe_b64encode(json.dumps({'v': ['ayer', *datos['v'][1:]]}).encode()).decode(),
+        ]
+        for adulterado in adulterados:
+            with self.subTest(cursor=adulterado):
+                respuesta = cliente.get('/api/reservas/', {'cursor': adulterado})
+                self.assertEqual(respuesta.status_code, 404)
+                self.assertEqual(respuesta.data['detail'], 'Cursor inválido')
+
+    def test_page_size(self):
+        from .pagination import ReservaKeysetPagination
+
+        cliente = self.cliente(self.admin)
+        self.assertEqual(len(cliente.get('/api/reservas/').data['results']), 10)
+        self.assertEqual(len(cliente.get('/api/reservas/', {'page_size': 7}).data['results']), 7)
+        self.assertEqual(len(cliente.get('/api/reservas/', {'page_size': 'x'}).data['results']), 10)
+        with mock.patch.object(ReservaKeysetPagination, 'max_page_size', 8):
+            self.assertEqual(len(cliente.get('/api/reservas/', {'page_size': 500}).data['results']), 8)
+
+    def test_mis_reservas(self):
+        paginas = self.recorrer(self.cliente(self.usuario), '/api/reservas/mis_reservas/?page_size=5')
+        self.assertEqual([len(p) for p in paginas], [5, 5, 2])
+        self.assertEqual(sum(paginas, []), self.esperado(Reserva.objects.filter(usuario=self.usuario)))
+
+
+class ListadoRapidoTests(TestCase):
+    def test_mismos_bytes_que_el_serializer(self):
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import JSONRapidoRenderer
+        from .serializers import ReservaListSerializer, ReservaListadoRapido
+
+        usuarios = [
+            Usuario.objects.create_user(username='a@test.cl', email='a@test.cl', password='x',
+                                        first_name='José \u2028Ñandú', last_name=''),
+            Usuario.objects.create_user(username='b@test.cl', email='b@test.cl', password='x',
+                                        first_name='', last_name='"Comillas" \\ 😀'),
+        ]
+        sala = Sala.objects.create(nombre='Sala Ü1', capacidad=10, ubicacion='Edificio Ñ', equipamiento='')
+        hoy = timezone.localdate()
+        Reserva.objects.bulk_create([
+            Reserva(
+                usuario=usuarios[i % 2], sala=sala, fecha=hoy + timedelta(days=i),
+                hora_inicio=time(8, 15 * (i % 4)), hora_fin=time(9 + i % 3, 20), motivo_uso='m',
+                estado=['pendiente', 'confirmada', 'cancelada'][i % 3],
+            )
+            for i in range(12)
+        ])
+        queryset = Reserva.objects.para_listado().order_by('-fecha', '-hora_inicio', '-id')
+
+        antes = JSONRenderer().render(ReservaListSerializer(queryset, many=True).data)
+        despues = JSONRapidoRenderer().render(ReservaListadoRapido().serializar(ReservaListadoRapido.filas(queryset)))
+        self.assertEqual(despues, antes)
+
+
+class PerfiladoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        Sala.objects.create(nombre='Sala P1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+
+    def setUp(self):
+        from reservas_proyecto import profiling
+
+        self.registro = profiling.registro
+        self.registro.reiniciar()
+        self.addCleanup(self.registro.reiniciar)
+        cache.clear()
+
+    def get_salas(self):
+        # Un cliente nuevo carga los middlewares con la configuración vigente
+        cliente = APIClient()
+        cliente.force_authenticate(self.usuario)
+        return cliente.get('/api/salas/')
+
+    def test_server_timing(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.get_salas()
+        self.assertEqual(respuesta.status_code, 200)
+        # Medir tampoco agrega consultas
+        self.assertEqual(len(consultas), 2)
+        entradas = {
+            entrada.split(';')[0]: entrada for entrada in respuesta['Server-Timing'].split(', ')
+        }
+        self.assertEqual(set(entradas), {'total', 'db', 'ser', 'render'})
+        self.assertRegex(entradas['total'], r'^total;dur=\d+\.\d{2}$')
+        self.assertRegex(entradas['db'], rf'^db;dur=\d+\.\d{{2}};desc="{len(consultas)} consultas"$')
+
+        metricas = self.registro.snapshot()['sala-list:list']
+        self.assertEqual(metricas['total_ms']['cantidad'], 1)
+        self.assertEqual(metricas['consultas']['suma'], len(consultas))
+
+    def test_deshabilitado(self):
+        with self.settings(PERFILADO={**settings.PERFILADO, 'HABILITADO': False}):
+            # Mismas consultas que mide ConsultasPorEndpointTests.test_salas_list
+            with self.assertNumQueries(2):
+                respuesta = self.get_salas()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('Server-Timing', respuesta)
+        self.assertEqual(self.registro.snapshot(), {})
+
+    def test_sin_cabecera(self):
+        with self.settings(PERFILADO={**settings.PERFILADO, 'SERVER_TIMING': False}):
+            respuesta = self.get_salas()
+        self.assertNotIn('Server-Timing', respuesta)
+        # Se sigue midiendo aunque no se exponga
+        self.assertIn('sala-list:list', self.registro.snapshot())
+
+
+class PoolConexionesTests(SimpleTestCase):
+    def crear_pool(self, **config):
+        from reservas_proyecto.backends.pool import PoolConexiones
+
+        self.cerradas = []
+        self.sanas = True
+        return PoolConexiones(
+            conectar=object,
+            utilizable=lambda conexion: self.sanas,
+            cerrar=self.cerradas.append,
+            config={'TAMANO': 1, 'DESBORDE': 1, 'TIEMPO_ESPERA': 0, **config},
+        )
+
+    def test_reutiliza_y_respeta_el_limite(self):
+        from reservas_proyecto.backends.pool import PoolAgotado
+
+        pool = self.crear_pool()
+        a = pool.obtener()
+        pool.devolver(a)
+        self.assertIs(pool.obtener(), a)
+        b = pool.obtener()
+        with self.assertRaises(PoolAgotado):
+            pool.obtener()
+        # La de desborde se cierra al devolverse: solo TAMANO quedan libres
+        pool.devolver(a)
+        pool.devolver(b)
+        self.assertEqual((pool.libres, pool.abiertas, self.cerradas), (1, 1, [b]))
+
+    def test_descarta_inactivas_y_no_utilizables(self):
+        pool = self.crear_pool(TIEMPO_INACTIVO=-1)
+        a = pool.obtener()
+        pool.devolver(a)
+        self.assertEqual(self.cerradas, [a])
+
+        pool = self.crear_pool(VERIFICAR_TRAS=-1)
+        a = pool.obtener()
+        pool.devolver(a)
+        self.sanas = False
+        self.assertIsNot(pool.obtener(), a)
+        self.assertEqual((self.cerradas, pool.abiertas), ([a], 1))
+
+
+@override_settings(REPLICAS={'ALIAS': ['replica'], 'VENTANA_PRIMARIA': 5})
+class ReplicasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_router(self):
+        from reservas_proyecto.replicas import RouterReplicas, usar
+
+        router = RouterReplicas()
+        self.assertIsNone(router.db_for_read(Reserva))
+        with usar('replica'):
+            self.assertEqual(router.db_for_write(Reserva), 'default')
+            # TestCase abre una transacción en la primaria: no se sale de ella
+            self.assertIsNone(router.db_for_read(Reserva))
+        self.assertFalse(router.allow_migrate('replica', 'reservas'))
+
+    def test_lecturas_propias_en_la_primaria_tras_escribir(self):
+        from types import SimpleNamespace
+        from reservas_proyecto import replicas
+
+        usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='U', last_name='U',
+        )
+        sala = Sala.objects.create(nombre='Sala', capacidad=10, ubicacion='A', equipamiento='')
+        peticion = SimpleNamespace(user=usuario)
+        self.assertEqual(replicas.alias_lectura(peticion), 'replica')
+
+        client = APIClient()
+        client.force_authenticate(usuario)
+        self.assertEqual(client.get('/api/reservas/').status_code, 200)
+        self.assertEqual(replicas.alias_lectura(peticion), 'replica')
+        respuesta = client.post('/api/reservas/', {
+            'sala': sala.pk, 'fecha': str(timezone.localdate() + timedelta(days=1)),
+            'hora_inicio': '10:00', 'hora_fin': '11:00', 'motivo_uso': 'm',
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertIsNone(replicas.alias_lectura(peticion))
+
+
+class AsyncViewsTests(TestCase):
+    """Las vistas async responden lo mismo que las acciones de DRF que reemplazan"""
+
+    def test_mismas_respuestas(self):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncRequestFactory
+        from rest_framework_simplejwt.tokens import AccessToken
+        from . import async_views
+
+        usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        salas = [
+            Sala.objects.create(nombre=f'Sala {i}', capacidad=10, ubicacion='A', equipamiento='') for i in range(3)
+        ]
+        hoy = timezone.now().date()
+        for i, sala in enumerate(salas):
+            Reserva.objects.create(
+                usuario=usuario, sala=sala, fecha=hoy, hora_inicio=time(9 + i), hora_fin=time(10 + i), motivo_uso='m',
+            )
+        SerieReserva.objects.create(
+            usuario=usuario, sala=salas[0], hora_inicio=time(15), hora_fin=time(16), motivo_uso='Clase',
+            dias_semana=list(range(7)), fecha_inicio=hoy - timedelta(days=3), fecha_fin=hoy + timedelta(days=3),
+        )
+        autorizacion = f'Bearer {AccessToken.for_user(usuario)}'
+        client = APIClient(HTTP_AUTHORIZATION=autorizacion)
+        fabrica = AsyncRequestFactory()
+
+        for ruta, vista in [
+            ('/api/auth/check/', async_views.check_auth),
+            ('/api/usuarios/me/', async_views.usuario_me),
+            ('/api/salas/disponibles/', async_views.salas_disponibles),
+            ('/api/reservas/hoy/?page_size=2', async_views.reservas_hoy),
+            ('/api/reservas/mis_reservas/?page_size=3', async_views.mis_reservas),
+        ]:
+            esperada = client.get(ruta)
+            respuesta = async_to_sync(vista)(fabrica.get(ruta, headers={'Authorization': autorizacion}))
+            self.assertEqual(respuesta.status_code, 200, ruta)
+            self.assertEqual(respuesta.content, esperada.content, ruta)
+            self.assertEqual(respuesta.get('ETag'), esperada.get('ETag'), ruta)
+
+        etag = client.get('/api/reservas/hoy/')['ETag']
+        respuesta = async_to_sync(async_views.reservas_hoy)(
+            fabrica.get('/api/reservas/hoy/', headers={'Authorization': autorizacion, 'If-None-Match': etag})
+        )
+        self.assertEqual(respuesta.status_code, 304)
+        respuesta = async_to_sync(async_views.reservas_hoy)(fabrica.get('/api/reservas/hoy/'))
+        self.assertEqual(respuesta.status_code, 401)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['reservas.hashers.ScryptAjustable', 'reservas.hashers.PBKDF2Ajustable'],
+    HASH_PASSWORD={'SCRYPT': {'N': 2 ** 10}, 'PBKDF2': {'ITERACIONES': 1000}},
+    LIMITE_LOGIN={'POR_IP': (100, 60), 'POR_EMAIL': (3, 60)},
+)
+class LoginTests(TestCase):
+
+    def setUp(self):
+        from .limite_login import ventanas
+        ventanas.limpiar()
+        self.addCleanup(ventanas.limpiar)
+        self.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password=None, first_name='Uno', last_name='Usuario',
+        )
+
+    def login(self, ruta, email='u@test.cl', password='Clave-Segura-1'):
+        return self.client.post(ruta, {'email': email, 'password': password}, content_type='application/json')
+
+    def test_rehash_en_login(self):
+        from django.contrib.auth.hashers import make_password
+
+        self.usuario.password = make_password('Clave-Segura-1', hasher='pbkdf2_sha256')
+        self.usuario.save(update_fields=['password'])
+        self.assertEqual(self.login('/api/auth/login/').status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('scrypt$1024$'))
+
+        # Con otros parámetros se rehace en el siguiente login
+        with override_settings(
+            HASH_PASSWORD={'SCRYPT': {'N': 2 ** 11}},
+            PASSWORD_HASHERS=['reservas.hashers.ScryptAjustable'],
+        ):
+            self.assertEqual(self.login('/login/').status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('scrypt$2048$'))
+
+    def test_limite_por_email(self):
+        self.usuario.set_password('Clave-Segura-1')
+        self.usuario.save(update_fields=['password'])
+        for _ in range(3):
+            self.assertEqual(self.login('/api/auth/login/', password='incorrecta').status_code, 401)
+
+        # Rechazado antes de verificar la contraseña, aunque sea la correcta
+        respuesta = self.login('/api/auth/login/', email='U@test.cl ')
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertIn('Retry-After', respuesta)
+        respuesta = self.login('/login/')
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertIn('Retry-After', respuesta)
+        # Otro email desde la misma IP sigue pudiendo intentar
+        self.assertEqual(self.login('/api/auth/login/', email='otro@test.cl').status_code, 401)
+
+        # Los intentos rechazados no cuentan: van 4 desde esta IP
+        with override_settings(LIMITE_LOGIN={'POR_IP': (4, 60)}):
+            self.assertEqual(self.login('/api/auth/login/', email='tercero@test.cl').status_code, 429)
+
+
+class TokensTests(TestCase):
+
+    def setUp(self):
+        from .tokens import lista_negra
+        lista_negra.limpiar()
+        self.addCleanup(lista_negra.limpiar)
+        self.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password=None, first_name='Uno', last_name='Usuario',
+        )
+
+    def refrescar(self, refresh):
+        return self.client.post('/api/auth/refresh/', {'refresh': refresh}, content_type='application/json')
+
+    def test_rotacion_y_reuso(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        original = str(RefreshToken.for_user(self.usuario))
+        respuesta = self.refrescar(original)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.refrescar(respuesta.json()['refresh']).status_code, 200)
+        self.assertEqual(OutstandingToken.objects.count(), 3)
+        self.assertEqual(BlacklistedToken.objects.count(), 2)
+
+        # Reusar un token rotado: rechazado, la segunda vez sin consultas
+        self.assertEqual(self.refrescar(original).status_code, 401)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refrescar(original).status_code, 401)
+
+        # Revocado fuera de este proceso: lo detecta el INSERT de la rotación
+        self.usuario.refresh_from_db()
+        otro = RefreshToken.for_user(self.usuario)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=otro['jti']))
+        from .tokens import lista_negra
+        lista_negra.limpiar()
+        self.assertEqual(self.refrescar(str(otro)).status_code, 401)
+
+    def test_purgar_tokens(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+        ahora = timezone.now()
+        for i in range(5):
+            token = OutstandingToken.objects.create(
+                user=self.usuario, jti=f'viejo-{i}', token='t', expires_at=ahora - timedelta(hours=1),
+            )
+            if i % 2 == 0:
+                BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(user=self.usuario, jti='vigente', token='t', expires_at=ahora + timedelta(hours=1))
+
+        salida = io.StringIO()
+        call_command('purgar_tokens', lote=2, stdout=salida)
+        self.assertIn('5 tokens expirados borrados (3 en la lista negra)', salida.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['vigente'])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class CacheUsuariosJWTTests(TestCase):
+
+    def setUp(self):
+        from .authentication import cache_usuarios
+        from .tokens import lista_negra
+
+        self.cache_usuarios = cache_usuarios
+        for cache_local in (cache_usuarios, lista_negra):
+            cache_local.limpiar()
+            self.addCleanup(cache_local.limpiar)
+        self.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+
+    def cliente_con_token(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        self.refresh = RefreshToken.for_user(self.usuario)
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        return cliente
+
+    def consultas_a_usuarios(self, cliente):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = cliente.get('/api/usuarios/me/')
+        self.assertEqual(respuesta.status_code, 200)
+        tabla = connection.ops.quote_name(Usuario._meta.db_table)
+        return [q['sql'] for q in consultas if f'FROM {tabla}' in q['sql']]
+
+    def test_me_sin_consulta_del_usuario(self):
+        cliente = self.cliente_con_token()
+        self.assertEqual(len(self.consultas_a_usuarios(cliente)), 1)
+        self.assertIsNotNone(self.cache_usuarios.obtener(str(self.usuario.pk)))
+        # Solo queda el conteo de reservas de UsuarioSerializer
+        with self.assertNumQueries(1):
+            self.assertEqual(self.consultas_a_usuarios(cliente), [])
+
+    def test_guardar_invalida(self):
+        cliente = self.cliente_con_token()
+        cliente.get('/api/usuarios/me/')
+        self.usuario.first_name = 'Otro'
+        self.usuario.save()
+        self.assertIsNone(self.cache_usuarios.obtener(str(self.usuario.pk)))
+        self.assertEqual(cliente.get('/api/usuarios/me/').json()['first_name'], 'Otro')
+
+    def test_desactivado_rechazado(self):
+        cliente = self.cliente_con_token()
+        self.assertEqual(cliente.get('/api/usuarios/me/').status_code, 200)
+        self.usuario.is_active = False
+        self.usuario.save(update_fields=['is_active'])
+        self.assertEqual(cliente.get('/api/usuarios/me/').status_code, 401)
+
+    def test_lista_negra_invalida(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+        cliente = self.cliente_con_token()
+        cliente.get('/api/usuarios/me/')
+        self.assertIsNotNone(self.cache_usuarios.obtener(str(self.usuario.pk)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.refresh.blacklist()
+        self.assertIsNone(self.cache_usuarios.obtener(str(self.usuario.pk)))
+
+        # También si se crea solo con el id del OutstandingToken (p. ej. la
+        # rotación de reservas.tokens)
+        cliente = self.cliente_con_token()
+        cliente.get('/api/usuarios/me/')
+        token = OutstandingToken.objects.get(jti=self.refresh['jti'])
+        with self.captureOnCommitCallbacks(execute=True):
+            BlacklistedToken.objects.create(token_id=token.pk)
+        self.assertIsNone(self.cache_usuarios.obtener(str(self.usuario.pk)))
+
+
+class SesionAPITests(TestCase):
+    """Las rutas de la API no leen ni escriben la sesión: se autentican solo con el JWT"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala S1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        # Cookie de sesión de los dashboards, que el navegador envía también a la API
+        self.client.force_login(self.usuario)
+        self.autorizacion = f'Bearer {AccessToken.for_user(self.usuario)}'
+
+    def peticion(self, metodo, ruta, **kwargs):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = getattr(self.client, metodo)(ruta, **kwargs)
+        tabla = connection.ops.quote_name('django_session')
+        self.assertFalse([q['sql'] for q in consultas if tabla in q['sql']])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, respuesta.cookies)
+        return respuesta
+
+    @override_settings(SESSION_SAVE_EVERY_REQUEST=True)
+    def test_api_sin_sesion(self):
+        respuesta = self.peticion('get', '/api/usuarios/me/', HTTP_AUTHORIZATION=self.autorizacion)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['email'], 'u@test.cl')
+
+        respuesta = self.peticion('post', '/api/reservas/', data={
+            'sala': self.sala.pk, 'fecha': str(timezone.localdate() + timedelta(days=1)),
+            'hora_inicio': '10:00', 'hora_fin': '11:00', 'motivo_uso': 'm',
+        }, content_type='application/json', HTTP_AUTHORIZATION=self.autorizacion)
+        self.assertEqual(respuesta.status_code, 201)
+
+        # La cookie de sesión sola no autentica en la API
+        self.assertEqual(self.peticion('get', '/api/usuarios/me/').status_code, 401)
+
+        # Fuera de la API la sesión se sigue guardando y renovando
+        respuesta = self.client.get('/')
+        self.assertIn(settings.SESSION_COOKIE_NAME, respuesta.cookies)
+
+    def test_sesion_sin_estado(self):
+        from reservas_proyecto.middleware import SesionSinEstado
+
+        sesion = SesionSinEstado('clave')
+        self.assertIsNone(sesion.session_key)
+        sesion['dato'] = 1
+        self.assertEqual((sesion.accessed, sesion.modified, sesion.is_empty()), (False, False, False))
+
+
+class TareasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x',
+            first_name='Uno', last_name='Usuario', carrera='Ingeniería',
+        )
+        cls.sala = Sala.objects.create(nombre='Sala T1', capacidad=10, ubicacion='Edificio A', equipamiento='')
+
+    def setUp(self):
+        self.salida = io.StringIO()
+        patcher = mock.patch.object(notificaciones, 'backend', notificaciones.BackendConsola(self.salida))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reservar(self, fecha, hora, **campos):
+        return Reserva.objects.create(
+            usuario=self.usuario, sala=self.sala, fecha=fecha,
+            hora_inicio=time(hora), hora_fin=time(hora + 1), motivo_uso='clase', **campos,
+        )
+
+    def test_expirar_pendientes(self):
+        from .models import DisponibilidadSala, Tarea
+
+        manana = timezone.localdate() + timedelta(days=1)
+        vieja = self.reservar(manana, 8)
+        nueva = self.reservar(manana, 10)
+        confirmada = self.reservar(manana, 12)
+        confirmada.estado = 'confirmada'
+        confirmada.save()
+        Reserva.objects.filter(pk__in=[vieja.pk, confirmada.pk]).update(
+            fecha_creacion=timezone.now() - timedelta(hours=72),
+        )
+        tareas.ejecutar_pendientes(1000)
+        self.salida.truncate(0)
+
+        tareas.encolar('expirar_pendientes')
+        self.assertEqual(tareas.ejecutar_pendientes(), 1)
+        estados = dict(Reserva.objects.values_list('pk', 'estado'))
+        self.assertEqual(
+            (estados[vieja.pk], estados[nueva.pk], estados[confirmada.pk]),
+            ('cancelada', 'pendiente', 'confirmada'),
+        )
+        ocupacion = DisponibilidadSala.objects.get(sala=self.sala, fecha=manana).ocupacion
+        self.assertEqual(ocupacion, disponibilidad.mascara(time(10), time(11)) | disponibilidad.mascara(time(12), time(13)))
+
+        # La notificación queda para la siguiente pasada
+        vencidas = Tarea.objects.filter(estado=Tarea.PENDIENTE, ejecutar_en__lte=timezone.now())
+        self.assertEqual(set(vencidas.values_list('nombre', flat=True)), {'notificar'})
+        tareas.ejecutar_pendientes()
+        self.assertIn('[reserva.expirada] u@test.cl', self.salida.getvalue())
+        resumen = ResumenDiario.objects.get(sala=self.sala, fecha=manana)
+        self.assertEqual((resumen.reservas, resumen.canceladas), (3, 1))
+
+    def test_recordatorios_no_se_repiten(self):
+        from .models import Tarea
+
+        ahora = timezone.localtime()
+        if ahora.hour >= 23:
+            self.skipTest('la reserva de la próxima hora cae mañana')
+        self.reservar(ahora.date(), ahora.hour + 1)
+        Tarea.objects.all().delete()
+
+        with override_settings(RECORDATORIOS_ANTICIPACION=120, TAREAS={'PERIODICAS': {'recordatorios': 300}}):
+            tareas.programar_periodicas()
+            tareas.ejecutar_pendientes()
+            self.assertEqual(self.salida.getvalue().count('[reserva.recordatorio]'), 1)
+
+            # La siguiente ejecución parte donde terminó la anterior
+            siguiente = Tarea.objects.get(nombre='recordatorios', estado=Tarea.PENDIENTE)
+            self.assertIn('desde', siguiente.argumentos)
+            Tarea.objects.filter(pk=siguiente.pk).update(ejecutar_en=timezone.now())
+            tareas.programar_periodicas()
+            self.assertEqual(Tarea.objects.filter(nombre='recordatorios', estado=Tarea.PENDIENTE).count(), 1)
+            tareas.ejecutar_pendientes()
+            self.assertEqual(self.salida.getvalue().count('[reserva.recordatorio]'), 1)
+
+    def test_reintentos_y_metricas(self):
+        from .models import Tarea
+
+        llamadas = []
+
+        @tareas.tarea('prueba_falla')
+        def falla(n):
+            llamadas.append(n)
+            raise ValueError('sin conexión')
+
+        self.addCleanup(tareas._registro.pop, 'prueba_falla')
+        with override_settings(TAREAS={'MAXIMO_INTENTOS': 2, 'REINTENTO_SEGUNDOS': 30}):
+            tarea = tareas.encolar('prueba_falla', n=1)
+            with self.assertLogs('reservas.tareas', 'ERROR'):
+                tareas.ejecutar_pendientes()
+            tarea.refresh_from_db()
+            self.assertEqual((tarea.estado, tarea.intentos), (Tarea.PENDIENTE, 1))
+            self.assertGreater(tarea.ejecutar_en, timezone.now() + timedelta(seconds=25))
+            self.assertIn('sin conexión', tarea.error)
+            self.assertEqual(tareas.metricas()['prueba_falla']['programadas'], 1)
+
+            Tarea.objects.filter(pk=tarea.pk).update(ejecutar_en=timezone.now())
+            with self.assertLogs('reservas.tareas', 'ERROR'):
+                tareas.ejecutar_pendientes()
+            tarea.refresh_from_db()
+            self.assertEqual((tarea.estado, tarea.intentos), (Tarea.FALLIDA, 2))
+        self.assertEqual(llamadas, [1, 1])
+        self.assertEqual(tareas.metricas()['prueba_falla']['fallidas'], 1)
+
+        salida = io.StringIO()
+        call_command('tareas', json=True, stdout=salida)
+        self.assertEqual(json.loads(salida.getvalue())['prueba_falla']['fallidas'], 1)
+
+
+class IndicesTests(TestCase):
+    """Las consultas de los listados más frecuentes usan un índice (EXPLAIN)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user(
+            username='admin@test.cl', email='admin@test.cl', password='x', rol='admin',
+        )
+        cls.usuario = Usuario.objects.create_user(
+            username='u@test.cl', email='u@test.cl', password='x', first_name='Uno', last_name='Usuario',
+        )
+        salas = [
+            Sala.objects.create(
+                nombre=f'Sala I{i}', capacidad=10, ubicacion='Edificio A', equipamiento='',
+                estado='disponible' if i % 2 else 'mantenimiento',
+            )
+            for i in range(6)
+        ]
+        hoy = timezone.localdate()
+        for dia in range(-3, 4):
+            for i, sala in enumerate(salas):
+                Reserva.objects.create(
+                    usuario=cls.usuario if i % 2 else cls.admin, sala=sala, fecha=hoy + timedelta(days=dia),
+                    hora_inicio=time(8 + i), hora_fin=time(9 + i), motivo_uso='clase',
+                    estado='pendiente' if i % 3 else 'confirmada',
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def escaneos_completos(self, consultas, tabla):
+        """Consultas SELECT ... FROM ``tabla`` cuyo plan recorre la tabla entera"""
+        from django.db import connection
+
+        sentencias = [
+            c['sql'] for c in consultas
+            if c['sql'].startswith('SELECT') and f'FROM {connection.ops.quote_name(tabla)}' in c['sql']
+        ]
+        self.assertTrue(sentencias, f'No hubo consultas a {tabla}')
+        completos = []
+        with connection.cursor() as cursor:
+            for sql in sentencias:
+                cursor.execute(f'{connection.ops.explain_prefix} {sql}')
+                filas = cursor.fetchall()
+                if connection.vendor == 'mysql':
+                    columnas = [c[0] for c in cursor.description]
+                    completo = any(
+                        f[columnas.index('table')] == tabla and f[columnas.index('type')] == 'ALL' for f in filas
+                    )
+                elif connection.vendor == 'postgresql':
+                    completo = any(f'Seq Scan on {tabla} ' in f[0] for f in filas)
+                else:
+                    # SQLite: "SEARCH <tabla> USING INDEX ..." o "SCAN <tabla>"
+                    completo = any(f[-1].split()[:2] == ['SCAN', tabla] for f in filas)
+                if completo:
+                    completos.append((sql, filas))
+        return completos
+
+    def consultas_de(self, usuario, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        with CaptureQueriesContext(connection) as capturadas:
+            self.assertEqual(cliente.get(url).status_code, 200)
+        return capturadas.captured_queries
+
+    def test_listados_usan_indices(self):
+        casos = [
+            (self.admin, '/api/reservas/hoy/', 'reservas'),
+            (self.admin, '/api/reservas/pendientes/', 'reservas'),
+            (self.usuario, '/api/reservas/hoy/', 'reservas'),
+            (self.usuario, '/api/reservas/mis_reservas/', 'reservas'),
+            (self.usuario, '/api/salas/disponibles/', 'salas'),
+        ]
+        for usuario, url, tabla in casos:
+            with self.subTest(url=url, admin=usuario.es_admin):
+                # Incluye las del ETag (reservas.condicional) y las de la página
+                self.assertEqual(self.escaneos_completos(self.consultas_de(usuario, url), tabla), [])
+
+    def test_expirar_pendientes_usa_indice(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .trabajos import expirar_pendientes
+
+        with CaptureQueriesContext(connection) as capturadas:
+            expirar_pendientes()
+        self.assertEqual(self.escaneos_completos(capturadas.captured_queries, 'reservas'), [])
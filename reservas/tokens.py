@@ -0,0 +1,132 @@
+"""
+Refresh tokens con rotación y lista negra (SIMPLE_JWT ROTATE_REFRESH_TOKENS y
+BLACKLIST_AFTER_ROTATION) sin que el costo de /api/auth/refresh/ crezca con
+las tablas de token_blacklist.
+
+- ``lista_negra``: LRU en memoria del proceso con los jti que este proceso
+  sabe revocados; reusar uno se rechaza sin consultar la base de datos.
+- ``RefreshTokenRotado``: al rotar, el INSERT del token en la lista negra es
+  a la vez la verificación (una única fila por token): no hay SELECT previo
+  ni get_or_create.
+- ``purgar_expirados``: borra por lotes los tokens expirados
+  (``manage.py purgar_tokens``).
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+
+def _config():
+    return {'LRU_MAXIMO': 100000, 'LOTE': 1000, 'INTERVALO': 3600, **getattr(settings, 'TOKENS_JWT', {})}
+
+
+class ListaNegraLocal:
+    """LRU de jti revocados (una entrada ocupa ~100 bytes)"""
+
+    def __init__(self):
+        self._jtis = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contiene(self, jti):
+        with self._lock:
+            if jti not in self._jtis:
+                return False
+            self._jtis.move_to_end(jti)
+            return True
+
+    def agregar(self, jti):
+        maximo = _config()['LRU_MAXIMO']
+        with self._lock:
+            self._jtis[jti] = None
+            self._jtis.move_to_end(jti)
+            while len(self._jtis) > maximo:
+                self._jtis.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._jtis.clear()
+
+
+lista_negra = ListaNegraLocal()
+
+
+def _rotacion_con_lista_negra():
+    return api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION
+
+
+class RefreshTokenRotado(RefreshToken):
+    """
+    RefreshToken para /api/auth/refresh/. Con rotación y lista negra, la
+    verificación en la base de datos la hace ``blacklist()`` al rotar.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if lista_negra.contiene(jti):
+            raise TokenError(_('Token is blacklisted'))
+        if not _rotacion_con_lista_negra():
+            super().check_blacklist()
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        token = OutstandingToken.objects.filter(jti=jti).first()
+        if token is None:
+            # Emitido antes de instalar token_blacklist
+            return super().blacklist()
+        try:
+            with transaction.atomic():
+                revocado = BlacklistedToken.objects.create(token=token)
+        except IntegrityError:
+            # Ya rotado (o revocado) en otra petición
+            lista_negra.agregar(jti)
+            raise TokenError(_('Token is blacklisted'))
+        return revocado, True
+
+    def outstand(self):
+        # Recién creado con set_jti(): no puede existir todavía
+        return OutstandingToken.objects.create(
+            user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+            jti=self.payload[api_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload['exp']),
+        ), True
+
+
+class RefreshRotadoSerializer(TokenRefreshSerializer):
+    token_class = RefreshTokenRotado
+
+
+def purgar_expirados(lote=None, ahora=None):
+    """
+    Borra los tokens expirados (y su entrada en la lista negra) en lotes de
+    ``lote`` filas, cada uno en su propia transacción corta (la de
+    ``delete()``). Devuelve (pendientes borrados, revocados borrados).
+    """
+    lote = lote or _config()['LOTE']
+    ahora = ahora or aware_utcnow()
+    pendientes = revocados = 0
+    while True:
+        # Índice tokens_expiracion_idx (migración reservas 0008)
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=ahora)
+            .order_by('expires_at').values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            break
+        # Sin signals de borrado: un DELETE por tabla, sin cargar las filas
+        _, borrados = OutstandingToken.objects.filter(pk__in=ids).only('pk').delete()
+        pendientes += borrados.get(OutstandingToken._meta.label, 0)
+        revocados += borrados.get(BlacklistedToken._meta.label, 0)
+        if len(ids) < lote:
+            break
+    return pendientes, revocados
@@ -0,0 +1,163 @@
+"""
+Tareas en segundo plano de la aplicación (ver reservas.tareas). Se registran
+al importar este módulo, que reservas.signals importa desde
+ReservasConfig.ready().
+"""
+from functools import partial
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Usuario, Sala, Reserva, DisponibilidadSala
+from .estadisticas import invalidar_estadisticas
+from .tareas import tarea
+from . import analitica, eventos, notificaciones, tareas, tokens
+
+
+def _reserva(fila):
+    """Datos de una reserva para las notificaciones (serializables en JSON)"""
+    return {campo: fila[campo] for campo in ('id', 'sala_id', 'fecha', 'hora_inicio', 'hora_fin')}
+
+
+def _publicar(tipo, datos):
+    for datos_reserva in datos:
+        eventos.difusor.publicar(tipo, datos_reserva)
+
+
+def encolar_notificaciones(tipo, filas):
+    """Una tarea ``notificar`` por reserva (dicts con id, usuario_id, sala_id, fecha y horas)"""
+    tareas.encolar_lote('notificar', [
+        {'tipo': tipo, 'usuario_id': fila['usuario_id'], 'reserva': _reserva(fila)} for fila in filas
+    ])
+
+
+def _enviar(tipo_y_filas):
+    """Envía ``[(tipo, usuario_id, reserva)]`` con una consulta de usuarios y otra de salas"""
+    if not tipo_y_filas:
+        return
+    usuarios = Usuario.objects.only('id', 'email', 'first_name').in_bulk({u for _, u, _ in tipo_y_filas})
+    salas = dict(Sala.objects.filter(pk__in={r['sala_id'] for _, _, r in tipo_y_filas}).values_list('id', 'nombre'))
+    notificaciones.backend.enviar([
+        notificaciones.mensaje(tipo, usuarios[usuario_id], reserva, salas.get(reserva['sala_id'], ''))
+        for tipo, usuario_id, reserva in tipo_y_filas
+        if usuario_id in usuarios
+    ])
+
+
+@tarea('notificar', lote=True)
+def notificar(lista_argumentos):
+    _enviar([(a['tipo'], a['usuario_id'], a['reserva']) for a in lista_argumentos])
+
+
+@tarea('analitica', lote=True)
+def aplicar_analitica(lista_argumentos):
+    """Deltas encolados por analitica.registrar_cambios, todos en una pasada"""
+    def decodificar(datos):
+        if datos is None:
+            return None
+        return {
+            **datos,
+            'fecha': date.fromisoformat(datos['fecha']),
+            'hora_inicio': time.fromisoformat(datos['hora_inicio']),
+            'hora_fin': time.fromisoformat(datos['hora_fin']),
+        }
+
+    analitica.aplicar_cambios([
+        (decodificar(anterior), decodificar(nueva))
+        for argumentos in lista_argumentos for anterior, nueva in argumentos['cambios']
+    ])
+
+
+@tarea('expirar_pendientes')
+def expirar_pendientes():
+    """
+    Cancela las reservas que siguen pendientes ``RESERVAS_PENDIENTES_EXPIRAN``
+    horas después de creadas, por lotes: un UPDATE por lote, con los mismos
+    efectos que Reserva.save() (mapas de disponibilidad, analítica, eventos)
+    y una notificación al dueño
+    """
+    limite = timezone.now() - timedelta(hours=settings.RESERVAS_PENDIENTES_EXPIRAN)
+    lote = settings.RESERVAS_EXPIRACION_LOTE
+    campos = ('id', 'sala_id', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'usuario_id')
+    while True:
+        candidatas = list(
+            Reserva.objects.filter(estado='pendiente', fecha_creacion__lt=limite)
+            .order_by('fecha_creacion').values_list('id', 'sala_id')[:lote]
+        )
+        if not candidatas:
+            return
+        with transaction.atomic():
+            # Mismo bloqueo de sala que Reserva.save(), en orden de id
+            list(Sala.objects.select_for_update().filter(
+                pk__in={sala_id for _, sala_id in candidatas},
+            ).order_by('pk').values_list('pk'))
+            # Pueden haberse confirmado o cancelado entre tanto
+            filas = list(Reserva.objects.filter(
+                pk__in=[pk for pk, _ in candidatas], estado='pendiente',
+            ).values(*campos))
+            ahora = timezone.now()
+            Reserva.objects.filter(pk__in=[fila['id'] for fila in filas]).update(
+                estado='cancelada', fecha_modificacion=ahora,
+            )
+
+            DisponibilidadSala.liberar_lote({(fila['sala_id'], fila['fecha']) for fila in filas})
+            analitica.registrar_cambios([(fila, {**fila, 'estado': 'cancelada'}) for fila in filas])
+            encolar_notificaciones('reserva.expirada', filas)
+
+            datos = [eventos.datos_reserva(Reserva(**{**fila, 'estado': 'cancelada'})) for fila in filas]
+            transaction.on_commit(invalidar_estadisticas)
+            transaction.on_commit(partial(_publicar, 'reserva.cancelada', datos))
+        if len(candidatas) < lote:
+            return
+
+
+@tarea('recordatorios')
+def enviar_recordatorios(desde=None):
+    """
+    Recordatorio de las reservas activas que empiezan dentro de
+    ``RECORDATORIOS_ANTICIPACION`` minutos. Cada ejecución cubre los inicios
+    en (desde, hasta] y la siguiente parte de ``hasta``: ninguna reserva se
+    recuerda dos veces aunque el trabajador se atrase.
+    """
+    ahora = timezone.localtime()
+    hasta = ahora + timedelta(minutes=settings.RECORDATORIOS_ANTICIPACION)
+    desde = timezone.localtime(parse_datetime(desde)) if desde else ahora
+    if desde >= hasta:
+        return {'desde': desde}
+
+    rango = Q()
+    dia = desde.date()
+    while dia <= hasta.date():
+        condicion = Q(fecha=dia)
+        if dia == desde.date():
+            condicion &= Q(hora_inicio__gt=desde.time())
+        if dia == hasta.date():
+            condicion &= Q(hora_inicio__lte=hasta.time())
+        rango |= condicion
+        dia += timedelta(days=1)
+
+    filas = Reserva.objects.filter(rango).exclude(estado='cancelada').order_by().values(
+        'id', 'sala_id', 'fecha', 'hora_inicio', 'hora_fin', 'usuario_id',
+    )
+    lote = []
+    for fila in filas.iterator(chunk_size=1000):
+        lote.append(('reserva.recordatorio', fila['usuario_id'], _reserva(fila)))
+        if len(lote) >= 1000:
+            _enviar(lote)
+            lote = []
+    _enviar(lote)
+    return {'desde': hasta}
+
+
+@tarea('purgar_tokens')
+def purgar_tokens():
+    tokens.purgar_expirados()
+
+
+@tarea('purgar_tareas')
+def purgar_tareas():
+    tareas.purgar()
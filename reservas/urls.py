@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
@@ -7,22 +8,48 @@ from .views import (
     UsuarioViewSet,
     SalaViewSet,
     ReservaViewSet,
-    CheckAuthView  # Ahora sí está definido
+    SerieReservaViewSet,
+    CheckAuthView,  # Ahora sí está definido
+    EstadisticasView,
+    PerfilView,
+    CambiosView,
+    AnaliticaViewSet,
 )
+from .auth_views import LoginView
+from .eventos_views import eventos_view, ticket_view
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet, basename='usuario')
 router.register(r'salas', SalaViewSet, basename='sala')
 router.register(r'reservas', ReservaViewSet, basename='reserva')
+router.register(r'series', SerieReservaViewSet, basename='serie')
+router.register(r'analytics', AnaliticaViewSet, basename='analitica')
 
-urlpatterns = [
+# Versiones async de las lecturas más frecuentes (reservas.async_views), en
+# las mismas rutas y antes del router. Se activan al servir con ASGI.
+rutas_async = [
+    path('auth/check/', async_views.check_auth, name='check_auth_async'),
+    path('usuarios/me/', async_views.usuario_me, name='usuario_me_async'),
+    path('salas/disponibles/', async_views.salas_disponibles, name='salas_disponibles_async'),
+    path('reservas/hoy/', async_views.reservas_hoy, name='reservas_hoy_async'),
+    path('reservas/mis_reservas/', async_views.mis_reservas, name='mis_reservas_async'),
+]
+
+urlpatterns = (rutas_async if settings.API_ASYNC else []) + [
     # Autenticación
     path('auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/registro/', RegistroViewSet.as_view({'post': 'create'}), name='registro'),
     path('auth/check/', CheckAuthView.as_view(), name='check_auth'),  # Descomentado
     path("auth/login/", LoginView.as_view(), name="auth_login"),
-    path("set-session/", set_session, name="set_session"),
+    
+    # Estadísticas del dashboard
+    path('stats/', EstadisticasView.as_view(), name='stats'),
+    path('perfil/', PerfilView.as_view(), name='perfil'),
+    path('cambios/', CambiosView.as_view(), name='cambios'),
+    path('eventos/', eventos_view, name='eventos'),
+    path('eventos/ticket/', ticket_view, name='eventos-ticket'),
     
     # API REST
     path('', include(router.urls)),
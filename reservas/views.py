@@ -1,22 +1,80 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework.views import APIView  # ✅ Importar APIView
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.db.models import Count
 from django.utils import timezone
-from .models import Sala, Reserva
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from .models import Sala, Reserva, DisponibilidadSala, Eliminacion, SerieReserva
+from .series import Ocurrencia, mapas_ocupacion
+from . import disponibilidad
 from .serializers import (
     UsuarioSerializer, RegistroSerializer,
-    SalaSerializer, ReservaSerializer, ReservaListSerializer
+    SalaSerializer, ReservaSerializer, ReservaListSerializer,
+    SerieReservaSerializer, OcurrenciaSerializer, ReservaListadoRapido,
 )
+from .renderers import JSONRapidoRenderer
 from .permissions import IsAdminUser, IsOwnerOrAdmin, ReadOnlyOrAdmin
+from .estadisticas import obtener_estadisticas
+from .pagination import ReservaKeysetPagination, ReservaConSeriesPagination
+from . import cambios, masivas, exportacion, analitica
+from .cache_salas import respuesta_cacheada
+from .condicional import get_condicional
+from .limite_login import LimiteLoginThrottle
+from reservas_proyecto import profiling
+from reservas_proyecto.replicas import alias_actual, lectura_replica
 
 Usuario = get_user_model()
 
 
+listado_rapido = ReservaListadoRapido()
+
+
+def serializar_listado(filas):
+    """
+    Filas de reservas (ReservaListadoRapido) y ocurrencias de series
+    (OcurrenciaSerializer) en su orden
+    """
+    ocurrencias = [fila for fila in filas if isinstance(fila, Ocurrencia)]
+    if not ocurrencias:
+        return listado_rapido.serializar(filas)
+    reservas = iter(listado_rapido.serializar([f for f in filas if not isinstance(f, Ocurrencia)]))
+    datos_ocurrencias = iter(OcurrenciaSerializer(ocurrencias, many=True).data)
+    return [next(datos_ocurrencias) if isinstance(f, Ocurrencia) else next(reservas) for f in filas]
+
+
+def reservas_paginadas(request, queryset, view=None, series=(), desde=None, hasta=None):
+    """
+    Respuesta paginada por keyset para listados de reservas; con ``series``
+    intercala sus ocurrencias entre ``desde`` y ``hasta``. Las reservas se
+    leen como tuplas, sin instanciar modelos (ReservaListadoRapido).
+    """
+    paginator = ReservaConSeriesPagination()
+    page = paginator.paginate_queryset(
+        ReservaListadoRapido.filas(queryset), request, view=view, series=series, desde=desde, hasta=hasta,
+    )
+    return paginator.get_paginated_response(serializar_listado(page))
+
+
+async def areservas_paginadas(request, queryset, view=None, series=(), desde=None, hasta=None):
+    """reservas_paginadas para vistas async (reservas.async_views): devuelve los datos"""
+    paginator = ReservaConSeriesPagination()
+    page = await paginator.apaginate_queryset(
+        ReservaListadoRapido.filas(queryset), request, view=view, series=series, desde=desde, hasta=hasta,
+    )
+    return paginator.get_paginated_response(serializar_listado(page)).data
+
+
 # ============================
 # 🔹 VISTA PARA VERIFICAR AUTENTICACIÓN
 # ============================
@@ -36,6 +94,76 @@ class CheckAuthView(APIView):
         })
 
 
+# ============================
+# 🔹 ESTADÍSTICAS DEL DASHBOARD
+# ============================
+class EstadisticasView(APIView):
+    """Contadores agregados del dashboard de administración"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        return Response(obtener_estadisticas())
+
+
+# ============================
+# 🔹 FEED DE CAMBIOS
+# ============================
+class CambiosView(APIView):
+    """
+    Reservas y salas modificadas (y eliminadas) desde ?desde=<cursor>.
+    Sin ``desde`` solo devuelve el cursor actual. Responde 304 si el
+    If-None-Match coincide, es decir, si no hubo cambios.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        desde = request.query_params.get('desde')
+        if not desde:
+            return Response({
+                'cursor': cambios.cursor_actual(request.user),
+                'hay_mas': False,
+                'reservas': [],
+                'salas': [],
+                'eliminados': [],
+            })
+        
+        try:
+            filas, cursor, hay_mas = cambios.obtener_cambios(request.user, desde)
+        except cambios.CursorInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        etag = cambios.etag(desde, cursor, hay_mas)
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        reservas = Reserva.objects.para_listado().filter(pk__in=filas['reservas'])
+        salas = Sala.objects.annotate(num_reservas=Count('reservas')).filter(pk__in=filas['salas'])
+        eliminados = Eliminacion.objects.filter(pk__in=filas['eliminados']).order_by('fecha', 'id')
+        
+        return Response({
+            'cursor': cursor,
+            'hay_mas': hay_mas,
+            'reservas': ReservaListSerializer(reservas.order_by('fecha_modificacion', 'id'), many=True).data,
+            'salas': SalaSerializer(salas.order_by('fecha_modificacion', 'id'), many=True).data,
+            'eliminados': [{'modelo': e.modelo, 'id': e.objeto_id} for e in eliminados],
+        }, headers={'ETag': etag})
+
+
+# ============================
+# 🔹 PERFILADO DE LA API
+# ============================
+class PerfilView(APIView):
+    """Histogramas de latencia y consultas por ruta de este proceso"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        return Response(profiling.registro.snapshot())
+    
+    def delete(self, request):
+        profiling.registro.reiniciar()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Serializer personalizado para incluir info del usuario en el token"""
     
@@ -56,6 +184,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LimiteLoginThrottle]
 
 
 class RegistroViewSet(viewsets.GenericViewSet):
@@ -76,7 +205,7 @@ class RegistroViewSet(viewsets.GenericViewSet):
 
 class UsuarioViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar usuarios"""
-    queryset = Usuario.objects.all().order_by('-fecha_registro')
+    queryset = Usuario.objects.annotate(num_reservas=Count('reservas')).order_by('-fecha_registro')
     serializer_class = UsuarioSerializer
     permission_classes = [IsAuthenticated, IsAdminUser]
     
@@ -90,31 +219,107 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     def reservas(self, request, pk=None):
         """Obtener todas las reservas de un usuario"""
         usuario = self.get_object()
-        reservas = usuario.reservas.all()
-        serializer = ReservaListSerializer(reservas, many=True)
-        return Response(serializer.data)
+        return reservas_paginadas(request, usuario.reservas.para_listado(), view=self)
 
 
 class SalaViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar salas"""
-    queryset = Sala.objects.all().order_by('nombre')
+    queryset = Sala.objects.annotate(num_reservas=Count('reservas')).order_by('nombre')
     serializer_class = SalaSerializer
     permission_classes = [IsAuthenticated, ReadOnlyOrAdmin]
     
+    # Catálogo de lectura frecuente: respuestas versionadas (reservas.cache_salas)
+    @lectura_replica
+    @respuesta_cacheada
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @lectura_replica
+    @respuesta_cacheada
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=False, methods=['get'])
+    @lectura_replica
+    @respuesta_cacheada
     def disponibles(self, request):
         """Listar solo las salas disponibles"""
-        salas = Sala.objects.filter(estado='disponible')
+        salas = self.get_queryset().filter(estado='disponible')
         serializer = self.get_serializer(salas, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def disponibilidad(self, request):
+        """
+        Bloques libres y ocupados por sala y día entre ?desde= y ?hasta=
+        (por defecto, la semana que empieza hoy)
+        """
+        desde_param = request.query_params.get('desde')
+        hasta_param = request.query_params.get('hasta')
+        try:
+            desde = parse_date(desde_param) if desde_param else timezone.localdate()
+            hasta = parse_date(hasta_param) if hasta_param else desde + timedelta(days=6)
+        except (TypeError, ValueError):
+            desde = hasta = None
+        
+        if desde is None or hasta is None:
+            return Response(
+                {'error': 'Formato de fecha inválido, use AAAA-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if hasta < desde or (hasta - desde).days > 31:
+            return Response(
+                {'error': 'El rango debe ser de 0 a 31 días con hasta >= desde'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        mapas = {
+            (sala_id, fecha): ocupacion
+            for sala_id, fecha, ocupacion in DisponibilidadSala.objects.filter(
+                fecha__range=(desde, hasta)
+            ).values_list('sala_id', 'fecha', 'ocupacion')
+        }
+        # Las series no se guardan en los mapas: se expanden sobre la ventana pedida
+        series = SerieReserva.objects.filter(
+            fecha_inicio__lte=hasta, fecha_fin__gte=desde
+        ).exclude(estado='cancelada')
+        for clave, mascara in mapas_ocupacion(series, desde, hasta).items():
+            mapas[clave] = mapas.get(clave, 0) | mascara
+        fechas = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+        
+        resultado = []
+        for sala in Sala.objects.order_by('nombre').only('id', 'nombre', 'estado'):
+            dias = []
+            for fecha in fechas:
+                # Una sala en mantenimiento no tiene bloques libres
+                mapa = disponibilidad.MAPA_COMPLETO if sala.estado != 'disponible' else mapas.get((sala.id, fecha), 0)
+                dias.append({
+                    'fecha': fecha.isoformat(),
+                    'mapa': mapa,
+                    'ocupados': disponibilidad.rangos(mapa),
+                    'libres': disponibilidad.rangos(mapa, ocupados=False),
+                })
+            resultado.append({
+                'sala': sala.id,
+                'sala_nombre': sala.nombre,
+                'estado': sala.estado,
+                'dias': dias,
+            })
+        
+        return Response({
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'apertura': f'{disponibilidad.HORA_APERTURA:02d}:00',
+            'cierre': f'{disponibilidad.HORA_CIERRE:02d}:00',
+            'minutos_bloque': disponibilidad.MINUTOS_BLOQUE,
+            'salas': resultado,
+        })
+    
     @action(detail=True, methods=['get'])
     def reservas(self, request, pk=None):
         """Obtener todas las reservas de una sala"""
         sala = self.get_object()
-        reservas = sala.reservas.all()
-        serializer = ReservaListSerializer(reservas, many=True)
-        return Response(serializer.data)
+        return reservas_paginadas(request, sala.reservas.para_listado(), view=self)
 
 
 class ReservaViewSet(viewsets.ModelViewSet):
@@ -122,29 +327,160 @@ class ReservaViewSet(viewsets.ModelViewSet):
     queryset = Reserva.objects.all().select_related('usuario', 'sala').order_by('-fecha', '-hora_inicio')
     serializer_class = ReservaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ReservaKeysetPagination
+    renderer_classes = [JSONRapidoRenderer, BrowsableAPIRenderer]
     
     def get_queryset(self):
         """Filtrar reservas según el rol del usuario"""
         user = self.request.user
+        queryset = self.queryset
+        if self.action in ('list', 'hoy', 'pendientes'):
+            queryset = queryset.para_listado()
         if user.es_admin:
-            return self.queryset
-        return self.queryset.filter(usuario=user)
+            return queryset
+        return queryset.filter(usuario=user)
     
     def get_serializer_class(self):
         if self.action == 'list':
             return ReservaListSerializer
         return ReservaSerializer
     
+    def reservas_hoy(self, hoy):
+        return self.get_queryset().filter(fecha=hoy)
+    
+    def series_hoy(self, hoy):
+        series = SerieReserva.objects.filter(fecha_inicio__lte=hoy, fecha_fin__gte=hoy).para_listado()
+        if not self.request.user.es_admin:
+            series = series.filter(usuario=self.request.user)
+        return series
+    
+    def fuentes_condicionales(self):
+        """Querysets de los que depende la lectura en curso (reservas.condicional)"""
+        usuario = self.request.user
+        if self.action == 'retrieve':
+            pk = str(self.kwargs.get('pk', ''))
+            return [self.get_queryset().filter(pk=pk)] if pk.isdigit() else None
+        # Listados: solo la ventana de la página pedida, nunca la tabla completa
+        def ventana(queryset):
+            return ReservaConSeriesPagination().ventana(queryset, self.request)
+        
+        if self.action == 'list':
+            return [ventana(self.filter_queryset(self.get_queryset()))]
+        if self.action == 'hoy':
+            hoy = timezone.now().date()
+            return [ventana(self.reservas_hoy(hoy)), self.series_hoy(hoy)]
+        if self.action == 'pendientes':
+            return [ventana(self.get_queryset().filter(estado='pendiente'))]
+        if self.action == 'mis_reservas':
+            return [ventana(Reserva.objects.filter(usuario=usuario)), SerieReserva.objects.filter(usuario=usuario)]
+        return None
+    
+    @lectura_replica
+    @get_condicional
+    def list(self, request, *args, **kwargs):
+        return reservas_paginadas(request, self.filter_queryset(self.get_queryset()), view=self)
+    
+    @get_condicional
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         """Asignar el usuario autenticado al crear una reserva"""
-        serializer.save(usuario=self.request.user)
+        try:
+            serializer.save(usuario=self.request.user)
+        except DjangoValidationError as e:
+            # Conflicto detectado bajo bloqueo (otra reserva entró entre la
+            # validación del serializer y el INSERT)
+            raise serializers.ValidationError(e.messages)
+    
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def masivas(self, request):
+        """
+        Crear un lote de reservas: ``{"modo": "todo_o_nada" | "parcial",
+        "reservas": [...]}``. Devuelve un resultado por ítem; 201 si se
+        crearon todas, 207 si en modo parcial alguna falló y 400 si en modo
+        todo_o_nada no se creó ninguna.
+        """
+        datos = request.data if isinstance(request.data, dict) else {}
+        items = datos.get('reservas')
+        modo = datos.get('modo', masivas.TODO_O_NADA)
+        if modo not in masivas.MODOS:
+            return Response(
+                {'modo': [f'Debe ser uno de: {", ".join(masivas.MODOS)}']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'reservas': ['Se requiere una lista de reservas']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.RESERVAS_BULK_MAXIMO:
+            return Response(
+                {'reservas': [f'El lote no puede superar {settings.RESERVAS_BULK_MAXIMO} reservas']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        resultados = masivas.crear_reservas(request.user, items, modo)
+        creadas = sum(1 for r in resultados if r['estado'] == 'creada')
+        errores = sum(1 for r in resultados if r['estado'] == 'error')
+        if not errores:
+            codigo = status.HTTP_201_CREATED
+        elif creadas:
+            codigo = status.HTTP_207_MULTI_STATUS
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST
+        return Response({'creadas': creadas, 'errores': errores, 'resultados': resultados}, status=codigo)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdminUser])
+    @lectura_replica
+    def exportar(self, request):
+        """
+        Exportación en streaming (?formato=csv|jsonl) filtrable por ?desde=,
+        ?hasta=, ?sala= y ?estado=. Memoria constante sin importar el rango.
+        """
+        formato = request.query_params.get('formato', 'csv')
+        estado = request.query_params.get('estado')
+        try:
+            desde = parse_date(request.query_params.get('desde', ''))
+            hasta = parse_date(request.query_params.get('hasta', ''))
+            sala = int(request.query_params['sala']) if request.query_params.get('sala') else None
+        except ValueError:
+            return Response(
+                {'error': 'Parámetros inválidos: fechas AAAA-MM-DD y sala numérica'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if formato not in exportacion.FORMATOS:
+            return Response(
+                {'error': f'Formato no soportado, use: {", ".join(exportacion.FORMATOS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if estado and estado not in dict(Reserva.ESTADOS_RESERVA):
+            return Response({'error': 'Estado inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # El contenido se genera después de que la vista retorna: la réplica
+        # se fija en el queryset
+        queryset = exportacion.filtrar(desde, hasta, sala, estado).using(alias_actual())
+        export = exportacion.Exportacion(queryset, formato)
+        contenido = export.__aiter__() if isinstance(request._request, ASGIRequest) else iter(export)
+        response = StreamingHttpResponse(contenido, content_type=exportacion.FORMATOS[formato])
+        nombre = '-'.join(['reservas'] + [str(f) for f in (desde, hasta) if f])
+        response['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+        return response
     
     @action(detail=False, methods=['get'])
+    @lectura_replica
+    @get_condicional
     def mis_reservas(self, request):
         """Obtener reservas del usuario autenticado"""
-        reservas = Reserva.objects.filter(usuario=request.user).select_related('sala')
-        serializer = ReservaListSerializer(reservas, many=True)
-        return Response(serializer.data)
+        reservas = Reserva.objects.filter(usuario=request.user).para_listado()
+        series = list(SerieReserva.objects.filter(usuario=request.user).para_listado())
+        return reservas_paginadas(request, reservas, view=self, series=series)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsOwnerOrAdmin])
     def confirmar(self, request, pk=None):
@@ -164,7 +500,10 @@ class ReservaViewSet(viewsets.ModelViewSet):
             )
         
         reserva.estado = 'confirmada'
-        reserva.save()
+        try:
+            reserva.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
         
         serializer = self.get_serializer(reserva)
         return Response(serializer.data)
@@ -181,22 +520,211 @@ class ReservaViewSet(viewsets.ModelViewSet):
             )
         
         reserva.estado = 'cancelada'
-        reserva.save()
+        try:
+            reserva.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
         
         serializer = self.get_serializer(reserva)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @lectura_replica
+    @get_condicional
     def hoy(self, request):
         """Obtener reservas del día de hoy"""
         hoy = timezone.now().date()
-        queryset = self.get_queryset().filter(fecha=hoy)
-        serializer = ReservaListSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return reservas_paginadas(
+            request, self.reservas_hoy(hoy), view=self, series=list(self.series_hoy(hoy)), desde=hoy, hasta=hoy,
+        )
     
     @action(detail=False, methods=['get'])
+    @lectura_replica
+    @get_condicional
     def pendientes(self, request):
         """Obtener todas las reservas pendientes"""
         queryset = self.get_queryset().filter(estado='pendiente')
-        serializer = ReservaListSerializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return reservas_paginadas(request, queryset, view=self)
+
+
+class SerieReservaViewSet(viewsets.ModelViewSet):
+    """ViewSet para gestionar series de reservas recurrentes"""
+    queryset = SerieReserva.objects.select_related('usuario', 'sala').order_by('-fecha_inicio', '-id')
+    serializer_class = SerieReservaSerializer
+    permission_classes = [IsAuthenticated, IsOwnerOrAdmin]
+    
+    def get_queryset(self):
+        if self.request.user.es_admin:
+            return self.queryset
+        return self.queryset.filter(usuario=self.request.user)
+    
+    def perform_create(self, serializer):
+        try:
+            serializer.save(usuario=self.request.user)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+    
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+    
+    @action(detail=True, methods=['get'])
+    def ocurrencias(self, request, pk=None):
+        """Fechas de la serie entre ?desde= y ?hasta= (por defecto, toda la serie)"""
+        serie = self.get_object()
+        try:
+            desde = parse_date(request.query_params.get('desde', ''))
+            hasta = parse_date(request.query_params.get('hasta', ''))
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido, use AAAA-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ocurrencias = (Ocurrencia(serie, fecha) for fecha in serie.fechas(desde, hasta))
+        return Response(OcurrenciaSerializer(ocurrencias, many=True).data)
+    
+    @action(detail=True, methods=['post'])
+    def excluir(self, request, pk=None):
+        """Quitar una fecha de la serie (p. ej. un feriado)"""
+        serie = self.get_object()
+        fecha_param = request.data.get('fecha')
+        try:
+            fecha = parse_date(fecha_param) if isinstance(fecha_param, str) else None
+        except ValueError:
+            fecha = None
+        if fecha is None or not serie.incluye(fecha):
+            return Response(
+                {'error': 'La fecha no es una ocurrencia de la serie'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serie.excepciones = sorted(set(serie.excepciones) | {fecha.isoformat()})
+        serie.save()
+        return Response(self.get_serializer(serie).data)
+    
+    @action(detail=True, methods=['post'])
+    def confirmar(self, request, pk=None):
+        """Confirmar la serie completa"""
+        serie = self.get_object()
+        
+        if serie.estado != 'pendiente':
+            return Response(
+                {'error': f'No se puede confirmar una serie {serie.estado}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serie.estado = 'confirmada'
+        try:
+            serie.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        return Response(self.get_serializer(serie).data)
+    
+    @action(detail=True, methods=['post'])
+    def cancelar(self, request, pk=None):
+        """Cancelar la serie completa"""
+        serie = self.get_object()
+        
+        if serie.estado == 'cancelada':
+            return Response(
+                {'error': 'La serie ya está cancelada'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serie.estado = 'cancelada'
+        try:
+            serie.save()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        return Response(self.get_serializer(serie).data)
+
+
+# ============================
+# 🔹 ANALÍTICA DE OCUPACIÓN
+# ============================
+class AnaliticaViewSet(viewsets.ViewSet):
+    """
+    Reportes de uso de salas entre ?desde= y ?hasta= (por defecto los
+    últimos ANALITICA_DIAS_DEFECTO días), opcionalmente de una ?sala=.
+    Se calculan sobre los resúmenes diarios (reservas.analitica), nunca
+    sobre la tabla de reservas.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    @staticmethod
+    def _error(mensaje):
+        return Response({'error': mensaje}, status=status.HTTP_400_BAD_REQUEST)
+    
+    def _rango(self, request):
+        """((desde, hasta, sala), None) o (None, respuesta de error)"""
+        hoy = timezone.localdate()
+        try:
+            hasta = parse_date(request.query_params.get('hasta', '')) or hoy
+            desde = parse_date(request.query_params.get('desde', '')) or (
+                hasta - timedelta(days=settings.ANALITICA_DIAS_DEFECTO - 1)
+            )
+            sala = int(request.query_params['sala']) if request.query_params.get('sala') else None
+        except ValueError:
+            return None, self._error('Parámetros inválidos: fechas AAAA-MM-DD y sala numérica')
+        if desde > hasta:
+            return None, self._error('desde debe ser anterior o igual a hasta')
+        if (hasta - desde).days + 1 > settings.ANALITICA_MAXIMO_DIAS:
+            return None, self._error(f'El rango no puede superar {settings.ANALITICA_MAXIMO_DIAS} días')
+        return (desde, hasta, sala), None
+    
+    @lectura_replica
+    def list(self, request):
+        """Resumen del rango: ocupación por sala, horas punta y carreras"""
+        rango, error = self._rango(request)
+        if error:
+            return error
+        desde, hasta, sala = rango
+        return Response({
+            'desde': desde,
+            'hasta': hasta,
+            'salas': analitica.por_sala(desde, hasta, sala),
+            'horas_punta': analitica.horas_punta(desde, hasta, sala),
+            'carreras': analitica.por_carrera(desde, hasta),
+        })
+    
+    @action(detail=False, methods=['get'])
+    @lectura_replica
+    def salas(self, request):
+        """Tasas de ocupación, cancelación y no-show por sala"""
+        rango, error = self._rango(request)
+        if error:
+            return error
+        desde, hasta, sala = rango
+        return Response(analitica.por_sala(desde, hasta, sala))
+    
+    @action(detail=False, methods=['get'])
+    @lectura_replica
+    def diario(self, request):
+        """Serie diaria de utilización para gráficos"""
+        rango, error = self._rango(request)
+        if error:
+            return error
+        desde, hasta, sala = rango
+        return Response(analitica.diario(desde, hasta, sala))
+    
+    @action(detail=False, methods=['get'])
+    @lectura_replica
+    def horas(self, request):
+        """Ocupación por hora del día (horas punta)"""
+        rango, error = self._rango(request)
+        if error:
+            return error
+        desde, hasta, sala = rango
+        return Response(analitica.horas_punta(desde, hasta, sala))
+    
+    @action(detail=False, methods=['get'])
+    @lectura_replica
+    def carreras(self, request):
+        """Reservas y minutos por carrera del usuario"""
+        rango, error = self._rango(request)
+        if error:
+            return error
+        desde, hasta, _ = rango
+        return Response(analitica.por_carrera(desde, hasta))
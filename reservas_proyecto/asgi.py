@@ -3,6 +3,20 @@ ASGI config for reservas_proyecto project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn reservas_proyecto.asgi:application``)
+for /api/eventos/: under WSGI each SSE connection would hold a worker thread.
+
+Under ASGI the hottest read endpoints are served by the async views in
+``reservas.async_views`` (``API_ASYNC``; set API_ASYNC=0 to use the DRF
+views). Compare both servers under the same load: run each one with a
+single worker (``gunicorn reservas_proyecto.wsgi --threads 8`` and
+``uvicorn reservas_proyecto.asgi:application``) and measure it with::
+
+    python manage.py carga --escenarios check me disponibles hoy mis_reservas
+        --concurrencia 200 --clientes-lentos 50 --guardar wsgi.json
+
+then ``--comparar wsgi.json`` on the second run.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +26,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reservas_proyecto.settings')
+os.environ.setdefault('API_ASYNC', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,14 @@
+from django.db.backends.mysql import base
+
+from ..pool import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, base.DatabaseWrapper):
+    """Backend MySQL de Django con pool de conexiones (ver backends.pool)"""
+
+    def conexion_utilizable(self, conexion):
+        try:
+            conexion.ping()
+        except base.Database.Error:
+            return False
+        return True
@@ -0,0 +1,198 @@
+"""
+Pool de conexiones por proceso para los backends de base de datos.
+
+Django (4.2) abre una conexión por hilo y, con CONN_MAX_AGE=0, la cierra al
+final de cada petición. Los backends de este paquete cambian ese cierre por
+una devolución al pool del proceso: la siguiente petición, de cualquier
+hilo, reutiliza una conexión ya abierta en lugar de pagar el handshake.
+
+Configuración en ``DATABASES[alias]['POOL']``:
+
+- ``TAMANO``: conexiones que el pool conserva abiertas (por proceso/worker).
+- ``DESBORDE``: conexiones extra permitidas en picos; se cierran al devolverse.
+- ``TIEMPO_ESPERA``: segundos que se espera una conexión con el pool lleno.
+- ``TIEMPO_INACTIVO``: las conexiones ociosas más tiempo que esto se cierran.
+- ``VIDA_MAXIMA``: edad máxima de una conexión (p. ej. bajo wait_timeout).
+- ``VERIFICAR_TRAS``: una conexión ociosa más de estos segundos se verifica
+  (ping) antes de entregarla.
+"""
+import os
+import threading
+import time
+
+from django.db import OperationalError
+
+POR_DEFECTO = {
+    'TAMANO': 10,
+    'DESBORDE': 5,
+    'TIEMPO_ESPERA': 10,
+    'TIEMPO_INACTIVO': 300,
+    'VIDA_MAXIMA': 3600,
+    'VERIFICAR_TRAS': 30,
+}
+
+
+class PoolAgotado(OperationalError):
+    pass
+
+
+class PoolConexiones:
+    """
+    Conexiones libres en pila (LIFO: se reutiliza la más reciente y las
+    demás envejecen hasta cerrarse por inactividad). ``conectar`` abre una
+    conexión nueva; ``utilizable(conexion)`` la verifica; ``cerrar`` la cierra.
+    """
+
+    def __init__(self, conectar, utilizable, cerrar, config=None):
+        self.conectar = conectar
+        self.utilizable = utilizable
+        self.cerrar = cerrar
+        self.config = {**POR_DEFECTO, **(config or {})}
+        self._libres = []  # (conexion, creada, devuelta)
+        self._creadas = {}  # id(conexion) -> instante de creación
+        self._abiertas = 0
+        self._cond = threading.Condition()
+
+    @property
+    def abiertas(self):
+        return self._abiertas
+
+    @property
+    def libres(self):
+        return len(self._libres)
+
+    def _vencida(self, creada, devuelta, ahora):
+        return (
+            ahora - devuelta > self.config['TIEMPO_INACTIVO']
+            or ahora - creada > self.config['VIDA_MAXIMA']
+        )
+
+    def obtener(self):
+        limite = time.monotonic() + self.config['TIEMPO_ESPERA']
+        while True:
+            descartar = []
+            candidata = None
+            with self._cond:
+                ahora = time.monotonic()
+                while self._libres:
+                    conexion, creada, devuelta = self._libres.pop()
+                    if self._vencida(creada, devuelta, ahora):
+                        descartar.append(conexion)
+                        continue
+                    candidata = (conexion, ahora - devuelta > self.config['VERIFICAR_TRAS'])
+                    break
+                if candidata is None and not descartar:
+                    if self._abiertas < self.config['TAMANO'] + self.config['DESBORDE']:
+                        self._abiertas += 1
+                        break
+                    restante = limite - ahora
+                    if restante <= 0:
+                        raise PoolAgotado(
+                            f"Pool de conexiones agotado ({self._abiertas} abiertas) "
+                            f"tras esperar {self.config['TIEMPO_ESPERA']} s"
+                        )
+                    self._cond.wait(restante)
+                    continue
+            # Cierres y verificaciones fuera del lock: pueden tocar la red
+            for conexion in descartar:
+                self.descartar(conexion)
+            if candidata is not None:
+                conexion, verificar = candidata
+                if not verificar or self.utilizable(conexion):
+                    return conexion
+                self.descartar(conexion)
+
+        try:
+            conexion = self.conectar()
+        except BaseException:
+            with self._cond:
+                self._abiertas -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._creadas[id(conexion)] = time.monotonic()
+        return conexion
+
+    def devolver(self, conexion):
+        ahora = time.monotonic()
+        with self._cond:
+            creada = self._creadas.get(id(conexion), ahora)
+            if len(self._libres) < self.config['TAMANO'] and not self._vencida(creada, ahora, ahora):
+                self._libres.append((conexion, creada, ahora))
+                self._cond.notify()
+                return
+        self.descartar(conexion)
+
+    def descartar(self, conexion):
+        try:
+            self.cerrar(conexion)
+        except Exception:
+            pass
+        finally:
+            with self._cond:
+                self._creadas.pop(id(conexion), None)
+                self._abiertas -= 1
+                self._cond.notify()
+
+    def vaciar(self):
+        with self._cond:
+            libres, self._libres = self._libres, []
+        for conexion, _, _ in libres:
+            self.descartar(conexion)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_para(clave, *args, **kwargs):
+    """Pool del proceso actual para ``clave`` (tras un fork se crea otro)"""
+    clave = (os.getpid(), *clave)
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = _pools[clave] = PoolConexiones(*args, **kwargs)
+        return pool
+
+
+class PoolMixin:
+    """
+    Mixin para DatabaseWrapper: ``get_new_connection`` toma una conexión del
+    pool y ``_close`` la devuelve en lugar de cerrarla. Una conexión cerrada
+    dentro de un bloque atómico, con la transacción sin revertir o con
+    errores sin verificar se descarta.
+    """
+
+    def conexion_utilizable(self, conexion):
+        raise NotImplementedError
+
+    def _pool(self, conn_params):
+        crear = super().get_new_connection
+        datos = self.settings_dict
+        return pool_para(
+            (self.vendor, self.alias, datos['NAME'], datos.get('HOST'), datos.get('PORT'), datos.get('USER')),
+            conectar=lambda: crear(conn_params),
+            utilizable=self.conexion_utilizable,
+            cerrar=lambda conexion: conexion.close(),
+            config=datos.get('POOL'),
+        )
+
+    def get_new_connection(self, conn_params):
+        self.pool = self._pool(conn_params)
+        return self.pool.obtener()
+
+    def _close(self):
+        conexion = self.connection
+        pool = getattr(self, 'pool', None)
+        if conexion is None or pool is None:
+            return super()._close()
+        if self.in_atomic_block or (self.errors_occurred and not self.conexion_utilizable(conexion)):
+            pool.descartar(conexion)
+            return
+        try:
+            # Nada de una petición debe quedar abierto para la siguiente
+            conexion.rollback()
+        except Exception:
+            pool.descartar(conexion)
+            return
+        pool.devolver(conexion)
@@ -0,0 +1,17 @@
+from django.db.backends.sqlite3 import base
+
+from ..pool import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, base.DatabaseWrapper):
+    """
+    Backend SQLite con pool de conexiones, para probar y medir el pool en
+    local sin un servidor MySQL (ver backends.pool)
+    """
+
+    def conexion_utilizable(self, conexion):
+        try:
+            conexion.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
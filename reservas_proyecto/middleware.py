@@ -1,14 +1,221 @@
-class JWTAuthMiddleware:
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.base import SessionBase
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connections
+
+from . import profiling, replicas
+
+
+class MiddlewareHibrido:
+    """
+    Base de los middlewares del proyecto: sync y async. Bajo ASGI una
+    cadena completamente async deja que las vistas async
+    (reservas.async_views) corran en el event loop, sin pasar por un hilo.
+    Las subclases definen ``procesar(request)`` (antes de la vista, opcional)
+    y ``responder(request, response)``.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def procesar(self, request):
+        pass
+
+    def responder(self, request, response):
+        return response
 
     def __call__(self, request):
-        # Verificar si hay token en los headers
-        auth_header = request.headers.get('Authorization', '')
-        
-        if auth_header.startswith('Bearer '):
-            # Si hay token JWT en los headers, marcar la sesión
-            request.session['has_jwt_token'] = True
-        
-        response = self.get_response(request)
-        return response
\ No newline at end of file
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.procesar(request)
+        return self.responder(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        self.procesar(request)
+        return self.responder(request, await self.get_response(request))
+
+
+class SesionSinEstado(SessionBase):
+    """
+    Sesión en memoria que nunca lee ni escribe en el backend de sesiones.
+    Las rutas de la API se autentican solo con el token JWT, así que no
+    necesitan cargar ni guardar la sesión.
+    """
+    def __init__(self, session_key=None):
+        super().__init__(None)
+
+    # La sesión nunca queda marcada como accedida ni modificada (y
+    # SesionMiddleware ignora las respuestas con esta sesión), de modo que no
+    # se guarda ni se emite cookie.
+    accessed = property(lambda self: False, lambda self, valor: None)
+    modified = property(lambda self: False, lambda self, valor: None)
+
+    def is_empty(self):
+        # Nunca "vacía": si lo fuera, SessionMiddleware borraría la cookie de
+        # sesión que el navegador envía junto a las llamadas a la API.
+        return False
+
+    def load(self):
+        return {}
+
+    def exists(self, session_key):
+        return False
+
+    def create(self):
+        self._session_key = None
+
+    def save(self, must_create=False):
+        pass
+
+    def delete(self, session_key=None):
+        pass
+
+
+class SesionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware que no toca la respuesta de las peticiones con
+    SesionSinEstado: con SESSION_SAVE_EVERY_REQUEST la guardaría igual y
+    emitiría una cookie de sesión vacía, cerrando la sesión del dashboard.
+    """
+    def process_response(self, request, response):
+        if isinstance(getattr(request, 'session', None), SesionSinEstado):
+            return response
+        return super().process_response(request, response)
+
+
+class JWTAuthMiddleware(MiddlewareHibrido):
+    """
+    Autenticación híbrida: las rutas bajo ``settings.API_PREFIJO`` usan solo
+    el token (JWTAuthentication de DRF) y reciben una sesión sin estado, sin
+    E/S de sesión por petición. Las cookies de sesión solo las emite
+    ``set_session_view`` para los dashboards renderizados en el servidor.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefijo = getattr(settings, 'API_PREFIJO', '/api/')
+        self.sin_sesion = getattr(settings, 'API_SIN_SESION', True)
+
+    def procesar(self, request):
+        if self.sin_sesion and request.path_info.startswith(self.prefijo):
+            request.session = SesionSinEstado()
+
+
+class ReplicaMiddleware(MiddlewareHibrido):
+    """
+    Abre la ventana de lectura en la primaria (``replicas.marcar_escritura``)
+    tras cada escritura exitosa de un usuario autenticado, para que sus
+    siguientes lecturas vean lo que acaba de escribir.
+    """
+    METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def responder(self, request, response):
+        if request.method not in self.METODOS_SEGUROS and response.status_code < 400:
+            # DRF asigna aquí el usuario autenticado por JWT
+            usuario = getattr(request, 'user', None)
+            if usuario is not None and usuario.is_authenticated:
+                replicas.marcar_escritura(usuario)
+        return response
+
+
+class ProfilingMiddleware(MiddlewareHibrido):
+    """
+    Mide cada petición muestreada (tiempo total, consultas y tiempo SQL,
+    serialización, renderizado y tamaño), la agrega en los histogramas de
+    ``profiling.registro`` y la expone en la cabecera ``Server-Timing``.
+    Se configura con ``settings.PERFILADO``.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        config = getattr(settings, 'PERFILADO', {})
+        self.habilitado = config.get('HABILITADO', True)
+        self.muestreo = config.get('MUESTREO', 1.0)
+        self.server_timing = config.get('SERVER_TIMING', True)
+        self.directorio = config.get('DIRECTORIO')
+        self.intervalo = config.get('INTERVALO_VOLCADO', 60)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.habilitado or random.random() >= self.muestreo:
+            return self.get_response(request)
+        perfil = profiling.Perfil()
+        request._perfil = perfil
+        with profiling.activar(perfil), self.envolver_conexiones(perfil):
+            response = self.get_response(request)
+        return self.registrar(request, perfil, response)
+
+    async def __acall__(self, request):
+        if not self.habilitado or random.random() >= self.muestreo:
+            return await self.get_response(request)
+        perfil = profiling.Perfil()
+        request._perfil = perfil
+        with profiling.activar(perfil):
+            # Las conexiones son por hilo: el ORM async y las vistas sync
+            # consultan desde el hilo de la petición (thread_sensitive), y
+            # ahí es donde se instalan los wrappers
+            envolturas = await sync_to_async(self.envolver_conexiones)(perfil)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(envolturas.close)()
+        return self.registrar(request, perfil, response)
+
+    @staticmethod
+    def envolver_conexiones(perfil):
+        stack = ExitStack()
+        for conexion in connections.all():
+            stack.enter_context(conexion.execute_wrapper(perfil.ejecutar_sql))
+        return stack
+
+    def registrar(self, request, perfil, response):
+        total = time.perf_counter() - perfil.inicio
+
+        serializer = perfil.secciones.get('serializer', 0.0)
+        render = perfil.secciones.get('render', 0.0)
+        tamano = 0 if response.streaming else len(response.content)
+
+        profiling.registro.registrar(self.nombre_ruta(request), {
+            'total_ms': total * 1000,
+            'db_ms': perfil.db * 1000,
+            'serializer_ms': serializer * 1000,
+            'render_ms': render * 1000,
+            'consultas': perfil.consultas,
+            'bytes': tamano,
+        })
+        if self.directorio:
+            profiling.registro.volcar_si_corresponde(self.directorio, self.intervalo)
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total * 1000:.2f}',
+                f'db;dur={perfil.db * 1000:.2f};desc="{perfil.consultas} consultas"',
+                f'ser;dur={serializer * 1000:.2f}',
+                f'render;dur={render * 1000:.2f}',
+            ])
+        return response
+
+    def process_template_response(self, request, response):
+        # Las respuestas de DRF se renderizan después de la vista: medir ese tramo
+        perfil = getattr(request, '_perfil', None)
+        if perfil is not None:
+            perfil.iniciar_render()
+            response.add_post_render_callback(perfil.terminar_render)
+        return response
+
+    @staticmethod
+    def nombre_ruta(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return f'{request.method} <sin resolver>'
+        nombre = match.view_name or match._func_path
+        accion = getattr(match.func, 'actions', {}).get(request.method.lower())
+        return f'{nombre}:{accion}' if accion else f'{request.method} {nombre}'
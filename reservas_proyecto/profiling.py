@@ -0,0 +1,185 @@
+"""
+Perfilado de peticiones: tiempo total, consultas SQL, tiempo en base de datos,
+serialización, renderizado y tamaño de respuesta, agregados en histogramas
+en memoria por ruta y acción.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_perfil_actual = ContextVar('perfil_actual', default=None)
+
+# Límites superiores de los buckets de cada métrica
+BUCKETS = {
+    'total_ms': [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000],
+    'db_ms': [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000],
+    'serializer_ms': [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000],
+    'render_ms': [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000],
+    'consultas': [0, 1, 2, 3, 5, 10, 20, 50, 100, 200],
+    'bytes': [1024, 4096, 16384, 65536, 262144, 1048576, 4194304],
+}
+
+
+class Perfil:
+    """Mediciones de una petición en curso"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.db = 0.0
+        self.secciones = {}
+        self._inicio_render = None
+
+    def sumar(self, nombre, segundos):
+        self.secciones[nombre] = self.secciones.get(nombre, 0.0) + segundos
+
+    def ejecutar_sql(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - inicio
+            self.consultas += 1
+
+    def iniciar_render(self):
+        self._inicio_render = time.perf_counter()
+
+    def terminar_render(self, response=None):
+        if self._inicio_render is not None:
+            self.sumar('render', time.perf_counter() - self._inicio_render)
+            self._inicio_render = None
+
+
+def perfil_actual():
+    return _perfil_actual.get()
+
+
+@contextmanager
+def activar(perfil):
+    token = _perfil_actual.set(perfil)
+    try:
+        yield perfil
+    finally:
+        _perfil_actual.reset(token)
+
+
+@contextmanager
+def medir(seccion):
+    """Acumula el tiempo del bloque en la sección dada del perfil activo"""
+    perfil = _perfil_actual.get()
+    if perfil is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        perfil.sumar(seccion, time.perf_counter() - inicio)
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.buckets = [0] * (len(limites) + 1)
+        self.cantidad = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, valor):
+        self.buckets[bisect.bisect_left(self.limites, valor)] += 1
+        self.cantidad += 1
+        self.suma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, p):
+        """Límite superior del bucket que contiene el percentil p"""
+        if not self.cantidad:
+            return 0
+        objetivo = p / 100 * self.cantidad
+        acumulado = 0
+        for i, n in enumerate(self.buckets):
+            acumulado += n
+            if acumulado >= objetivo:
+                return self.limites[i] if i < len(self.limites) else self.maximo
+        return self.maximo
+
+    def a_dict(self):
+        return {
+            'cantidad': self.cantidad,
+            'suma': round(self.suma, 3),
+            'maximo': round(self.maximo, 3),
+            'media': round(self.suma / self.cantidad, 3) if self.cantidad else 0,
+            'p50': self.percentil(50),
+            'p95': self.percentil(95),
+            'p99': self.percentil(99),
+            'limites': self.limites,
+            'buckets': self.buckets,
+        }
+
+
+class Registro:
+    """Histogramas por ruta, compartidos por todos los hilos del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rutas = {}
+        self._ultimo_volcado = time.monotonic()
+
+    def registrar(self, ruta, valores):
+        with self._lock:
+            metricas = self._rutas.get(ruta)
+            if metricas is None:
+                metricas = self._rutas[ruta] = {nombre: Histograma(l) for nombre, l in BUCKETS.items()}
+            for nombre, valor in valores.items():
+                metricas[nombre].registrar(valor)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                ruta: {nombre: h.a_dict() for nombre, h in metricas.items()}
+                for ruta, metricas in self._rutas.items()
+            }
+
+    def reiniciar(self):
+        with self._lock:
+            self._rutas.clear()
+
+    def volcar_si_corresponde(self, directorio, intervalo):
+        """Escribe el snapshot del proceso en ``directorio`` cada ``intervalo`` segundos"""
+        ahora = time.monotonic()
+        if ahora - self._ultimo_volcado < intervalo:
+            return
+        self._ultimo_volcado = ahora
+        self.volcar(directorio)
+
+    def volcar(self, directorio):
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f'perfil-{os.getpid()}.json')
+        temporal = f'{ruta}.tmp'
+        with open(temporal, 'w') as archivo:
+            json.dump(self.snapshot(), archivo)
+        os.replace(temporal, ruta)
+
+
+registro = Registro()
+
+
+def combinar(snapshots):
+    """Combina snapshots de varios procesos (mismos límites de buckets)"""
+    total = {}
+    for snapshot in snapshots:
+        for ruta, metricas in snapshot.items():
+            destino = total.setdefault(ruta, {})
+            for nombre, datos in metricas.items():
+                h = destino.get(nombre)
+                if h is None:
+                    h = destino[nombre] = Histograma(datos['limites'])
+                h.buckets = [a + b for a, b in zip(h.buckets, datos['buckets'])]
+                h.cantidad += datos['cantidad']
+                h.suma += datos['suma']
+                h.maximo = max(h.maximo, datos['maximo'])
+    return {ruta: {n: h.a_dict() for n, h in metricas.items()} for ruta, metricas in total.items()}
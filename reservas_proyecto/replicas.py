@@ -0,0 +1,127 @@
+"""
+Lecturas en réplicas de solo lectura.
+
+Las vistas marcadas con ``lectura_replica`` ejecutan sus consultas en una
+réplica de ``settings.REPLICAS['ALIAS']`` (elegida al azar por petición);
+todo lo demás, y en particular toda escritura, va a ``default``.
+
+Consistencia: tras una escritura de un usuario (cualquier petición no
+segura que responde < 400, ver ``ReplicaMiddleware``) sus lecturas siguen en
+la primaria durante ``VENTANA_PRIMARIA`` segundos, que debe superar el
+retraso de replicación. La marca se guarda en CACHES: con varios workers
+el backend de caché debe ser compartido.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_alias = ContextVar('reservas_replica', default=None)
+
+
+def _config():
+    return {'ALIAS': [], 'VENTANA_PRIMARIA': 5, **getattr(settings, 'REPLICAS', {})}
+
+
+def habilitadas():
+    return bool(_config()['ALIAS'])
+
+
+def ventana():
+    return _config()['VENTANA_PRIMARIA']
+
+
+def alias_actual():
+    """
+    Réplica a la que van ahora las lecturas, o None si van a la primaria
+    (fuera de ``usar`` o con una transacción abierta en la primaria)
+    """
+    alias = _alias.get()
+    if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return None
+    return alias
+
+
+@contextmanager
+def usar(alias):
+    """Enruta las lecturas del bloque a ``alias`` (None: a la primaria)"""
+    token = _alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _alias.reset(token)
+
+
+def _clave(usuario_id):
+    return f'reservas:escritura:{usuario_id}'
+
+
+def marcar_escritura(usuario):
+    if habilitadas() and ventana() > 0:
+        cache.set(_clave(usuario.pk), True, ventana())
+
+
+def escritura_reciente(usuario):
+    return bool(usuario and usuario.is_authenticated and cache.get(_clave(usuario.pk)))
+
+
+async def aescritura_reciente(usuario):
+    return bool(usuario and usuario.is_authenticated and await cache.aget(_clave(usuario.pk)))
+
+
+def alias_lectura(request):
+    """Réplica para las lecturas de ``request``, o None si deben ir a la primaria"""
+    alias = _config()['ALIAS']
+    if not alias or escritura_reciente(request.user):
+        return None
+    return random.choice(alias)
+
+
+async def aalias_lectura(request):
+    alias = _config()['ALIAS']
+    if not alias or await aescritura_reciente(request.user):
+        return None
+    return random.choice(alias)
+
+
+def lectura_replica(metodo):
+    """
+    Decorador para acciones de lectura de un ViewSet/APIView: el usuario ya
+    está autenticado (contra la primaria) cuando se decide el alias.
+    """
+    @wraps(metodo)
+    def envoltura(self, request, *args, **kwargs):
+        with usar(alias_lectura(request)):
+            return metodo(self, request, *args, **kwargs)
+    return envoltura
+
+
+class RouterReplicas:
+    """
+    DATABASE_ROUTERS: las lecturas dentro de ``usar(alias)`` van a la
+    réplica salvo que haya una transacción abierta en la primaria; las
+    escrituras siempre van a ``default`` (también las de instancias leídas
+    desde una réplica) y las migraciones nunca se aplican a las réplicas.
+    """
+
+    def db_for_read(self, model, **hints):
+        return alias_actual()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas tienen los mismos datos
+        bases = {DEFAULT_DB_ALIAS, *_config()['ALIAS']}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in _config()['ALIAS']:
+            return False
+        return None
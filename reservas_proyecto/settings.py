@@ -39,19 +39,35 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # ============================================
 MIDDLEWARE = [
+    'reservas_proyecto.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'reservas_proyecto.middleware.SesionMiddleware',
+    'reservas_proyecto.middleware.JWTAuthMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'reservas_proyecto.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'reservas_proyecto.middleware.JWTAuthMiddleware'
 ]
 
 ROOT_URLCONF = 'reservas_proyecto.urls'
 
+# ============================================
+# PERFILADO DE PETICIONES (ProfilingMiddleware)
+# ============================================
+PERFILADO = {
+    'HABILITADO': True,
+    # Fracción de peticiones medidas (1.0 = todas); bajar en producción
+    'MUESTREO': 1.0,
+    'SERVER_TIMING': True,
+    # Si se define, cada proceso vuelca sus histogramas aquí para que
+    # `manage.py perfil` pueda combinarlos
+    'DIRECTORIO': None,
+    'INTERVALO_VOLCADO': 60,
+}
+
 # ============================================
 # TEMPLATES
 # ============================================
@@ -74,21 +90,121 @@ TEMPLATES = [
 WSGI_APPLICATION = 'reservas_proyecto.wsgi.application'
 
 # ============================================
-# BASE DE DATOS - MYSQL
+# BASE DE DATOS
 # ============================================
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'reservas_db',
-        'USER': 'root',           
-        'PASSWORD': '', 
-        'HOST': 'localhost',
-        'PORT': '3306',
-        'OPTIONS': {
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
-            'charset': 'utf8mb4',
+# DB_PERFIL: 'mysql' (producción) o 'sqlite' (desarrollo local, db.sqlite3).
+# DB_CONEXIONES:
+#   'pool'        pool de conexiones por proceso (reservas_proyecto.backends);
+#                 el límite vale por worker: con N workers el servidor puede
+#                 recibir hasta N * (TAMANO + DESBORDE) conexiones
+#   'persistente' una conexión por hilo reutilizada durante CONN_MAX_AGE
+#                 segundos, verificada antes de cada petición
+#   'ninguna'     una conexión nueva por petición
+DB_PERFIL = os.environ.get('DB_PERFIL', 'mysql')
+DB_CONEXIONES = os.environ.get('DB_CONEXIONES', 'pool' if DB_PERFIL == 'mysql' else 'ninguna')
+
+if DB_PERFIL == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.environ.get('DB_NOMBRE', 'reservas_db'),
+            'USER': os.environ.get('DB_USUARIO', 'root'),
+            'PASSWORD': os.environ.get('DB_CLAVE', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PUERTO', '3306'),
+            'OPTIONS': {
+                'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+                'charset': 'utf8mb4',
+            },
+        }
+    }
+
+if DB_CONEXIONES == 'pool':
+    DATABASES['default'].update({
+        'ENGINE': 'reservas_proyecto.backends.' + DATABASES['default']['ENGINE'].rsplit('.', 1)[1],
+        # Cada petición devuelve su conexión al pool al terminar
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'TAMANO': int(os.environ.get('DB_POOL_TAMANO', 10)),
+            'DESBORDE': int(os.environ.get('DB_POOL_DESBORDE', 5)),
+            'TIEMPO_ESPERA': float(os.environ.get('DB_POOL_ESPERA', 10)),
+            'TIEMPO_INACTIVO': float(os.environ.get('DB_POOL_INACTIVO', 300)),
+            # Por debajo del wait_timeout de MySQL (8 h por defecto)
+            'VIDA_MAXIMA': float(os.environ.get('DB_POOL_VIDA_MAXIMA', 3600)),
+            'VERIFICAR_TRAS': float(os.environ.get('DB_POOL_VERIFICAR_TRAS', 30)),
         },
+    })
+elif DB_CONEXIONES == 'persistente':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+# Réplicas de solo lectura (reservas_proyecto.replicas). DB_REPLICAS: lista
+# separada por comas de hosts (mysql) o de archivos (sqlite, relativos a
+# BASE_DIR; `manage.py sincronizar_replica` los copia desde db.sqlite3).
+# Cada una hereda la configuración de conexión de default.
+REPLICAS = {
+    'ALIAS': [],
+    # Segundos que las lecturas de un usuario siguen en la primaria tras
+    # una escritura suya; debe superar el retraso de replicación
+    'VENTANA_PRIMARIA': int(os.environ.get('DB_REPLICAS_VENTANA', 5)),
+}
+for numero, destino in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    # En las pruebas la réplica es la misma base que default
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DB_PERFIL == 'sqlite':
+        replica['NAME'] = BASE_DIR / destino
+    else:
+        replica['HOST'] = destino
+    DATABASES[f'replica_{numero}'] = replica
+    REPLICAS['ALIAS'].append(f'replica_{numero}')
+
+DATABASE_ROUTERS = ['reservas_proyecto.replicas.RouterReplicas']
+
+# ============================================
+# CACHÉ
+# ============================================
+# CACHE_REDIS_URL: caché compartido entre procesos (redis://host:6379/0).
+# Con más de un proceso (varios workers de gunicorn/uvicorn) es obligatorio:
+# LocMemCache es por proceso y un cambio invalidado en uno no se ve en los
+# demás. Sin él, reservas.cache_salas acota a segundos lo que un proceso
+# puede servir desactualizado (SALAS_CACHE['TTL_LOCAL']).
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reservas-cache',
+        }
+    }
+
+# Segundos que se reutilizan las estadísticas del dashboard (/api/stats/)
+ESTADISTICAS_CACHE_TTL = 30
+
+# Caché de respuestas del catálogo de salas (reservas.cache_salas). TTL: vida
+# de cada entrada con un caché compartido; TTL_LOCAL: vida de las entradas y
+# de la versión con LocMemCache (por proceso); MAX_AGE: Cache-Control para el
+# navegador (0 = revalidar siempre con If-None-Match y recibir 304 si nada
+# cambió)
+SALAS_CACHE = {
+    'TTL': 3600,
+    'TTL_LOCAL': 5,
+    'MAX_AGE': 0,
 }
 
 # ============================================
@@ -101,6 +217,50 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
 
+# ============================================
+# HASH DE CONTRASEÑAS
+# ============================================
+# HASH_PASSWORD_ALGORITMO: 'scrypt', 'argon2' (requiere argon2-cffi) o
+# 'pbkdf2' (el de Django por defecto, 600000 iteraciones). Los demás quedan
+# en PASSWORD_HASHERS solo para verificar hashes existentes: cada usuario se
+# rehace con el algoritmo y los parámetros actuales en su siguiente login.
+# `manage.py benchmark login` mide los logins por segundo y núcleo de cada uno.
+HASH_PASSWORD_ALGORITMO = os.environ.get('HASH_PASSWORD_ALGORITMO', 'scrypt')
+HASH_PASSWORD = {
+    'PBKDF2': {'ITERACIONES': int(os.environ.get('HASH_PBKDF2_ITERACIONES', 600000))},
+    # Memoria por hash: 128 * N * R bytes (16 MiB con los valores por defecto)
+    'SCRYPT': {
+        'N': int(os.environ.get('HASH_SCRYPT_N', 2 ** 14)),
+        'R': int(os.environ.get('HASH_SCRYPT_R', 8)),
+        'P': int(os.environ.get('HASH_SCRYPT_P', 1)),
+    },
+    'ARGON2': {
+        'TIEMPO': int(os.environ.get('HASH_ARGON2_TIEMPO', 2)),
+        'MEMORIA_KIB': int(os.environ.get('HASH_ARGON2_MEMORIA_KIB', 65536)),
+        'PARALELISMO': int(os.environ.get('HASH_ARGON2_PARALELISMO', 1)),
+    },
+}
+_HASHERS = {
+    'scrypt': 'reservas.hashers.ScryptAjustable',
+    'argon2': 'reservas.hashers.Argon2Ajustable',
+    'pbkdf2': 'reservas.hashers.PBKDF2Ajustable',
+}
+PASSWORD_HASHERS = [_HASHERS[HASH_PASSWORD_ALGORITMO]] + [
+    hasher for algoritmo, hasher in _HASHERS.items() if algoritmo != HASH_PASSWORD_ALGORITMO
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+# Límite de intentos de login (reservas.limite_login) en /api/auth/login/ y
+# /login/, comprobado antes de verificar la contraseña. Ventanas deslizantes
+# (intentos, segundos) en memoria de cada proceso. POR_IP es holgado porque
+# una red del campus puede salir por una sola IP; tras un proxy, configurar
+# NUM_PROXIES en REST_FRAMEWORK para tomar la IP de X-Forwarded-For.
+LIMITE_LOGIN = {
+    'HABILITADO': True,
+    'POR_IP': (100, 60),
+    'POR_EMAIL': (10, 300),
+    'MAXIMO_CLAVES': 100000,
+}
+
 # ============================================
 # CONFIGURACIÓN GLOBAL
 # ============================================
@@ -133,12 +293,17 @@ LOGIN_URL = '/login/'  # URL para redirigir usuarios no autenticados
 LOGIN_REDIRECT_URL = '/'  # URL después de login exitoso
 LOGOUT_REDIRECT_URL = '/'  # URL después de logout
 
+# Las rutas de la API se autentican solo con JWT: JWTAuthMiddleware les
+# asigna una sesión sin estado (sin lecturas ni escrituras de sesión)
+API_PREFIJO = '/api/'
+API_SIN_SESION = True
+
 # ============================================
 # DJANGO REST FRAMEWORK
 # ============================================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'reservas.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Cambia a IsAuthenticated en producción
@@ -151,6 +316,113 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Tamaño máximo de página (?page_size=) en los listados de reservas, que usan
+# paginación por keyset (reservas.pagination.ReservaKeysetPagination)
+PAGINACION_MAX_PAGE_SIZE = 100
+
+# Máximo de ítems por lote en /api/reservas/bulk/
+RESERVAS_BULK_MAXIMO = 5000
+
+# Rango máximo de una serie de reservas recurrentes (acota su expansión)
+SERIES_MAXIMO_DIAS = 366
+
+# Filas por consulta en la exportación de reservas (/api/reservas/exportar/)
+EXPORTACION_TAMANO_LOTE = 2000
+
+# Reportes de /api/analytics/: rango por defecto y máximo (en días)
+ANALITICA_DIAS_DEFECTO = 30
+ANALITICA_MAXIMO_DIAS = 366
+# ANALITICA_DIFERIDA=1: los deltas de los resúmenes de analítica los aplica
+# el trabajador de tareas (reportes con unos segundos de retraso) en lugar de
+# cada petición. Solo activarlo si `manage.py trabajador` está corriendo: sin
+# él los resúmenes dejan de actualizarse (ver `manage.py tareas`).
+ANALITICA_DIFERIDA = os.environ.get('ANALITICA_DIFERIDA', '0') == '1'
+
+# ============================================
+# TAREAS EN SEGUNDO PLANO (reservas.tareas)
+# ============================================
+# Se ejecutan con `manage.py trabajador` (uno o más procesos); `manage.py
+# tareas` muestra la cola y la duración de cada tarea.
+TAREAS = {
+    'LOTE': 100,
+    # Segundos de espera del trabajador con la cola vacía
+    'PAUSA': 1.0,
+    'MAXIMO_INTENTOS': 5,
+    # Espera antes del primer reintento; se duplica en cada uno
+    'REINTENTO_SEGUNDOS': 30,
+    # Una tarea en curso por más tiempo se da por abandonada y se reintenta
+    'TIEMPO_MAXIMO': 600,
+    'RETENCION_DIAS': 7,
+    # Nombre -> segundos entre ejecuciones
+    'PERIODICAS': {
+        'expirar_pendientes': 300,
+        'recordatorios': 300,
+        'purgar_tokens': 3600,
+        'purgar_tareas': 86400,
+    },
+}
+
+# Horas que una reserva puede seguir pendiente desde su creación antes de
+# que la tarea expirar_pendientes la cancele (filas por UPDATE: LOTE)
+RESERVAS_PENDIENTES_EXPIRAN = 48
+RESERVAS_EXPIRACION_LOTE = 500
+
+# Minutos antes del inicio de una reserva en que se envía su recordatorio
+RECORDATORIOS_ANTICIPACION = 60
+
+# Notificaciones a usuarios (reservas.notificaciones): BackendConsola,
+# BackendArchivo (OPCIONES={'ruta': ...}) o BackendCorreo (EMAIL_BACKEND)
+NOTIFICACIONES = {
+    'BACKEND': 'reservas.notificaciones.BackendConsola',
+    'OPCIONES': {},
+}
+
+# Feed de cambios (/api/cambios/): filas más recientes que el margen se
+# entregan en la siguiente consulta, cuando ya no puede haber commits
+# pendientes con una marca anterior.
+CAMBIOS_MARGEN_SEGUNDOS = 2
+CAMBIOS_LIMITE = 200
+
+# Lecturas más frecuentes con vistas async (reservas.async_views) en lugar
+# de las de DRF. reservas_proyecto.asgi lo activa; bajo WSGI conviene dejarlo
+# apagado (cada vista async correría en su propio event loop).
+API_ASYNC = os.environ.get('API_ASYNC', '0') == '1'
+
+# Eventos en vivo por SSE (/api/eventos/, servir con ASGI: bajo WSGI responde
+# 501 y los dashboards consultan /api/cambios/ periódicamente). Con varios
+# workers usar reservas.eventos.BackendSocketLocal (misma máquina,
+# OPCIONES={'directorio': ...}) o reservas.eventos.BackendRedis
+# (OPCIONES={'url': ..., 'canal': ...}).
+EVENTOS = {
+    'BACKEND': 'reservas.eventos.BackendMemoria',
+    'OPCIONES': {},
+    'MAXIMO_COLA': 100,
+    'LATIDO': 15,
+    'DURACION_MAXIMA': 300,
+    'REINTENTO_MS': 3000,
+    # Vigencia (segundos) de los tickets de un solo uso de /api/eventos/ticket/
+    'TICKET_TTL': 30,
+}
+
+# Caché de usuarios autenticados por JWT (reservas.authentication):
+# evita la consulta del Usuario en cada petición autenticada.
+# BACKEND: CacheUsuariosLocal (LRU por proceso) o CacheUsuariosDjango
+# (usa CACHES, compartido si el backend de caché lo es)
+JWT_CACHE_USUARIOS = {
+    'BACKEND': 'reservas.authentication.CacheUsuariosLocal',
+    'TTL': 30,
+    'MAXIMO': 10000,
+}
+
+# Refresh tokens (reservas.tokens): LRU por proceso de jti revocados y purga
+# por lotes de los expirados (`manage.py purgar_tokens --cada`, cada
+# INTERVALO segundos)
+TOKENS_JWT = {
+    'LRU_MAXIMO': 100000,
+    'LOTE': 1000,
+    'INTERVALO': 3600,
+}
+
 # ============================================
 # JWT SIMPLE_JWT
 # ============================================
@@ -174,4 +446,7 @@ SIMPLE_JWT = {
     # Opcionales pero recomendados mantener
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+
+    # Rotación sin SELECT previo a la lista negra (reservas.tokens)
+    'TOKEN_REFRESH_SERIALIZER': 'reservas.tokens.RefreshRotadoSerializer',
 }
@@ -8,6 +8,9 @@ from django.contrib.auth import logout as auth_logout
 import jwt
 from django.conf import settings
 import json
+import math
+
+from reservas.limite_login import espera_login, ip_cliente
 
 Usuario = get_user_model()
 
@@ -63,6 +66,13 @@ def login_view(request):
                     'error': 'Email y contraseña son requeridos'
                 }, status=400)
             
+            # Límite de intentos antes de calcular ningún hash
+            espera = espera_login(ip_cliente(request), email)
+            if espera:
+                return JsonResponse({
+                    'error': 'Demasiados intentos de inicio de sesión'
+                }, status=429, headers={'Retry-After': str(math.ceil(espera))})
+            
             # Autenticar usuario
             user = authenticate(request, username=email, password=password)
             